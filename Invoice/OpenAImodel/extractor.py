@@ -0,0 +1,219 @@
+"""
+GPT-4o Receipt Extractor
+In-process extraction of payment form fields using Azure OpenAI.
+
+The Azure OpenAI client and the JSON schema prompt are created once per
+process and reused for every upload. Extractions run on a small bounded
+thread pool so a gunicorn worker never has more than EXTRACTION_WORKERS
+model calls in flight.
+"""
+
+import os
+import json
+import base64
+import hashlib
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+try:
+    from openai import AzureOpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+    AzureOpenAI = None
+
+try:
+    from dotenv import load_dotenv
+    # Load .env from the OpenAImodel directory
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+except ImportError:
+    load_dotenv = None
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(MODEL_DIR, "Input.json")
+
+# Upper bound for one model call, matching the old subprocess timeout
+EXTRACTION_TIMEOUT_SECONDS = 120
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+
+_client = None
+_client_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _load_system_prompt():
+    """Read Input.json once and build the system prompt around its schema"""
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+        schema_json = json.load(f)
+    schema = json.dumps(schema_json["schema"], indent=2)
+    return (
+        "You are an AI that extracts structured data from church donation receipts.\n"
+        "Return strict JSON that matches the provided schema without any additional comments or explanations like (```json). Ensure all amounts are numbers, dates are in YYYY-MM-DD format, and currency is INR.\n\n"
+        "Extract data from the attached church receipt and return it as JSON according to this schema and don't put comment line at begining and end of the JSON:\n"
+        f"{schema}"
+    )
+
+
+SYSTEM_PROMPT = _load_system_prompt()
+# Changes whenever Input.json or the prompt changes; part of the result cache key
+SCHEMA_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+
+def get_client():
+    """Return the process-wide AzureOpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not OPENAI_AVAILABLE:
+                    raise ImportError("openai is required for GPT-4o extraction. Please install it with: pip install openai")
+                _client = AzureOpenAI(
+                    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                    api_key=os.getenv("AZURE_OPENAI_KEY"),
+                )
+    return _client
+
+
+def get_executor():
+    """Return the bounded extraction pool for this process.
+
+    The pool is created lazily and re-created after a fork, so each gunicorn
+    worker owns its own threads.
+    """
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=EXTRACTION_WORKERS,
+                    thread_name_prefix="gpt4o-extract",
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def request_completion(image_bytes):
+    """Send one image to the deployment and return the raw model output text"""
+    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+    deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+
+    response = get_client().chat.completions.create(
+        messages=[
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT,
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": "data:image/jpeg;base64," + image_base64,
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=4096,
+        temperature=0,
+        top_p=1.0,
+        model=deployment,
+        timeout=EXTRACTION_TIMEOUT_SECONDS,
+    )
+    return response.choices[0].message.content
+
+
+def map_output_fields(output_data):
+    """Map the schema-shaped model output onto the receipt field names"""
+    # Initialize variables for mapping
+    tithe_month = ""
+    tithe_amount = ""
+    membership_month = ""
+    membership_amount = ""
+    birthday_thank_offering = ""
+    wedding_anniversary_thank_offering = ""
+    home_mission_pledges = ""
+    mission_and_evangelism_fund = ""
+    st_stephens_social_aid_fund = ""
+    donation_amount = ""
+    donation_purpose = ""
+
+    for item in output_data.get("line_items", []):
+        category = item.get("category", "").lower()
+        if category == "tithe":
+            tithe_month = item.get("month", "")
+            tithe_amount = item.get("amount", "")
+        elif category == "membership":
+            membership_month = item.get("month", "")
+            membership_amount = item.get("amount", "")
+        elif category == "birthday thank offering":
+            birthday_thank_offering = item.get("amount", "")
+        elif category == "wedding anniversary thank offering":
+            wedding_anniversary_thank_offering = item.get("amount", "")
+        elif category == "home mission pledges":
+            home_mission_pledges = item.get("amount", "")
+        elif category == "mission & evangelism fund":
+            mission_and_evangelism_fund = item.get("amount", "")
+        elif category == "st. stephen’s social aid fund":
+            st_stephens_social_aid_fund = item.get("amount", "")
+        elif category == "donation":
+            donation_purpose = item.get("purpose", "")
+            donation_amount = item.get("amount", "")
+
+    return {
+        "InvoiceDate": output_data.get("date", ""),
+        "Name": output_data.get("donor_name", ""),
+        "Address": output_data.get("address", ""),
+        "TitheMonth": tithe_month,
+        "TitheAmount": tithe_amount,
+        "MembershipMonth": membership_month,
+        "MembershipAmount": membership_amount,
+        "BirthdayThankOffering": birthday_thank_offering,
+        "WeddingAnniversaryThankOffering": wedding_anniversary_thank_offering,
+        "HomeMissionPledges": home_mission_pledges,
+        "MissionAndEvangelismFund": mission_and_evangelism_fund,
+        "StStephensSocialAidFund": st_stephens_social_aid_fund,
+        "DonationAmount": donation_amount,
+        "DonationFor": donation_purpose,
+        "TotalAmount": output_data.get("total_amount", ""),
+        "Currency": output_data.get("currency", "")
+    }
+
+
+def extract_receipt(image_path):
+    """
+    Extract receipt fields from an image in the calling thread
+    Args:
+        image_path: Path to the uploaded payment form image
+    Returns:
+        Tuple of (mapped fields dict, raw model output text)
+    """
+    with open(image_path, "rb") as image_file:
+        image_bytes = image_file.read()
+
+    output_content = request_completion(image_bytes)
+    output_data = json.loads(output_content)
+    return map_output_fields(output_data), output_content
+
+
+def submit_extraction(image_path):
+    """Queue an extraction on the bounded pool and return its Future"""
+    return get_executor().submit(extract_receipt, image_path)
+
+
+def extract_fields(image_path, timeout=EXTRACTION_TIMEOUT_SECONDS):
+    """Run an extraction on the pool and wait for the mapped fields"""
+    future = submit_extraction(image_path)
+    try:
+        mapped_fields, _ = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        logging.error(f"GPT-4o extraction timed out after {timeout} seconds: {image_path}")
+        raise
+    return mapped_fields
@@ -0,0 +1,459 @@
+"""
+Azure Stub Server
+Local stand-in for Azure OpenAI and Content Understanding, so load tests
+and benchmarks can run without cloud credentials.
+
+Implements the calls the app makes: chat completions
+(/openai/deployments/<name>/chat/completions), answered with GPT-4o output
+in the Input.json schema, and Content Understanding :analyze, which
+returns 202 with an operation-location that is polled until the result is
+ready. Results are synthesized with synthetic_parish, seeded by the
+uploaded image so the same form always gets the same answer, or drawn from
+a synthetic_parish data set. Each call waits for a delay drawn from a
+configurable distribution. A share of requests can be answered with 429
+or 5xx (with Retry-After), and requests over a rate or concurrency limit
+are throttled the way the real services do it. GET /stats returns counters.
+
+Point the app at the stub with any non-empty keys:
+  AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089  AZURE_ENDPOINT=http://127.0.0.1:8089
+
+Usage: python azure_stub_server.py [--port 8089] [--chat-latency lognormal:2500,0.3]
+                                   [--analyze-time lognormal:4000,0.3] [--throttle-rate 0.05]
+                                   [--error-rate 0.02] [--max-rps 10] [--dataset DIR]
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import base64
+import random
+import hashlib
+import argparse
+import datetime
+import threading
+from dataclasses import dataclass, fields
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from synthetic_parish import ParishGenerator, content_understanding_result, gpt4o_output
+
+DEFAULT_PORT = 8089
+# Finished Content Understanding operations are forgotten after this long
+OPERATION_TTL_SECONDS = 600
+
+CHAT_PATH = re.compile(r"/openai/deployments/([^/]+)/chat/completions")
+ANALYZE_PATH = re.compile(r"/contentunderstanding/analyzers/([^/:]+):analyze")
+RESULT_PATH = re.compile(r"/contentunderstanding/analyzerResults/([^/]+)")
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution given in milliseconds
+    Args:
+        spec: 'fixed:MS', 'uniform:LOW,HIGH', 'normal:MEAN,STDDEV' or
+              'lognormal:MEDIAN,SIGMA'; a bare number is fixed
+    Returns:
+        Function taking a random.Random and returning a delay in seconds
+    """
+    kind, _, values = str(spec).partition(':')
+    if not values:
+        kind, values = 'fixed', kind
+    try:
+        numbers = [float(value) for value in values.split(',')]
+    except ValueError:
+        raise ValueError(f"Invalid latency: {spec}")
+
+    if kind == 'fixed' and len(numbers) == 1:
+        return lambda rng: numbers[0] / 1000
+    if kind == 'uniform' and len(numbers) == 2:
+        return lambda rng: rng.uniform(*numbers) / 1000
+    if kind == 'normal' and len(numbers) == 2:
+        return lambda rng: max(0.0, rng.gauss(*numbers)) / 1000
+    if kind == 'lognormal' and len(numbers) == 2:
+        median, sigma = numbers
+        return lambda rng: rng.lognormvariate(math.log(max(median, 0.001)), sigma) / 1000
+    raise ValueError(f"Invalid latency: {spec}")
+
+
+@dataclass
+class StubConfig:
+    # Latency specs, see parse_latency(); latency is added to every request
+    latency: str = 'fixed:5'
+    chat_latency: str = 'lognormal:2500,0.3'
+    analyze_time: str = 'lognormal:4000,0.3'
+    # Shares of requests answered with 429 and with 500/503
+    throttle_rate: float = 0.0
+    error_rate: float = 0.0
+    # Share of Content Understanding analyses that end in status Failed
+    failure_rate: float = 0.0
+    retry_after: float = 1.0
+    # Completions and analyze calls accepted per second and in flight (0 = no limit)
+    max_rps: float = 0.0
+    max_concurrent: int = 0
+    # Key the clients must send; empty accepts any key
+    api_key: str = ''
+    # synthetic_parish data set to answer from instead of synthesizing
+    dataset: str = ''
+    seed: int = 1
+
+    @classmethod
+    def from_env(cls):
+        """Config with each field overridden by AZURE_STUB_<FIELD> when set"""
+        config = cls()
+        for field in fields(cls):
+            value = os.getenv(f"AZURE_STUB_{field.name.upper()}")
+            if value is not None:
+                setattr(config, field.name, type(getattr(config, field.name))(value))
+        return config
+
+
+def _last_sunday():
+    today = datetime.date.today()
+    return today - datetime.timedelta(days=(today.weekday() + 1) % 7)
+
+
+class StubState:
+    """Operations, limits and counters shared by the request threads"""
+
+    def __init__(self, config):
+        self.config = config
+        self.latency = parse_latency(config.latency)
+        self.chat_latency = parse_latency(config.chat_latency)
+        self.analyze_time = parse_latency(config.analyze_time)
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.in_flight = 0
+        self.tokens = max(1.0, config.max_rps)
+        self.refilled_at = time.monotonic()
+        self.counters = {}
+        self.dataset, self.dataset_by_hash = self._load_dataset(config.dataset)
+
+    def _load_dataset(self, dataset_dir):
+        """Receipts of a synthetic_parish data set, also indexed by the hash of their form image"""
+        if not dataset_dir:
+            return [], {}
+        with open(os.path.join(dataset_dir, "receipts.json"), 'r', encoding='utf-8') as f:
+            receipts = json.load(f)
+        by_hash = {}
+        forms_dir = os.path.join(dataset_dir, "forms")
+        for index, receipt in enumerate(receipts):
+            form_path = os.path.join(forms_dir, f"form_{index + 1:06d}.jpg")
+            if os.path.exists(form_path):
+                with open(form_path, 'rb') as f:
+                    by_hash[hashlib.sha256(f.read()).hexdigest()] = receipt
+        return receipts, by_hash
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def draw(self, distribution):
+        with self.lock:
+            return distribution(self.rng)
+
+    def chance(self, rate):
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < rate
+
+    def receipt_for(self, digest):
+        """The receipt a form with this content hash is read as"""
+        seed = int(digest[:16], 16)
+        if self.dataset:
+            return self.dataset_by_hash.get(digest) or self.dataset[seed % len(self.dataset)]
+        generator = ParishGenerator(seed=seed, donors=1)
+        return generator.receipt(generator.donors[0], _last_sunday())
+
+    def admit(self):
+        """
+        Apply the rate and concurrency limits to a new completion or analysis
+        Returns:
+            None when admitted, otherwise the seconds the client should wait
+        """
+        config = self.config
+        with self.lock:
+            if config.max_rps > 0:
+                now = time.monotonic()
+                self.tokens = min(max(1.0, config.max_rps),
+                                  self.tokens + (now - self.refilled_at) * config.max_rps)
+                self.refilled_at = now
+                if self.tokens < 1:
+                    return (1 - self.tokens) / config.max_rps
+            if config.max_concurrent > 0 and self.in_flight + self._running() >= config.max_concurrent:
+                return config.retry_after
+            if config.max_rps > 0:
+                self.tokens -= 1
+            self.in_flight += 1
+            return None
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def _running(self):
+        now = time.monotonic()
+        return sum(1 for operation in self.operations.values() if operation['ready_at'] > now)
+
+    def start_operation(self, analyzer_id, digest):
+        """Register an analysis that completes after a drawn processing time; returns its id"""
+        operation_id = str(uuid.uuid4())
+        ready_at = time.monotonic() + self.draw(self.analyze_time)
+        failed = self.chance(self.config.failure_rate)
+        result = None if failed else content_understanding_result(
+            self.receipt_for(digest), analyzer_id, seed=int(digest[:16], 16))
+        with self.lock:
+            now = time.monotonic()
+            for expired in [key for key, operation in self.operations.items()
+                            if operation['ready_at'] < now - OPERATION_TTL_SECONDS]:
+                del self.operations[expired]
+            self.operations[operation_id] = {'ready_at': ready_at, 'result': result}
+        return operation_id
+
+    def operation(self, operation_id):
+        with self.lock:
+            return self.operations.get(operation_id)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'in_flight': self.in_flight,
+                'running_operations': self._running(),
+                'config': self.config.__dict__,
+            }
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AzureStub/1.0"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status, code, message, retry_after=None):
+        headers = {}
+        if retry_after is not None:
+            headers = {"Retry-After": str(max(1, math.ceil(retry_after))),
+                       "retry-after-ms": str(int(retry_after * 1000))}
+        self.state.count(f"status_{status}")
+        self._send_json(status, {'error': {'code': code, 'message': message}}, headers)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _authorized(self):
+        key = (self.headers.get("api-key") or self.headers.get("Ocp-Apim-Subscription-Key")
+               or self.headers.get("Authorization", "").removeprefix("Bearer "))
+        if not key:
+            return False
+        return not self.state.config.api_key or key == self.state.config.api_key
+
+    def _inject_fault(self):
+        """Answer with an injected 429 or 5xx; returns True when it did"""
+        config = self.state.config
+        if self.state.chance(config.throttle_rate):
+            self._send_error(429, "TooManyRequests", "Rate limit is exceeded (injected).", config.retry_after)
+            return True
+        if self.state.chance(config.error_rate):
+            status = 503 if self.state.chance(0.5) else 500
+            self._send_error(status, "ServiceUnavailable" if status == 503 else "InternalServerError",
+                             "Injected server error.", config.retry_after if status == 503 else None)
+            return True
+        return False
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        body = self._read_body()
+        if method == "GET" and url.path == "/stats":
+            return self._send_json(200, self.state.stats())
+
+        routes = [
+            ("POST", CHAT_PATH, self._chat_completions),
+            ("POST", ANALYZE_PATH, self._analyze),
+            ("GET", RESULT_PATH, self._analyze_result),
+        ]
+        for route_method, pattern, handler in routes:
+            match = pattern.fullmatch(url.path)
+            if match and route_method == method:
+                break
+        else:
+            return self._send_error(404, "NotFound", f"No stub route for {method} {url.path}")
+
+        self.state.count(handler.__name__.lstrip('_'))
+        if not self._authorized():
+            return self._send_error(401, "Unauthorized", "Access denied due to missing or invalid key.")
+        if not query.get('api-version'):
+            return self._send_error(400, "MissingApiVersionParameter", "The api-version query parameter is required.")
+        time.sleep(self.state.draw(self.state.latency))
+        if self._inject_fault():
+            return
+        handler(match.group(1), query['api-version'][0], body)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _chat_completions(self, deployment, api_version, body):
+        try:
+            request = json.loads(body)
+            messages = request['messages']
+        except (ValueError, KeyError, TypeError):
+            return self._send_error(400, "BadRequest", "Request body must be JSON with messages.")
+        image = b''
+        for message in messages:
+            content = message.get('content')
+            for part in content if isinstance(content, list) else []:
+                url = (part.get('image_url') or {}).get('url', '')
+                if url.startswith('data:'):
+                    image += base64.b64decode(url.partition(',')[2])
+
+        retry_after = self.state.admit()
+        if retry_after is not None:
+            return self._send_error(429, "TooManyRequests", "Rate limit is exceeded.", retry_after)
+        try:
+            time.sleep(self.state.draw(self.state.chat_latency))
+            content = json.dumps(gpt4o_output(self.state.receipt_for(hashlib.sha256(image).hexdigest())), indent=2)
+        finally:
+            self.state.release()
+
+        prompt_tokens = sum(len(str(message.get('content', ''))) for message in messages) // 4
+        completion_tokens = len(content) // 4
+        self._send_json(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'gpt-4o-2024-08-06',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content, 'refusal': None},
+                'finish_reason': 'stop',
+                'logprobs': None,
+            }],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        })
+
+    def _analyze(self, analyzer_id, api_version, body):
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                source = json.loads(body)['url'].encode('utf-8')
+            except (ValueError, KeyError, TypeError, AttributeError):
+                return self._send_error(400, "BadRequest", "Request body must be JSON with a url.")
+        else:
+            source = body
+        if not source:
+            return self._send_error(400, "BadRequest", "Request body is empty.")
+
+        retry_after = self.state.admit()
+        if retry_after is not None:
+            return self._send_error(429, "TooManyRequests", "Rate limit is exceeded.", retry_after)
+        try:
+            operation_id = self.state.start_operation(analyzer_id, hashlib.sha256(source).hexdigest())
+        finally:
+            self.state.release()
+        host = self.headers.get("Host") or f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+        self._send_json(202, {'id': operation_id, 'status': 'Running'}, {
+            "Operation-Location": f"http://{host}/contentunderstanding/analyzerResults/{operation_id}"
+                                  f"?api-version={api_version}",
+        })
+
+    def _analyze_result(self, operation_id, api_version, body):
+        operation = self.state.operation(operation_id)
+        if operation is None:
+            return self._send_error(404, "NotFound", f"Operation {operation_id} not found.")
+        if operation['ready_at'] > time.monotonic():
+            return self._send_json(200, {'id': operation_id, 'status': 'Running'})
+        if operation['result'] is None:
+            self.state.count("failed_analyses")
+            return self._send_json(200, {'id': operation_id, 'status': 'Failed',
+                                         'error': {'code': 'InternalServerError', 'message': 'Injected failure.'}})
+        self._send_json(200, dict(operation['result'], id=operation_id))
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, config=None, verbose=False):
+        super().__init__(address, StubRequestHandler)
+        self.state = StubState(config or StubConfig())
+        self.verbose = verbose
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+def start_stub_server(config=None, host="127.0.0.1", port=0):
+    """
+    Start the stub on a background thread
+    Args:
+        config: StubConfig (defaults to StubConfig.from_env())
+        port: Port to listen on; 0 picks a free one
+    Returns:
+        The running StubServer; call shutdown() to stop it
+    """
+    server = StubServer((host, port), config or StubConfig.from_env())
+    threading.Thread(target=server.serve_forever, name="azure-stub", daemon=True).start()
+    return server
+
+
+def stub_environment(url, deployment="gpt-4o"):
+    """Environment variables pointing both extraction backends at a stub at url"""
+    return {
+        'AZURE_OPENAI_ENDPOINT': url,
+        'AZURE_OPENAI_KEY': 'stub-key',
+        'AZURE_OPENAI_API_VERSION': '2024-10-21',
+        'AZURE_OPENAI_DEPLOYMENT': deployment,
+        'AZURE_ENDPOINT': url,
+        'AZURE_API_KEY': 'stub-key',
+    }
+
+
+if __name__ == "__main__":
+    defaults = StubConfig.from_env()
+    parser = argparse.ArgumentParser(description="Local Azure OpenAI and Content Understanding stand-in")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=int(os.getenv("AZURE_STUB_PORT", DEFAULT_PORT)),
+                        help="Port to listen on")
+    for field in fields(StubConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(getattr(defaults, field.name)),
+                            default=getattr(defaults, field.name))
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    config = StubConfig(**{field.name: getattr(args, field.name) for field in fields(StubConfig)})
+    server = StubServer((args.host, args.port), config, verbose=args.verbose)
+    print(f"Azure stub listening on {server.url}")
+    for name, value in stub_environment(server.url).items():
+        print(f"  {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,217 @@
+"""
+Batch Receipt Generator
+Generates receipts for a whole Sunday's collection in one go.
+
+Records come from a CSV file in the Extract.csv layout or a JSON list of
+receipt records. A contiguous block of receipt numbers is reserved up
+front, receipts are rendered in parallel on a process pool, and all PDFs
+are bundled into a single ZIP together with a per-row status report.
+A bad row is reported and skipped; it never aborts the rest of the batch.
+
+The pool always starts its processes with 'spawn', so it is safe to use
+from a threaded web worker; the web app runs batches in the background
+through the upload job store.
+
+Usage: python batch_receipts.py <records.csv|records.json> [--workers N] [--record]
+"""
+
+import os
+import io
+import csv
+import json
+import zipfile
+import argparse
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from receipt_numbers import get_receipt_allocator
+from receipt_record import AMOUNT_FIELDS, TEXT_FIELDS, normalize_date
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_DIR = os.path.join(SCRIPT_DIR, "Receipts store", "Batches")
+
+PAYMENT_METHODS = ('CASH', 'CHEQUE', 'ONLINE')
+
+
+def normalize_record(raw):
+    """
+    Convert a CSV row or JSON record into the receipt_data format used by
+    the /generate_receipt form
+    Raises:
+        ValueError: If the record has no name, no valid date or a bad amount
+    """
+    name = str(raw.get('Name') or '').strip()
+    if not name:
+        raise ValueError("Name is missing")
+
+    receipt_data = {'InvoiceDate': normalize_date(raw.get('InvoiceDate'))}
+    for field in TEXT_FIELDS:
+        value = raw.get(field)
+        receipt_data[field] = str(value).strip() if value not in (None, '') else ''
+    receipt_data['Name'] = name
+
+    for field in AMOUNT_FIELDS:
+        value = raw.get(field)
+        if value is None or str(value).strip() == '':
+            receipt_data[field] = 0.00
+            continue
+        try:
+            receipt_data[field] = round(float(str(value).replace(',', '')), 2)
+        except ValueError:
+            raise ValueError(f"{field} is not a number: '{value}'")
+
+    payment_method = str(raw.get('PaymentMethod') or 'CASH').strip().upper()
+    receipt_data['PaymentMethod'] = payment_method if payment_method in PAYMENT_METHODS else 'CASH'
+    return receipt_data
+
+
+def load_records(path):
+    """Read raw records from a .csv (Extract.csv layout) or .json file"""
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return parse_json_records(json.load(f))
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        return parse_csv_records(f)
+
+
+def parse_csv_records(stream):
+    """Read raw records from a text stream in the Extract.csv layout"""
+    return list(csv.DictReader(stream))
+
+
+def parse_json_records(data):
+    """Accept either a list of records or {"records": [...]}"""
+    if isinstance(data, dict):
+        data = data.get('records', [])
+    if not isinstance(data, list):
+        raise ValueError("JSON input must be a list of receipt records")
+    return data
+
+
+def batch_zip_filename():
+    """Return a new, unique file name for a batch ZIP"""
+    return f"Receipt_Batch_{datetime.datetime.now():%Y%m%d_%H%M%S_%f}.zip"
+
+
+def _render_receipt(row, receipt_data, receipt_no):
+    """Process pool worker: render one receipt and save it as PDF"""
+    from printreceipt import generate_receipt, save_receipt_multiple_formats
+
+    try:
+        receipt_result = generate_receipt(dict(receipt_data, ReceiptNo=str(receipt_no)))
+        receipt_filename = f"Receipt_No-{receipt_result['receipt_no']}-{receipt_result['date_filename']}-{receipt_result['name']}"
+        saved_files = save_receipt_multiple_formats(receipt_result['image'], receipt_filename, ["pdf"])
+        if not saved_files:
+            raise RuntimeError("PDF could not be saved")
+        return {'row': row, 'status': 'ok', 'receipt_no': receipt_no,
+                'name': receipt_data['Name'], 'files': saved_files}
+    except Exception as e:
+        return {'row': row, 'status': 'error', 'receipt_no': receipt_no,
+                'name': receipt_data['Name'], 'error': str(e)}
+
+
+def generate_batch(raw_records, workers=None, record_ledger=False, zip_filename=None, progress=None):
+    """
+    Generate receipts for many records at once
+    Args:
+        raw_records: List of CSV rows or JSON records
+        workers: Process pool size (defaults to the CPU count)
+        record_ledger: Also append each generated receipt to Extract.csv and
+                       the receipt ledger, as /generate_receipt does (leave
+                       off for rows that came from Extract.csv)
+        zip_filename: Name of the ZIP to write (defaults to batch_zip_filename())
+        progress: Optional function called as progress(stage, percent)
+    Returns:
+        Dictionary with the ZIP path and one result entry per row
+    """
+    progress = progress or (lambda stage, percent: None)
+    results = []
+    valid = []
+    for row, raw in enumerate(raw_records, 1):
+        try:
+            valid.append((row, normalize_record(raw)))
+        except ValueError as e:
+            results.append({'row': row, 'status': 'error', 'receipt_no': None,
+                            'name': str(raw.get('Name') or ''), 'error': str(e)})
+
+    # One contiguous block of numbers for the whole batch
+    numbers = get_receipt_allocator().reserve_block(len(valid))
+
+    if valid:
+        workers = workers or min(len(valid), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {
+                executor.submit(_render_receipt, row, receipt_data, receipt_no): (row, receipt_data, receipt_no)
+                for (row, receipt_data), receipt_no in zip(valid, numbers)
+            }
+            for future in as_completed(futures):
+                row, receipt_data, receipt_no = futures[future]
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool as e:
+                    results.append({'row': row, 'status': 'error', 'receipt_no': receipt_no,
+                                    'name': receipt_data['Name'], 'error': f"Worker crashed: {e}"})
+                progress('rendering', 10 + 80 * len(results) // len(raw_records))
+
+    results.sort(key=lambda result: result['row'])
+    generated = [result for result in results if result['status'] == 'ok']
+    if record_ledger and generated:
+        # Only receipts that rendered, so Extract.csv and the ledger agree and
+        # re-running the failed rows adds no duplicates
+        from invoiceanalyzer import export_many_to_csv
+        from receipt_ledger import get_receipt_ledger
+        records = dict(valid)
+        export_many_to_csv([records[result['row']] for result in generated])
+        get_receipt_ledger().record_many([records[result['row']] for result in generated],
+                                         [result['receipt_no'] for result in generated],
+                                         source='batch')
+    progress('zipping', 90)
+    zip_path = _write_batch_zip(results, zip_filename or batch_zip_filename())
+    return {
+        'zip_path': zip_path,
+        'receipt_numbers': [numbers.start, numbers.stop - 1] if numbers else [],
+        'generated': len(generated),
+        'failed': len(results) - len(generated),
+        'results': results
+    }
+
+
+def _write_batch_zip(results, zip_filename):
+    """Bundle all generated PDFs and a per-row status CSV into one ZIP"""
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    zip_path = os.path.join(BATCH_DIR, zip_filename)
+
+    report = io.StringIO()
+    writer = csv.writer(report)
+    writer.writerow(['Row', 'Status', 'ReceiptNo', 'Name', 'File', 'Error'])
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for result in results:
+            files = result.get('files', [])
+            for file_path in files:
+                archive.write(file_path, os.path.basename(file_path))
+            writer.writerow([result['row'], result['status'], result['receipt_no'] or '',
+                             result['name'], ';'.join(os.path.basename(f) for f in files),
+                             result.get('error', '')])
+        archive.writestr('batch_report.csv', report.getvalue())
+
+    return zip_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate receipts for a batch of records")
+    parser.add_argument("records", help="CSV file in the Extract.csv layout or JSON list of records")
+    parser.add_argument("--workers", type=int, default=None, help="Number of rendering processes")
+    parser.add_argument("--record", action="store_true", help="Also record the receipts in Extract.csv and the ledger")
+    args = parser.parse_args()
+
+    summary = generate_batch(load_records(args.records), workers=args.workers, record_ledger=args.record)
+    for result in summary['results']:
+        if result['status'] == 'ok':
+            print(f"Row {result['row']}: Receipt No {result['receipt_no']} - {result['name']}")
+        else:
+            print(f"Row {result['row']}: FAILED - {result['error']}")
+    print(f"\nGenerated {summary['generated']} receipts, {summary['failed']} failed")
+    print(f"ZIP: {summary['zip_path']}")
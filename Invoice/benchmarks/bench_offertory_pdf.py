@@ -0,0 +1,59 @@
+"""
+Offertory PDF Benchmark
+Times the offertory PDF for services with growing numbers of special
+offertory rows, and reports peak memory and pages, to check that both grow
+linearly now that Section B is laid out one page-sized table at a time.
+
+Usage: python benchmarks/bench_offertory_pdf.py [rows ...]
+"""
+
+import os
+import re
+import sys
+import time
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from offertory_report import OffertoryReportGenerator
+from receipt_record import as_records
+
+SERVICE_DATE = "2025-12-25"
+
+
+def synthetic_service(rows):
+    """Receipts for one service with one contribution row each"""
+    return as_records({
+        'InvoiceDate': SERVICE_DATE,
+        'Name': f"Member {number}",
+        'PaymentMethod': 'CASH' if number % 3 else 'CHEQUE',
+        'TitheAmount': 100 + number % 900,
+        'TitheMonth': 'DECEMBER',
+    } for number in range(rows))
+
+
+def page_count(pdf_path):
+    with open(pdf_path, 'rb') as f:
+        return len(re.findall(rb"/Type /Page\b", f.read()))
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [250, 500, 1000, 2000, 5000]
+    generator = OffertoryReportGenerator()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = os.path.join(temp_dir, "offertory.pdf")
+        print(f"{'Rows':>6} {'Time (ms)':>10} {'ms/row':>7} {'Peak MB':>8} {'Pages':>6}")
+        for rows in counts:
+            receipts = synthetic_service(rows)
+            start = time.perf_counter()
+            generator._write_offertory_pdf(pdf_path, SERVICE_DATE, "Worship Service", receipts)
+            seconds = time.perf_counter() - start
+
+            # Second run for memory, so tracing does not skew the timing
+            tracemalloc.start()
+            generator._write_offertory_pdf(pdf_path, SERVICE_DATE, "Worship Service", receipts)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{rows:>6} {seconds * 1000:>10.0f} {seconds * 1000 / rows:>7.2f} "
+                  f"{peak / 1e6:>8.1f} {page_count(pdf_path):>6}")
@@ -0,0 +1,53 @@
+"""
+Receipt Rendering Benchmark
+Compares receipts/sec with the static background redrawn on every receipt
+(the old behaviour) against copying the cached background.
+
+Usage: python benchmarks/bench_receipt_background.py [count]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import printreceipt
+
+SAMPLE_RECEIPT = {
+    'InvoiceDate': '2025-07-06',
+    'Name': 'Diana Moses More',
+    'TitheMonth': 'JULY',
+    'TitheAmount': 1000.0,
+    'MembershipMonth': 'JULY',
+    'MembershipAmount': 200.0,
+    'DonationFor': 'Building Fund',
+    'DonationAmount': 500.0,
+    'OnlineChequeNo': '45435345',
+    'PaymentMethod': 'CHEQUE',
+    # Fixed number so the benchmark does not touch receipt_counter.txt
+    'ReceiptNo': '9999'
+}
+
+
+def run(count, cached):
+    start = time.perf_counter()
+    for _ in range(count):
+        if not cached:
+            printreceipt._receipt_backgrounds.clear()
+        printreceipt.generate_receipt(dict(SAMPLE_RECEIPT))
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # Warm fonts and images so both runs measure drawing only
+    printreceipt.generate_receipt(dict(SAMPLE_RECEIPT))
+
+    before = run(count, cached=False)
+    after = run(count, cached=True)
+    print(f"Receipts rendered: {count}")
+    print(f"Full redraw (before):       {before:8.1f} receipts/sec")
+    print(f"Cached background (after):  {after:8.1f} receipts/sec")
+    print(f"Speed-up: {after / before:.2f}x")
@@ -0,0 +1,94 @@
+"""
+Summary Aggregation Benchmark
+Compares the old per-receipt loop of generate_summary_report against the
+column aggregation in receipt_aggregation on synthetic receipts, and checks
+that both produce the same summary.
+
+Usage: python benchmarks/bench_summary_aggregation.py [count ...]
+"""
+
+import os
+import sys
+import time
+import random
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from receipt_aggregation import SUMMARY_FIELDS, ReceiptColumns, summarize
+
+
+def synthetic_receipts(count, seed=7):
+    rng = random.Random(seed)
+    first_day = datetime.date(2024, 1, 7)
+    sundays = [str(first_day + datetime.timedelta(weeks=week)) for week in range(104)]
+    donors = [f"Member {number}" for number in range(2500)]
+    receipts = []
+    for _ in range(count):
+        receipt = {
+            'InvoiceDate': rng.choice(sundays),
+            'Name': rng.choice(donors),
+            'PaymentMethod': rng.choice(['CASH', 'CASH', 'CHEQUE', 'ONLINE']),
+        }
+        for field in rng.sample(SUMMARY_FIELDS, 3):
+            receipt[field] = rng.choice([100.0, 250.0, 500.0, 1000.0, 1250.5])
+        receipts.append(receipt)
+    return receipts
+
+
+def loop_summary(receipts, start_date, end_date):
+    """The summary loop as generate_summary_report used to run it"""
+    summary = {'total_receipts': 0, 'total_amount': 0, 'by_type': {}, 'by_date': {},
+               'start_date': start_date, 'end_date': end_date}
+    for receipt in receipts:
+        receipt_date = receipt.get('InvoiceDate', '').split('T')[0]
+        if not start_date <= receipt_date <= end_date:
+            continue
+        receipt_total = 0
+        for field in SUMMARY_FIELDS:
+            amount = receipt.get(field, 0)
+            if amount:
+                try:
+                    receipt_total += float(amount)
+                except (ValueError, TypeError):
+                    continue
+        summary['total_receipts'] += 1
+        summary['total_amount'] += receipt_total
+        day = summary['by_date'].setdefault(receipt_date, {'count': 0, 'amount': 0})
+        day['count'] += 1
+        day['amount'] += receipt_total
+    return summary
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def same_summary(a, b):
+    if a['total_receipts'] != b['total_receipts'] or abs(a['total_amount'] - b['total_amount']) > 0.005:
+        return False
+    return a['by_date'].keys() == b['by_date'].keys() and all(
+        a['by_date'][day]['count'] == b['by_date'][day]['count']
+        and abs(a['by_date'][day]['amount'] - b['by_date'][day]['amount']) < 0.005
+        for day in a['by_date'])
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    start_date, end_date = "2024-03-01", "2025-06-30"
+    for count in counts:
+        receipts = synthetic_receipts(count)
+        expected, loop_seconds = timed(loop_summary, receipts, start_date, end_date)
+        actual, column_seconds = timed(summarize, receipts, start_date, end_date)
+        columns = ReceiptColumns(receipts)
+        summarize(columns, start_date, end_date)
+        _, reuse_seconds = timed(summarize, columns, start_date, end_date)
+        _, grouped_seconds = timed(lambda: [columns.totals_by(key) for key in ('month', 'payment_method', 'donor')])
+        print(f"Receipts: {count}")
+        print(f"  Python loop:                    {loop_seconds * 1000:9.1f} ms")
+        print(f"  Columns (build + aggregate):    {column_seconds * 1000:9.1f} ms")
+        print(f"  Columns (already built):        {reuse_seconds * 1000:9.1f} ms")
+        print(f"  Month, payment and donor totals:{grouped_seconds * 1000:9.1f} ms")
+        print(f"  Same summary: {same_summary(expected, actual)}")
@@ -0,0 +1,130 @@
+"""
+Benchmark Harness
+Timing, memory and result files shared by the benchmark scripts.
+
+measure() calls a function repeatedly (after a warm-up call) until both a
+minimum number of runs and a minimum time are reached, then reports
+ops/sec and p50/p99 latency. Peak memory comes from one extra run under
+tracemalloc, so tracing never skews the timings; it counts Python
+allocations only, not image buffers held inside Pillow. Results are saved as JSON
+together with the Python and library versions, so a run after a Pillow or
+reportlab upgrade can be compared against an earlier one.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import platform
+import datetime
+import tracemalloc
+import statistics
+from importlib import metadata
+
+# Libraries whose upgrades are most likely to change the numbers
+TRACKED_PACKAGES = ['pillow', 'reportlab', 'openpyxl', 'numpy', 'flask']
+
+
+def percentile(samples, fraction):
+    """Return the nearest-rank percentile of samples, fraction between 0 and 1"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure(function, min_runs=5, min_seconds=1.0, max_runs=1000):
+    """
+    Time repeated calls of function
+    Args:
+        function: Callable run with no arguments
+        min_runs, max_runs: Bounds on the number of timed runs
+        min_seconds: Keep running until this much time has been spent
+    Returns:
+        Dictionary with runs, ops_per_sec, mean/p50/p99/min/max in
+        milliseconds and peak_memory_bytes
+    """
+    function()  # Warm-up: imports, caches and lazily built tables
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_seconds):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    total = sum(samples)
+    return {
+        'runs': len(samples),
+        'ops_per_sec': len(samples) / total if total else float('inf'),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'min_ms': min(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+        'peak_memory_bytes': peak,
+    }
+
+
+def environment():
+    """Describe the interpreter, machine and library versions of this run"""
+    versions = {}
+    for package in TRACKED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions,
+    }
+
+
+def save_results(path, results):
+    """Write benchmark results and the environment they were measured in to a JSON file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Compare two result files by p50 latency
+    Args:
+        baseline, current: Dictionaries as written by save_results()
+        threshold: Relative change reported as a regression or improvement
+    Returns:
+        List of (name, baseline p50 ms, current p50 ms, ratio, verdict)
+    """
+    before = {result['name']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None:
+            continue
+        ratio = result['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('inf')
+        verdict = 'slower' if ratio > 1 + threshold else 'faster' if ratio < 1 - threshold else ''
+        rows.append((result['name'], old['p50_ms'], result['p50_ms'], ratio, verdict))
+    return rows
+
+
+def format_result(result):
+    return (f"{result['name']:<48} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>10.2f} "
+            f"{result['p99_ms']:>10.2f} {result['peak_memory_bytes'] / 1e6:>9.1f}")
+
+
+RESULT_HEADER = f"{'Benchmark':<48} {'ops/sec':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak MB':>9}"
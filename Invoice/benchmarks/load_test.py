@@ -0,0 +1,523 @@
+"""
+Sunday Rush Load Test
+Replays the 30 minutes after a service against the web app: ushers
+uploading forms from phones while the treasurer generates receipts and
+reports.
+
+Requests arrive open-loop (Poisson) on /api/upload, /upload,
+/generate_receipt, /reports and /generate_offertory_report at configurable
+per-minute rates. Uploads are front-loaded (the ushers come straight after
+service) and reports back-loaded, while receipts arrive evenly. Latency is
+measured from each request's scheduled arrival, so time spent queued
+behind a saturated server counts. Uploaded forms are rendered synthetic_parish
+payment forms and receipts are synthetic_parish donors, all for the most
+recent Sunday.
+
+By default the app runs on a scratch copy of this folder (fresh
+receipt counter, Extract.csv and a ledger seeded with a year of history),
+under gunicorn when it is installed and the Flask server otherwise, with
+extraction answered by azure_stub_server. Once the load is over,
+the receipt numbers handed out, the allocator audit, the ledger and every
+Extract.csv row are checked for duplicated numbers, lost receipts and
+corrupted rows.
+
+Usage: python benchmarks/load_test.py [--duration 120] [--scale 1.0] [--concurrency 16]
+                                      [--rate /upload=20 ...] [--workers 2] [--async-uploads]
+                                      [--url http://host:port --app-dir DIR] [--output results.json]
+"""
+
+import os
+import re
+import sys
+import csv
+import time
+import json
+import random
+import shutil
+import socket
+import argparse
+import datetime
+import tempfile
+import threading
+import subprocess
+import importlib.util
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import harness
+from synthetic_parish import ParishGenerator, render_form
+from azure_stub_server import StubConfig, start_stub_server, stub_environment
+from receipt_record import AMOUNT_FIELDS, ReceiptRecord
+from receipt_numbers import ReceiptNumberAllocator
+from receipt_ledger import ReceiptLedger
+from ledger_writer import CSV_HEADERS, ledger_files
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Average arrivals per minute and how they spread over the run
+DEFAULT_RATES = {
+    '/api/upload': 40,
+    '/upload': 10,
+    '/generate_receipt': 30,
+    '/reports': 4,
+    '/generate_offertory_report': 2,
+}
+SHAPES = {
+    '/api/upload': 'front',
+    '/upload': 'front',
+    '/generate_receipt': 'flat',
+    '/reports': 'back',
+    '/generate_offertory_report': 'back',
+}
+REQUEST_TIMEOUT = 300
+RECEIPT_NUMBER = re.compile(r"Receipt_No-(\d+)-")
+SCRATCH_IGNORE = shutil.ignore_patterns('Receipts store', 'uploads', '__pycache__', 'results', 'Scripts',
+                                        'manual_packages', 'get-pip.py', 'Extract*.csv', '*.db', '*.log')
+
+
+def _intensity(shape, fraction):
+    """Relative arrival rate at a fraction of the run; averages 1 over the run"""
+    if shape == 'front':
+        return 2 * (1 - fraction)
+    if shape == 'back':
+        return 2 * fraction
+    return 1.0
+
+
+def arrival_schedule(rates, duration, rng):
+    """
+    Draw request arrivals for the run
+    Args:
+        rates: Average arrivals per minute by route
+        duration: Length of the run in seconds
+        rng: random.Random
+    Returns:
+        Sorted list of (seconds from start, route)
+    """
+    arrivals = []
+    for route, per_minute in rates.items():
+        if per_minute <= 0:
+            continue
+        shape = SHAPES.get(route, 'flat')
+        highest = 1 if shape == 'flat' else 2
+        peak = per_minute / 60 * highest
+        offset = rng.expovariate(peak)
+        while offset < duration:
+            # Thinning: keep each arrival in proportion to the rate at its time
+            if rng.random() * highest <= _intensity(shape, offset / duration):
+                arrivals.append((offset, route))
+            offset += rng.expovariate(peak)
+    return sorted(arrivals)
+
+
+def last_sunday():
+    today = datetime.date.today()
+    return today - datetime.timedelta(days=(today.weekday() + 1) % 7)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_scratch_app(scratch_dir, history, service_date, seed):
+    """
+    Copy the app into scratch_dir with a fresh receipt counter and a ledger
+    holding a year of receipts before service_date
+    Returns:
+        The app folder inside scratch_dir
+    """
+    app_dir = os.path.join(scratch_dir, "Invoice")
+    shutil.copytree(APP_DIR, app_dir, ignore=SCRATCH_IGNORE)
+    # The offertory template lives next to the app folder
+    template = os.path.join(os.path.dirname(APP_DIR), "Offertory_Report_Template.xlsx")
+    if os.path.exists(template):
+        shutil.copy(template, scratch_dir)
+    with open(os.path.join(app_dir, "receipt_counter.txt"), 'w') as f:
+        f.write("0")
+
+    receipts_dir = os.path.join(app_dir, "Receipts store")
+    os.makedirs(receipts_dir, exist_ok=True)
+    ledger = ReceiptLedger(os.path.join(receipts_dir, "receipt_ledger.db"))
+    if history:
+        first_sunday = service_date - datetime.timedelta(weeks=52)
+        ledger.record_many(ParishGenerator(seed=seed).receipts(history, first_sunday, years=1), source='imported')
+    # An import of an empty folder marks the ledger ready for the report generators
+    empty_dir = os.path.join(scratch_dir, "empty")
+    os.makedirs(empty_dir, exist_ok=True)
+    ledger.import_legacy(result_dirs=[empty_dir])
+    return app_dir
+
+
+def start_app(app_dir, environment, server, workers, threads):
+    """
+    Start the web app in app_dir
+    Returns:
+        (process, base URL)
+    """
+    port = _free_port()
+    if server == 'gunicorn':
+        command = [sys.executable, "-m", "gunicorn", "-w", str(workers), "--threads", str(threads),
+                   "-b", f"127.0.0.1:{port}", "--timeout", str(REQUEST_TIMEOUT), "web_invoice_app:app"]
+    else:
+        command = [sys.executable, "-c",
+                   f"from web_invoice_app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    log = open(os.path.join(app_dir, "server.log"), 'w')
+    process = subprocess.Popen(command, cwd=app_dir, env=dict(os.environ, **environment),
+                               stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Web app exited during start-up, see {log.name}")
+        try:
+            if requests.get(f"{url}/api/health", timeout=2).ok:
+                return process, url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"Web app did not start within 60 seconds, see {log.name}")
+
+
+class SundayRush:
+    """Builds and sends the requests of one run and records their outcome"""
+
+    def __init__(self, url, service_date, forms, seed=1, async_uploads=False):
+        self.url = url
+        self.service_date = service_date
+        self.forms = forms
+        self.async_uploads = async_uploads
+        self.generator = ParishGenerator(seed=seed + 1)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.samples = []
+        self.receipt_numbers = []
+        self.posted_receipts = []
+        self._next_form = 0
+
+    @property
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _form(self):
+        with self.lock:
+            path = self.forms[self._next_form % len(self.forms)]
+            self._next_form += 1
+        return path
+
+    def _receipt(self):
+        with self.lock:
+            generator = self.generator
+            return generator.receipt(generator.donors[generator.rng.randrange(len(generator.donors))],
+                                     self.service_date)
+
+    def send(self, route, scheduled_at):
+        """Send one request; failures are recorded, never raised"""
+        started = time.perf_counter()
+        try:
+            error = getattr(self, f"_send_{route.strip('/').replace('/', '_')}")()
+        except requests.RequestException as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+        with self.lock:
+            self.samples.append({'route': route, 'latency': finished - scheduled_at,
+                                 'service': finished - started, 'finished': finished, 'error': error})
+
+    def _send_api_upload(self):
+        path = self._form()
+        with open(path, 'rb') as f:
+            response = self.session.post(f"{self.url}/api/upload", files={'file': (os.path.basename(path), f, 'image/jpeg')},
+                                         params={'async': '1'} if self.async_uploads else None,
+                                         timeout=REQUEST_TIMEOUT)
+        if self.async_uploads and response.status_code == 202:
+            return self._wait_for_job(response.json()['status_url'])
+        if response.status_code != 200:
+            return f"HTTP {response.status_code}"
+        if not response.json().get('extracted_data'):
+            return "empty extraction"
+        return None
+
+    def _wait_for_job(self, status_url):
+        deadline = time.time() + REQUEST_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(0.25)
+            job = self.session.get(f"{self.url}{status_url}", timeout=REQUEST_TIMEOUT).json()
+            if job.get('status') == 'succeeded':
+                return None
+            if job.get('status') == 'failed':
+                return "job failed"
+        return "job timed out"
+
+    def _send_upload(self):
+        path = self._form()
+        with open(path, 'rb') as f:
+            response = self.session.post(f"{self.url}/upload", files={'file': (os.path.basename(path), f, 'image/jpeg')},
+                                         timeout=REQUEST_TIMEOUT, allow_redirects=False)
+        # Errors are flashed and redirected back to the form
+        return None if response.status_code == 200 else f"HTTP {response.status_code}"
+
+    def _send_generate_receipt(self):
+        receipt = self._receipt()
+        form = {key: ('' if value is None else value) for key, value in receipt.items()}
+        response = self.session.post(f"{self.url}/generate_receipt", data=form,
+                                     timeout=REQUEST_TIMEOUT, allow_redirects=False)
+        if response.status_code != 200:
+            return f"HTTP {response.status_code}"
+        numbers = set(RECEIPT_NUMBER.findall(response.text))
+        if len(numbers) != 1:
+            return "no receipt number"
+        with self.lock:
+            self.receipt_numbers.append(int(numbers.pop()))
+            self.posted_receipts.append(receipt)
+        return None
+
+    def _send_reports(self):
+        response = self.session.get(f"{self.url}/reports", timeout=REQUEST_TIMEOUT, allow_redirects=False)
+        return None if response.status_code == 200 else f"HTTP {response.status_code}"
+
+    def _send_generate_offertory_report(self):
+        response = self.session.post(f"{self.url}/generate_offertory_report",
+                                     data={'service_date': str(self.service_date), 'service_type': 'Worship Service'},
+                                     timeout=REQUEST_TIMEOUT, allow_redirects=False)
+        return None if response.status_code == 200 else f"HTTP {response.status_code}"
+
+    def run(self, schedule, concurrency):
+        """Send the scheduled requests open-loop; returns the wall time in seconds"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rush") as executor:
+            for offset, route in schedule:
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, route, start + offset)
+        return time.perf_counter() - start
+
+
+def route_stats(samples, wall_seconds):
+    """Throughput, error rate and latency percentiles per route and overall"""
+    by_route = {}
+    for sample in samples:
+        by_route.setdefault(sample['route'], []).append(sample)
+    by_route['all'] = samples
+
+    stats = {}
+    for route, route_samples in by_route.items():
+        if not route_samples:
+            continue
+        latencies = [sample['latency'] for sample in route_samples]
+        errors = Counter(sample['error'] for sample in route_samples if sample['error'])
+        stats[route] = {
+            'requests': len(route_samples),
+            'throughput_per_min': len(route_samples) / wall_seconds * 60,
+            'error_rate': sum(errors.values()) / len(route_samples),
+            'errors': dict(errors),
+            'p50_ms': harness.percentile(latencies, 0.50) * 1000,
+            'p95_ms': harness.percentile(latencies, 0.95) * 1000,
+            'p99_ms': harness.percentile(latencies, 0.99) * 1000,
+            'max_ms': max(latencies) * 1000,
+            'mean_service_ms': sum(sample['service'] for sample in route_samples) / len(route_samples) * 1000,
+        }
+    return stats
+
+
+def _csv_row_problem(row):
+    """Describe what is wrong with one Extract.csv row, or None if it is sound"""
+    if len(row) != len(CSV_HEADERS):
+        return f"{len(row)} fields instead of {len(CSV_HEADERS)}"
+    data = dict(zip(CSV_HEADERS, row))
+    try:
+        datetime.date.fromisoformat(data['InvoiceDate'])
+    except ValueError:
+        return f"bad InvoiceDate {data['InvoiceDate']!r}"
+    if not data['Name'].strip():
+        return "empty Name"
+    for field in AMOUNT_FIELDS + ['Total']:
+        try:
+            float(data[field] or 0)
+        except ValueError:
+            return f"bad {field} {data[field]!r}"
+    if ReceiptRecord(data).total != round(float(data['Total'] or 0) * 100):
+        return "Total does not match the amounts"
+    return None
+
+
+def check_integrity(rush, app_dir=None, since=None):
+    """
+    Look for duplicated receipt numbers, lost receipts and corrupted rows
+    Args:
+        rush: The finished SundayRush
+        app_dir: Folder the app ran in; without it only the responses are checked
+        since: Start of the run; older Extract.csv rows are only checked for corruption
+    Returns:
+        Dictionary of findings; every list is empty after a clean run
+    """
+    counts = Counter(rush.receipt_numbers)
+    findings = {
+        'receipts_generated': len(rush.receipt_numbers),
+        'duplicate_numbers_in_responses': sorted(number for number, count in counts.items() if count > 1),
+    }
+    if not app_dir:
+        return findings
+
+    audit = ReceiptNumberAllocator(counter_path=os.path.join(app_dir, "receipt_counter.txt"),
+                                   receipts_dir=os.path.join(app_dir, "Receipts store")).audit()
+    findings['duplicate_reservations'] = audit['duplicate_reservations']
+    findings['duplicate_receipt_files'] = sorted(audit['duplicate_receipts'])
+
+    ledger = ReceiptLedger(os.path.join(app_dir, "Receipts store", "receipt_ledger.db"))
+    with ledger._connect() as conn:
+        findings['duplicate_numbers_in_ledger'] = [int(number) for number, in conn.execute(
+            "SELECT receipt_no FROM receipts WHERE source = 'generated' AND receipt_no IS NOT NULL "
+            "GROUP BY receipt_no HAVING COUNT(*) > 1")]
+        findings['ledger_rows'] = conn.execute(
+            "SELECT COUNT(*) FROM receipts WHERE source = 'generated'").fetchone()[0]
+
+    corrupted, rows = [], Counter()
+    for csv_path in ledger_files(os.path.join(app_dir, "Extract.csv")):
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            if next(reader, None) != CSV_HEADERS:
+                corrupted.append(f"{os.path.basename(csv_path)}: missing or damaged header")
+            for row in reader:
+                problem = _csv_row_problem(row)
+                if problem:
+                    corrupted.append(f"{os.path.basename(csv_path)} line {reader.line_num}: {problem}")
+                    continue
+                data = dict(zip(CSV_HEADERS, row))
+                if not since or data['ProcessedDateTime'] >= f"{since:%Y-%m-%d %H:%M:%S}":
+                    rows[(data['InvoiceDate'], ReceiptRecord(data).total)] += 1
+    posted = Counter((receipt['InvoiceDate'], ReceiptRecord(receipt).total) for receipt in rush.posted_receipts)
+    findings['csv_rows'] = sum(rows.values()) + len(corrupted)
+    findings['corrupted_csv_rows'] = corrupted
+    findings['receipts_missing_from_csv'] = sum((posted - rows).values())
+    findings['unexpected_csv_rows'] = sum((rows - posted).values())
+    return findings
+
+
+def print_report(stats, findings, wall_seconds):
+    print(f"\n{'Route':<28} {'reqs':>6} {'req/min':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    for route, route_stats_ in stats.items():
+        print(f"{route:<28} {route_stats_['requests']:>6} {route_stats_['throughput_per_min']:>8.1f} "
+              f"{route_stats_['error_rate']:>6.1%} {route_stats_['p50_ms']:>9.0f} {route_stats_['p95_ms']:>9.0f} "
+              f"{route_stats_['p99_ms']:>9.0f} {route_stats_['max_ms']:>9.0f}")
+        for error, count in route_stats_['errors'].items():
+            print(f"{'':<30}{count} x {error}")
+    print(f"\nWall time {wall_seconds:.1f}s")
+    print("\nIntegrity checks")
+    for name, value in findings.items():
+        flag = "FAIL" if isinstance(value, list) and value or \
+            name in ('receipts_missing_from_csv', 'unexpected_csv_rows') and value else ""
+        shown = value if not isinstance(value, list) else f"{len(value)} {value[:10] if value else ''}"
+        print(f"  {name:<34} {shown} {flag}")
+
+
+def parse_rates(overrides, scale):
+    rates = dict(DEFAULT_RATES)
+    for override in overrides:
+        route, _, per_minute = override.partition('=')
+        if route not in rates:
+            raise ValueError(f"Unknown route {route}; expected one of {', '.join(rates)}")
+        rates[route] = float(per_minute)
+    return {route: per_minute * scale for route, per_minute in rates.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a Sunday rush against the web app")
+    parser.add_argument("--duration", type=float, default=120, help="Length of the run in seconds (1800 = real time)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every arrival rate")
+    parser.add_argument("--rate", action="append", default=[], metavar="ROUTE=PER_MIN",
+                        help="Override one route's arrivals per minute")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at most (client threads)")
+    parser.add_argument("--async-uploads", action="store_true",
+                        help="Upload through /api/upload?async=1 and time until the job finishes")
+    parser.add_argument("--distinct-forms", type=int, default=60, help="Different form images to upload")
+    parser.add_argument("--history", type=int, default=2000, help="Receipts in the scratch ledger before the run")
+    parser.add_argument("--server", choices=['gunicorn', 'flask'], default=None,
+                        help="How to run the scratch app (default: gunicorn when installed)")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--url", default=None, help="Load an already running app instead of a scratch copy")
+    parser.add_argument("--app-dir", default=None, help="Folder the --url app runs in, for the integrity checks")
+    parser.add_argument("--stub-url", default=None, help="Use a running azure_stub_server instead of starting one")
+    parser.add_argument("--chat-latency", default=None, help="Stub GPT-4o latency (see azure_stub_server)")
+    parser.add_argument("--stub-throttle-rate", type=float, default=None, help="Share of stub calls answered 429")
+    parser.add_argument("--stub-error-rate", type=float, default=None, help="Share of stub calls answered 5xx")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch copy for inspection")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for arrivals and data")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/load_<timestamp>.json)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rates = parse_rates(args.rate, args.scale)
+    schedule = arrival_schedule(rates, args.duration, rng)
+    service_date = last_sunday()
+    scratch_dir = tempfile.mkdtemp(prefix="sunday_rush_")
+    stub = process = None
+    try:
+        forms_dir = os.path.join(scratch_dir, "forms")
+        os.makedirs(forms_dir)
+        uploads = sum(1 for _, route in schedule if route in ('/api/upload', '/upload'))
+        form_receipts = ParishGenerator(seed=args.seed + 2).receipts(max(1, min(uploads, args.distinct_forms)),
+                                                                     service_date, years=1 / 52)
+        forms = []
+        for index, receipt in enumerate(form_receipts):
+            forms.append(os.path.join(forms_dir, f"form_{index + 1:06d}.jpg"))
+            render_form(receipt, forms[-1])
+
+        app_dir = args.app_dir
+        url = args.url
+        if not url:
+            if args.stub_url:
+                stub_url = args.stub_url
+            else:
+                config = StubConfig.from_env()
+                for field, value in (('chat_latency', args.chat_latency), ('throttle_rate', args.stub_throttle_rate),
+                                     ('error_rate', args.stub_error_rate)):
+                    if value is not None:
+                        setattr(config, field, value)
+                stub = start_stub_server(config)
+                stub_url = stub.url
+            app_dir = prepare_scratch_app(scratch_dir, args.history, service_date, args.seed)
+            server = args.server or ('gunicorn' if importlib.util.find_spec("gunicorn") else 'flask')
+            environment = dict(stub_environment(stub_url),
+                               RECEIPT_LEDGER_DB=os.path.join(app_dir, "Receipts store", "receipt_ledger.db"))
+            process, url = start_app(app_dir, environment, server, args.workers, args.threads)
+            print(f"App ({server}) at {url} in {app_dir}, extraction stub at {stub_url}")
+
+        print(f"Replaying {len(schedule)} requests over {args.duration:.0f}s "
+              f"({', '.join(f'{route} {rate:g}/min' for route, rate in rates.items())}), "
+              f"concurrency {args.concurrency}")
+        rush = SundayRush(url, service_date, forms, seed=args.seed, async_uploads=args.async_uploads)
+        started_at = datetime.datetime.now().replace(microsecond=0)
+        wall_seconds = rush.run(schedule, args.concurrency)
+
+        stats = route_stats(rush.samples, wall_seconds)
+        findings = check_integrity(rush, app_dir, started_at)
+        print_report(stats, findings, wall_seconds)
+        if stub:
+            print(f"\nStub counters: {json.dumps(stub.state.stats()['counters'])}")
+
+        output = args.output or os.path.join(RESULTS_DIR, f"load_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+        harness.save_results(output, {'arguments': vars(args), 'rates': rates, 'wall_seconds': wall_seconds,
+                                      'routes': stats, 'integrity': findings})
+        print(f"\nResults saved to {output}")
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        if stub:
+            stub.shutdown()
+        if args.keep:
+            print(f"Scratch copy kept in {scratch_dir}")
+        else:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
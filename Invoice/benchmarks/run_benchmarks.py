@@ -0,0 +1,197 @@
+"""
+Receipt and Report Benchmark Suite
+Measures the receipt and report hot paths so library upgrades and code
+changes can be compared run against run.
+
+Receipt rendering, saving (JPG, PDF and PNG separately), number_to_words
+and export_to_csv are measured once, as are GPT-4o and Content
+Understanding extraction against an in-process azure_stub_server with no
+injected latency (client, JSON and polling overhead only). The ledger-backed paths
+(collect_receipt_data, generate_summary_report, the Excel, PDF and CSV
+offertory reports) are measured for every data size, each against its
+own temporary ledger of synthetic_parish receipts. Nothing is written to the real
+ledger, Extract.csv or report folders, and the report cache is off so
+every report is really built. Results are printed and saved as JSON.
+
+The focused scripts next to this one (bench_receipt_background.py,
+bench_summary_aggregation.py, bench_offertory_pdf.py) compare an old and
+new implementation of one path and check that both give the same output.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 10,1000,100000] [--only NAME]
+                                           [--output results.json] [--compare baseline.json]
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import datetime
+import tempfile
+import contextlib
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = tempfile.mkdtemp(prefix="receipt_bench_")
+# Must be set before the app modules read them at import time
+os.environ["RECEIPT_LEDGER_DB"] = os.path.join(BENCH_DIR, "receipt_ledger.db")
+os.environ["REPORT_CACHE"] = "0"
+os.environ["EXTRACTION_CACHE"] = "0"
+
+import harness
+import printreceipt
+import receipt_ledger
+from synthetic_parish import ParishGenerator
+from azure_stub_server import StubConfig, start_stub_server, stub_environment
+from invoiceanalyzer import export_to_csv, AzureContentUnderstandingClient
+from OpenAImodel.extractor import extract_fields
+from offertory_report import OffertoryReportGenerator
+from csv_report import CSVReportGenerator
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+FIRST_SUNDAY = datetime.date(2025, 1, 5)
+FORM_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Payment_form_Church.JPG")
+
+SAMPLE_RECEIPT = {
+    'InvoiceDate': '2025-07-06',
+    'Name': 'Diana Moses More',
+    'Address': 'B305 Cassiopeia Classic, Baner, Pune',
+    'TitheMonth': 'JULY',
+    'TitheAmount': 1000.0,
+    'MembershipMonth': 'JULY',
+    'MembershipAmount': 200.0,
+    'DonationFor': 'Building Fund',
+    'DonationAmount': 500.0,
+    'OnlineChequeNo': '45435345',
+    'PaymentMethod': 'CHEQUE',
+    # Fixed number so the benchmark does not touch receipt_counter.txt
+    'ReceiptNo': '9999'
+}
+
+
+def use_ledger(count):
+    """
+    Point the app at a fresh ledger of count synthetic receipts, about 20 per
+    Sunday over up to a year
+    Returns:
+        The busiest service date in the ledger
+    """
+    db_path = os.path.join(BENCH_DIR, f"ledger_{count}.db")
+    ledger = receipt_ledger.ReceiptLedger(db_path)
+    weeks = max(1, min(52, count // 20))
+    receipts = ParishGenerator(seed=11).receipts(count, FIRST_SUNDAY, years=weeks / 52)
+    ledger.record_many(receipts)
+    # An import of an empty folder marks the ledger ready for the report generators
+    empty_dir = os.path.join(BENCH_DIR, "empty")
+    os.makedirs(empty_dir, exist_ok=True)
+    ledger.import_legacy(result_dirs=[empty_dir])
+    receipt_ledger.LEDGER_DB = db_path
+    receipt_ledger._default_ledger = ledger
+    return Counter(receipt['InvoiceDate'] for receipt in receipts).most_common(1)[0][0]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the DEBUG prints of the receipt code while it is timed"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def receipt_benchmarks():
+    """Size-independent benchmarks: (name, function)"""
+    image = printreceipt.generate_receipt(dict(SAMPLE_RECEIPT))['image']
+    csv_path = os.path.join(BENCH_DIR, "Extract.csv")
+    numbers = list(range(1, 100000, 997))
+
+    def save(formats):
+        def run():
+            for path in printreceipt.save_receipt_multiple_formats(image, "benchmark_receipt", formats):
+                os.remove(path)
+        return run
+
+    return [
+        ("printreceipt.generate_receipt", lambda: printreceipt.generate_receipt(dict(SAMPLE_RECEIPT))),
+        ("save_receipt_multiple_formats[jpg]", save(["jpg"])),
+        ("save_receipt_multiple_formats[pdf]", save(["pdf"])),
+        ("save_receipt_multiple_formats[png]", save(["png"])),
+        (f"number_to_words[x{len(numbers)}]", lambda: [printreceipt.number_to_words(n) for n in numbers]),
+        ("export_to_csv", lambda: export_to_csv(dict(SAMPLE_RECEIPT), csv_path)),
+    ]
+
+
+def extraction_benchmarks():
+    """Extraction against a local stub that answers at once: (name, function)"""
+    server = start_stub_server(StubConfig(latency='0', chat_latency='0', analyze_time='0'))
+    os.environ.update(stub_environment(server.url))
+    client = AzureContentUnderstandingClient(server.url, "2025-05-01-preview", subscription_key="stub-key")
+
+    def analyze():
+        response = client.begin_analyze("invoice-analyzer", FORM_IMAGE, use_cache=False)
+        client.poll_result(response)
+
+    return [
+        ("extract_fields[stub]", lambda: extract_fields(FORM_IMAGE)),
+        ("content_understanding_analyze[stub]", analyze),
+    ]
+
+
+def ledger_benchmarks(count):
+    """Benchmarks over a ledger of count receipts: (name, function)"""
+    service_date = use_ledger(count)
+    generator = OffertoryReportGenerator()
+    csv_generator = CSVReportGenerator()
+    # Report output goes to the scratch folder, not Receipts store
+    generator.output_dir = csv_generator.output_dir = csv_generator.csv_output_dir = BENCH_DIR
+    start_date, end_date = str(FIRST_SUNDAY - datetime.timedelta(days=6)), str(FIRST_SUNDAY + datetime.timedelta(weeks=52))
+    return [
+        (f"collect_receipt_data[all,n={count}]", lambda: generator.collect_receipt_data()),
+        (f"collect_receipt_data[date,n={count}]", lambda: generator.collect_receipt_data(service_date)),
+        (f"generate_summary_report[n={count}]", lambda: generator.generate_summary_report(start_date, end_date)),
+        (f"generate_offertory_report[n={count}]", lambda: generator.generate_offertory_report(service_date)),
+        (f"generate_offertory_report_pdf[n={count}]", lambda: generator.generate_offertory_report_pdf(service_date)),
+        (f"generate_csv_offertory_report[n={count}]",
+         lambda: csv_generator.generate_csv_offertory_report(service_date)),
+    ]
+
+
+def run(sizes, only=None, min_seconds=1.0):
+    print(harness.RESULT_HEADER)
+    results = []
+    groups = [receipt_benchmarks, extraction_benchmarks] + [lambda count=count: ledger_benchmarks(count) for count in sizes]
+    for group in groups:
+        with quiet():
+            benchmarks = group()
+        for name, function in benchmarks:
+            if only and only not in name:
+                continue
+            with quiet():
+                result = dict(harness.measure(function, min_seconds=min_seconds), name=name)
+            results.append(result)
+            print(harness.format_result(result), flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the receipt and report hot paths")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated ledger sizes (receipts)")
+    parser.add_argument("--only", default=None, help="Run only benchmarks whose name contains this text")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Minimum time spent timing each benchmark")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    try:
+        results = run([int(size) for size in args.sizes.split(',') if size], args.only, args.min_seconds)
+    finally:
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    print(f"\nResults saved to {harness.save_results(output, results)}")
+
+    if args.compare:
+        print(f"\n{'Benchmark':<48} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+        for name, before, after, ratio, verdict in harness.compare(harness.load_results(args.compare),
+                                                                   harness.load_results(output)):
+            print(f"{name:<48} {before:>10.2f} {after:>10.2f} {ratio:>7.2f} {verdict}")
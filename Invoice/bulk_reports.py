@@ -0,0 +1,245 @@
+"""
+Bulk Offertory Reports
+Generates the offertory report for every service date in a date range.
+
+The receipts for the whole range are loaded once (from the ledger when it
+is ready) and partitioned by service date, instead of every report
+re-collecting all receipts. Each date's reports are rendered on a process
+pool, in any of PDF, Excel and CSV, and everything is bundled into one ZIP
+with an index.html listing each date, its receipts and total, and its
+report files. Unchanged reports are served from the report cache.
+A date that fails is listed in the index; it never aborts the rest.
+
+The pool always starts its processes with 'spawn', so it is safe to use
+from a threaded web worker; the web app runs bulk jobs in the background
+through the upload job store.
+
+Usage: python bulk_reports.py <start YYYY-MM-DD> <end YYYY-MM-DD> [--formats pdf,excel,csv] [--workers N]
+"""
+
+import os
+import html
+import zipfile
+import argparse
+import tempfile
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.utils import secure_filename
+
+from receipt_record import as_records
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Served by /download_report alongside the single-date reports
+BULK_DIR = os.path.join(SCRIPT_DIR, "Receipts store", "Reports")
+REPORT_FORMATS = ('pdf', 'excel', 'csv')
+
+
+def parse_date_range(start_date, end_date):
+    """
+    Validate an inclusive service date range
+    Args:
+        start_date, end_date: datetime.date or YYYY-MM-DD strings
+    Returns:
+        Tuple of (start, end) as YYYY-MM-DD strings
+    Raises:
+        ValueError: If a date is not a valid YYYY-MM-DD date or start is after end
+    """
+    dates = []
+    for label, value in (('start_date', start_date), ('end_date', end_date)):
+        if not isinstance(value, datetime.date):
+            try:
+                value = datetime.date.fromisoformat(str(value))
+            except ValueError:
+                raise ValueError(f"{label} must be a date in YYYY-MM-DD format") from None
+        dates.append(value)
+    if dates[0] > dates[1]:
+        raise ValueError("Start date is after end date")
+    return dates[0].isoformat(), dates[1].isoformat()
+
+
+def check_formats(formats):
+    """Return the requested report formats in lower case, raising ValueError for unknown ones"""
+    formats = [report_format.strip().lower() for report_format in formats]
+    unknown = [report_format for report_format in formats if report_format not in REPORT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown report format(s): {', '.join(unknown) or 'none given'}")
+    return formats
+
+
+def bulk_zip_filename(start_date, end_date, service_type):
+    """File name of the ZIP for a range, safe to use whatever the service type contains"""
+    return f"Offertory_Reports_{start_date}_to_{end_date}_{secure_filename(service_type) or 'Service'}.zip"
+
+
+def load_range_receipts(start_date, end_date):
+    """Return every receipt dated within the inclusive range, read once"""
+    from receipt_ledger import get_receipt_ledger, ledger_ready
+    if ledger_ready():
+        return get_receipt_ledger().query(start_date=start_date, end_date=end_date)
+
+    from offertory_report import OffertoryReportGenerator
+    return [receipt for receipt in OffertoryReportGenerator().collect_receipt_data()
+            if start_date <= str(receipt.get('InvoiceDate') or '').split('T')[0] <= end_date]
+
+
+def partition_by_date(receipts):
+    """Group receipt data dictionaries by service date, in date order"""
+    by_date = {}
+    for receipt in receipts:
+        service_date = str(receipt.get('InvoiceDate') or '').split('T')[0]
+        if service_date:
+            by_date.setdefault(service_date, []).append(receipt)
+    return dict(sorted(by_date.items()))
+
+
+def _render_reports(service_date, service_type, receipts_data, formats):
+    """Process pool worker: render the requested reports for one service date"""
+    from offertory_report import OPENPYXL_AVAILABLE, PDF_AVAILABLE
+    from csv_report import CSVReportGenerator
+
+    generator = CSVReportGenerator()
+    builders = {
+        'pdf': (PDF_AVAILABLE, generator.generate_offertory_report_pdf),
+        'excel': (OPENPYXL_AVAILABLE, generator.generate_offertory_report),
+        'csv': (True, generator.generate_csv_offertory_report),
+    }
+    result = {'date': service_date, 'status': 'ok', 'files': [], 'errors': []}
+    for report_format in formats:
+        available, build = builders[report_format]
+        if not available:
+            result['errors'].append(f"{report_format}: not available on this server")
+            continue
+        try:
+            result['files'].append(build(service_date, service_type, receipts_data=receipts_data))
+        except Exception as e:
+            result['errors'].append(f"{report_format}: {e}")
+    if result['errors']:
+        result['status'] = 'error' if not result['files'] else 'partial'
+    return result
+
+
+def generate_bulk_reports(start_date, end_date, service_type="Worship Service", formats=('pdf',), workers=None,
+                          progress=None):
+    """
+    Generate offertory reports for every service date in a range
+    Args:
+        start_date, end_date: Inclusive YYYY-MM-DD range
+        service_type: Service type printed on every report
+        formats: Any of 'pdf', 'excel' and 'csv'
+        workers: Process pool size (defaults to the CPU count)
+        progress: Optional function called as progress(stage, percent)
+    Returns:
+        Dictionary with the ZIP path and one result entry per service date
+    Raises:
+        ValueError: If the date range or a format is invalid
+    """
+    formats = check_formats(formats)
+    start_date, end_date = parse_date_range(start_date, end_date)
+    progress = progress or (lambda stage, percent: None)
+
+    progress('loading receipts', 10)
+    by_date = partition_by_date(load_range_receipts(start_date, end_date))
+
+    results = []
+    if by_date:
+        workers = workers or min(len(by_date), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {
+                executor.submit(_render_reports, service_date, service_type, receipts, formats): service_date
+                for service_date, receipts in by_date.items()
+            }
+            for future in as_completed(futures):
+                service_date = futures[future]
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool as e:
+                    results.append({'date': service_date, 'status': 'error', 'files': [],
+                                    'errors': [f"Worker crashed: {e}"]})
+                progress('rendering', 10 + 80 * len(results) // len(futures))
+
+    results.sort(key=lambda result: result['date'])
+    for result in results:
+        records = as_records(by_date[result['date']])
+        result['receipts'] = len(records)
+        result['total'] = sum(record.total for record in records) / 100
+
+    progress('zipping', 90)
+    zip_path = _write_bulk_zip(start_date, end_date, service_type, results)
+    return {
+        'zip_path': zip_path,
+        'dates': len(results),
+        'generated': sum(len(result['files']) for result in results),
+        'failed': sum(1 for result in results if result['status'] != 'ok'),
+        'results': results
+    }
+
+
+def _index_html(start_date, end_date, service_type, results):
+    """Index page listing every service date with links to its reports"""
+    rows = []
+    for result in results:
+        links = " ".join(f'<a href="{html.escape(os.path.basename(path))}">{html.escape(os.path.basename(path))}</a>'
+                         for path in result['files'])
+        errors = html.escape("; ".join(result['errors']))
+        rows.append(f"<tr><td>{result['date']}</td><td>{result['receipts']}</td>"
+                    f"<td>{result['total']:.2f}</td><td>{links}</td><td>{errors}</td></tr>")
+    grand_total = sum(result['total'] for result in results)
+    return f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Offertory Reports {start_date} to {end_date}</title></head>
+<body>
+<h1>Offertory Reports</h1>
+<p>{html.escape(service_type)}: {start_date} to {end_date}, generated {datetime.datetime.now():%Y-%m-%d %H:%M}</p>
+<table border="1" cellpadding="4" cellspacing="0">
+<tr><th>Date</th><th>Receipts</th><th>Total (&#8377;)</th><th>Reports</th><th>Errors</th></tr>
+{chr(10).join(rows)}
+<tr><th>Total</th><th>{sum(result['receipts'] for result in results)}</th><th>{grand_total:.2f}</th><th></th><th></th></tr>
+</table>
+</body>
+</html>
+"""
+
+
+def _write_bulk_zip(start_date, end_date, service_type, results):
+    """Bundle every report and the index page into one ZIP"""
+    os.makedirs(BULK_DIR, exist_ok=True)
+    zip_name = bulk_zip_filename(start_date, end_date, service_type)
+    zip_path = os.path.join(BULK_DIR, zip_name)
+    # A temp file of its own, so two jobs for the same range (even threads of
+    # one process) never write into the same file before it is published
+    fd, temp_path = tempfile.mkstemp(prefix=f"{zip_name}.", suffix=".tmp", dir=BULK_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as f, zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for result in results:
+                for file_path in result['files']:
+                    archive.write(file_path, os.path.basename(file_path))
+            archive.writestr('index.html', _index_html(start_date, end_date, service_type, results))
+        os.replace(temp_path, zip_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return zip_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate offertory reports for every service date in a range")
+    parser.add_argument("start_date", help="First service date (YYYY-MM-DD)")
+    parser.add_argument("end_date", help="Last service date (YYYY-MM-DD)")
+    parser.add_argument("--service-type", default="Worship Service", help="Service type printed on the reports")
+    parser.add_argument("--formats", default="pdf", help="Comma-separated report formats: pdf, excel, csv")
+    parser.add_argument("--workers", type=int, default=None, help="Number of rendering processes")
+    args = parser.parse_args()
+
+    summary = generate_bulk_reports(args.start_date, args.end_date, args.service_type,
+                                    args.formats.split(','), workers=args.workers)
+    for result in summary['results']:
+        line = f"{result['date']}: {result['receipts']} receipts, {len(result['files'])} reports"
+        if result['errors']:
+            line += f" - FAILED {'; '.join(result['errors'])}"
+        print(line)
+    print(f"\n{summary['dates']} dates, {summary['generated']} reports, {summary['failed']} with errors")
+    print(f"ZIP: {summary['zip_path']}")
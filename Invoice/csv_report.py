@@ -5,7 +5,10 @@ CSV Report Generator as alternative to Excel
 import csv
 import os
 from datetime import datetime
+from werkzeug.utils import secure_filename
 from offertory_report import OffertoryReportGenerator
+from receipt_record import as_records
+from report_cache import get_or_build, report_fingerprint
 
 class CSVReportGenerator(OffertoryReportGenerator):
     """Extended report generator that can create CSV reports"""
@@ -16,18 +19,27 @@ class CSVReportGenerator(OffertoryReportGenerator):
         self.csv_output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Receipts store", "CSV_Reports")
         os.makedirs(self.csv_output_dir, exist_ok=True)
     
-    def generate_csv_offertory_report(self, service_date=None, service_type="Worship Service"):
+    def generate_csv_offertory_report(self, service_date=None, service_type="Worship Service", receipts_data=None):
         """Generate CSV version of offertory report"""
         if service_date is None:
             service_date = datetime.date.today().strftime("%Y-%m-%d")
         
-        # Collect receipt data for the specified date
-        receipts_data = self.collect_receipt_data(service_date)
+        # Collect receipt data for the specified date, parsed once for both sections
+        if receipts_data is None:
+            receipts_data = self.collect_receipt_data(service_date)
+        receipts_data = as_records(receipts_data)
         
-        # Generate filename
-        report_filename = f"Offertory_Report_{service_date}_{service_type.replace(' ', '_')}.csv"
+        # Generate filename; an unchanged report is served from disk
+        report_filename = f"Offertory_Report_{service_date}_{secure_filename(service_type)}.csv"
         report_path = os.path.join(self.csv_output_dir, report_filename)
-        
+        fingerprint = report_fingerprint(receipts_data, service_type)
+        report_path, _ = get_or_build(
+            report_path, fingerprint,
+            lambda path: self._write_csv_offertory_report(path, service_date, service_type, receipts_data))
+        return report_path
+    
+    def _write_csv_offertory_report(self, report_path, service_date, service_type, receipts_data):
+        """Write the CSV offertory report for one service to report_path"""
         # Create CSV report
         with open(report_path, 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.writer(csvfile)
@@ -44,21 +56,7 @@ class CSVReportGenerator(OffertoryReportGenerator):
             writer.writerow(['Denomination', '1000x', '500x', '200x', '100x', '50x', '20x', '10x', 'Coins', 'Total'])
             
             # Calculate totals for cash contributions
-            total_cash = 0
-            for receipt in receipts_data:
-                payment_method = receipt.get('PaymentMethod', 'CASH')
-                if payment_method.upper() == 'CASH':
-                    for field in ['TitheAmount', 'MembershipAmount', 'BirthdayThankOffering',
-                                 'WeddingAnniversaryThankOffering', 'SpecialThanksAmount',
-                                 'MissionAndEvangelismFund', 'CharityFundAmount',
-                                 'StStephensSocialAidFund', 'HarvestAuctionAmount',
-                                 'DonationAmount']:
-                        amount = receipt.get(field, 0)
-                        if amount:
-                            try:
-                                total_cash += float(amount)
-                            except (ValueError, TypeError):
-                                continue
+            total_cash = self._cash_total_for_date(service_date, receipts_data)
             
             # Placeholder for manual cash breakdown (would need to be filled manually)
             writer.writerow(['1st Off', '-', '-', '-', '-', '-', '-', '-', '-', ''])
@@ -75,55 +73,15 @@ class CSVReportGenerator(OffertoryReportGenerator):
             sr_no = 1
             total_special = 0
             
-            for receipt in receipts_data:
-                name = receipt.get('Name', 'Unknown')
-                if not name or name == 'Unknown':
+            for record in receipts_data:
+                if not record.name or record.name == 'Unknown':
                     continue
                 
-                # Calculate total amount for this person
-                person_total = 0
-                contributions = []
-                
-                # Check all contribution types
-                contribution_types = {
-                    'TitheAmount': 'Tithe',
-                    'MembershipAmount': 'Membership',
-                    'BirthdayThankOffering': 'Birthday Offering',
-                    'WeddingAnniversaryThankOffering': 'Anniversary Offering',
-                    'SpecialThanksAmount': 'Special Thanks',
-                    'MissionAndEvangelismFund': 'Mission & Evangelism',
-                    'CharityFundAmount': 'Charity Fund',
-                    'StStephensSocialAidFund': 'Social Aid',
-                    'HarvestAuctionAmount': 'Harvest Auction',
-                    'DonationAmount': 'Donation'
-                }
-                
-                for field, description in contribution_types.items():
-                    amount = receipt.get(field, 0)
-                    if amount:
-                        try:
-                            amount_val = float(amount)
-                            if amount_val > 0:
-                                person_total += amount_val
-                                
-                                # Add specific details
-                                if field == 'TitheAmount' and receipt.get('TitheMonth'):
-                                    contributions.append(f"{description} ({receipt.get('TitheMonth')})")
-                                elif field == 'MembershipAmount' and receipt.get('MembershipMonth'):
-                                    contributions.append(f"{description} ({receipt.get('MembershipMonth')})")
-                                elif field == 'DonationAmount' and receipt.get('DonationFor'):
-                                    contributions.append(f"{description} ({receipt.get('DonationFor')})")
-                                elif field == 'HarvestAuctionAmount' and receipt.get('HarvestAuctionComment'):
-                                    contributions.append(f"{description} ({receipt.get('HarvestAuctionComment')})")
-                                else:
-                                    contributions.append(description)
-                        except (ValueError, TypeError):
-                            continue
-                
-                if person_total > 0 and contributions:
-                    writer.writerow([sr_no, name, person_total, "; ".join(contributions)])
-                    total_special += person_total
+                if record.total > 0:
+                    writer.writerow([sr_no, record.name, record.total_rupees, record.details])
+                    total_special += record.total
                     sr_no += 1
+            total_special = total_special / 100
             
             writer.writerow([])
             writer.writerow(['GRAND TOTAL CASH (A)', total_cash])
@@ -136,8 +94,6 @@ class CSVReportGenerator(OffertoryReportGenerator):
             writer.writerow(['Generated on:', datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
             writer.writerow(['Total Individual Contributors:', sr_no - 1])
             writer.writerow(['Total Amount Collected:', total_cash + total_special])
-            
-        return report_path
     
     def generate_csv_summary_report(self, start_date=None, end_date=None):
         """Generate CSV summary report for date range"""
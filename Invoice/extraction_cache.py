@@ -0,0 +1,294 @@
+"""
+Extraction Result Cache
+Reuses extraction results for payment forms that were already analyzed.
+
+Results are stored on disk, one JSON file per form, keyed by the SHA-256 of
+the uploaded bytes together with the model (deployment or analyzer) and the
+schema version, so changing either never serves stale fields. Optionally a
+perceptual hash of the normalized image also matches re-encoded copies of
+the same photo (e.g. a form forwarded again over WhatsApp).
+
+Only successful results are stored: an error, an analysis that did not
+succeed, or a form where nothing was read is never replayed.
+
+The cache is bounded by entry count and total size; the least recently used
+entries are evicted first, down to 90% of the limits. The running count and
+size are kept in memory and the directory is only rescanned when they pass a
+limit, or every EXTRACTION_CACHE_SCAN_EVERY writes to pick up entries that
+other worker processes added. Set EXTRACTION_CACHE=0 to switch it off.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+from file_locks import atomic_write_text
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", os.path.join(SCRIPT_DIR, "Receipts store", "extraction_cache"))
+CACHE_ENABLED = os.getenv("EXTRACTION_CACHE", "1") != "0"
+CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+PERCEPTUAL_MATCHING = os.getenv("EXTRACTION_CACHE_PERCEPTUAL", "0") == "1"
+SCAN_EVERY = int(os.getenv("EXTRACTION_CACHE_SCAN_EVERY", "100"))
+EVICT_TO = 0.9
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_dhash(path, hash_size=8):
+    """
+    Return a 64-bit difference hash of the image as hex, or None
+    The image is EXIF-rotated and reduced to grayscale first, so re-encoded
+    or resized copies of the same photo usually hash the same.
+    """
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image).convert('L')
+            image = image.resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+            pixels = list(image.getdata())
+    except Exception:
+        # PDFs and unreadable images only get the exact byte match
+        return None
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def is_successful_result(result):
+    """
+    Check whether an extraction result may be cached
+    Rejects empty results, results carrying an error, Content Understanding
+    payloads whose status is not succeeded, and field dicts with no values.
+    """
+    if not isinstance(result, dict) or not result or result.get('error'):
+        return False
+    if 'status' in result:
+        return str(result['status']).lower() == 'succeeded'
+    return any(value not in (None, '') for value in result.values())
+
+
+class ExtractionCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES, perceptual=PERCEPTUAL_MATCHING, enabled=CACHE_ENABLED):
+        """Initialize the cache stored in cache_dir"""
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.perceptual = perceptual
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'perceptual_hits': 0, 'misses': 0, 'stores': 0,
+                       'evictions': 0, 'bypassed': 0, 'rejected': 0}
+        # Running (entry count, total bytes), loaded by the first directory scan
+        self._index = None
+        self._writes_since_scan = 0
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def keys_for(self, path, model, schema_version, content_hash=None):
+        """
+        Return the cache keys for a file
+        Args:
+            content_hash: SHA-256 of the file if already known (saves a read)
+        Returns:
+            Tuple of (exact key, perceptual key or None)
+        """
+        scope = f"{model}|{schema_version}"
+        content_hash = content_hash or file_sha256(path)
+        exact = hashlib.sha256(f"{scope}|{content_hash}".encode('utf-8')).hexdigest()
+        perceptual = None
+        if self.perceptual:
+            dhash = image_dhash(path)
+            if dhash:
+                perceptual = hashlib.sha256(f"{scope}|dhash:{dhash}".encode('utf-8')).hexdigest()
+        return exact, perceptual
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, keys):
+        """Return the cached result for (exact key, perceptual key), or None"""
+        exact, perceptual = keys
+        for key, stat in ((exact, 'hits'), (perceptual, 'perceptual_hits')):
+            if not key:
+                continue
+            entry_path = self._entry_path(key)
+            try:
+                with open(entry_path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            touched = [entry_path]
+            if 'alias' in entry:
+                touched.append(self._entry_path(entry['alias']))
+                try:
+                    with open(touched[-1], 'r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    continue
+            # Touch the entry so eviction treats it as recently used
+            for touched_path in touched:
+                try:
+                    os.utime(touched_path)
+                except OSError:
+                    pass
+            self._count(stat)
+            return entry['result']
+        self._count('misses')
+        return None
+
+    def put(self, keys, result):
+        """
+        Store a successful extraction result under (exact key, perceptual key)
+        Returns:
+            True if the result was stored, False if it was rejected or failed
+        """
+        if not is_successful_result(result):
+            self._count('rejected')
+            return False
+        exact, perceptual = keys
+        entry = json.dumps({'created_at': time.time(), 'result': result}, ensure_ascii=False)
+        written = [len(entry.encode('utf-8'))]
+        try:
+            atomic_write_text(self._entry_path(exact), entry)
+            if perceptual and perceptual != exact:
+                alias = json.dumps({'alias': exact})
+                atomic_write_text(self._entry_path(perceptual), alias)
+                written.append(len(alias))
+        except OSError as e:
+            logging.warning(f"Could not store extraction result in cache: {e}")
+            return False
+        self._count('stores')
+
+        with self._lock:
+            self._writes_since_scan += 1
+            if self._index is not None:
+                self._index = (self._index[0] + len(written), self._index[1] + sum(written))
+            needs_scan = (self._index is None
+                          or self._writes_since_scan >= SCAN_EVERY
+                          or self._index[0] > self.max_entries
+                          or self._index[1] > self.max_bytes)
+        if needs_scan:
+            self._evict()
+        return True
+
+    def _evict(self):
+        """
+        Rescan the cache directory and remove least recently used entries
+        above the count or size limits, then reset the running index
+        """
+        entries = []
+        total_bytes = 0
+        with os.scandir(self.cache_dir) as scan:
+            for item in scan:
+                if item.name.endswith('.json'):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+                    total_bytes += stat.st_size
+        if len(entries) <= self.max_entries and total_bytes <= self.max_bytes:
+            self._reset_index(len(entries), total_bytes)
+            return
+        # Evict down to a low-water mark so the next scans are not due at once
+        max_entries = int(self.max_entries * EVICT_TO)
+        max_bytes = int(self.max_bytes * EVICT_TO)
+        entries.sort()
+        remaining = len(entries)
+        for _, size, path in entries:
+            if remaining <= max_entries and total_bytes <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._count('evictions')
+            except FileNotFoundError:
+                pass
+            remaining -= 1
+            total_bytes -= size
+        self._reset_index(remaining, total_bytes)
+
+    def _reset_index(self, entries, total_bytes):
+        with self._lock:
+            self._index = (entries, total_bytes)
+            self._writes_since_scan = 0
+
+    def lookup_or_compute(self, path, model, schema_version, compute, bypass=False, is_success=None,
+                          content_hash=None):
+        """
+        Return the cached result for path, or compute and cache it
+        Args:
+            path: File being analyzed
+            model: Deployment or analyzer the result comes from
+            schema_version: Version of the extraction schema
+            compute: Function returning the fresh result
+            bypass: Skip the lookup and always compute (the fresh result is
+                    still stored, which refreshes a bad cached entry)
+            is_success: Extra predicate deciding whether a result may be
+                        cached, on top of is_successful_result
+            content_hash: SHA-256 of the file if already known
+        Returns:
+            Tuple of (result, True if it came from the cache)
+        """
+        if not self.enabled:
+            return compute(), False
+        keys = self.keys_for(path, model, schema_version, content_hash)
+        if bypass:
+            self._count('bypassed')
+        else:
+            cached = self.get(keys)
+            if cached is not None:
+                return cached, True
+        result = compute()
+        if is_success is None or is_success(result):
+            self.put(keys, result)
+        return result, False
+
+    def stats(self):
+        """Return hit/miss counters for this process and the hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['perceptual_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['perceptual_hits']) / lookups, 4) if lookups else 0.0
+        stats['enabled'] = self.enabled
+        return stats
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Return the process-wide extraction result cache"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ExtractionCache()
+    return _default_cache
@@ -9,108 +9,63 @@ from dataclasses import dataclass
 from unittest import result
 import subprocess
 import os
-import csv
 from datetime import datetime
+import random
+import asyncio
+import threading
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from extraction_cache import get_extraction_cache
+from ledger_writer import get_ledger_writer
+from receipt_record import ReceiptRecord
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
 
 
 def calculate_total_amount(receipt_data):
-    """Calculate total amount from all numeric fields"""
-    numeric_fields = [
-        'TitheAmount', 'MembershipAmount', 'BirthdayThankOffering',
-        'WeddingAnniversaryThankOffering', 'HomeMissionPledges',
-        'MissionAndEvangelismFund', 'StStephensSocialAidFund',
-        'SpecialThanksAmount', 'CharityFundAmount', 'DonationAmount',
-        'HarvestAuctionAmount'
-    ]
-    
-    total = 0
-    for field in numeric_fields:
-        value = receipt_data.get(field)
-        if value:
-            try:
-                total += float(value)
-            except (ValueError, TypeError):
-                continue
-    return total
+    """Calculate the receipt total (pledges are not money received, so they are not counted)"""
+    return ReceiptRecord(receipt_data).total_rupees
 
 
 def generate_description(receipt_data):
     """Generate a description based on the contributions"""
-    contributions = []
-    
-    # Map fields to readable descriptions
-    field_descriptions = {
-        'TitheAmount': f"Tithe for {receipt_data.get('TitheMonth', '')}",
-        'MembershipAmount': f"Membership for {receipt_data.get('MembershipMonth', '')}",
-        'BirthdayThankOffering': 'Birthday Thank Offering',
-        'WeddingAnniversaryThankOffering': 'Wedding Anniversary Thank Offering',
-        'HomeMissionPledges': 'Home Mission Pledges',
-        'MissionAndEvangelismFund': 'Mission and Evangelism Fund',
-        'StStephensSocialAidFund': 'St Stephens Social Aid Fund',
-        'SpecialThanksAmount': 'Special Thanks',
-        'CharityFundAmount': 'Charity Fund',
-        'DonationAmount': f"Donation for {receipt_data.get('DonationFor', 'General')}",
-        'HarvestAuctionAmount': f"Harvest Auction - {receipt_data.get('HarvestAuctionComment', '')}"
-    }
-    
-    for field, description in field_descriptions.items():
-        value = receipt_data.get(field)
-        if value:
-            try:
-                amount = float(value)
-                if amount > 0:
-                    contributions.append(f"{description} (₹{amount:.2f})")
-            except (ValueError, TypeError):
-                continue
-    
-    return "; ".join(contributions) if contributions else "No contributions"
+    return ReceiptRecord(receipt_data).description
 
 
-def export_to_csv(receipt_data, csv_filename="Extract.csv"):
-    """Export receipt data to CSV file, appending if file exists"""
-    
-    # Calculate total and description
-    total_amount = calculate_total_amount(receipt_data)
-    description = generate_description(receipt_data)
-    
-    # Add calculated fields to receipt data
+def build_ledger_row(receipt_data):
+    """Return receipt_data with the Total, Description and ProcessedDateTime columns added"""
+    record = ReceiptRecord(receipt_data)
     enhanced_data = receipt_data.copy()
-    enhanced_data['Total'] = total_amount
-    enhanced_data['Description'] = description
+    enhanced_data['Total'] = record.total_rupees
+    enhanced_data['Description'] = record.description
     enhanced_data['ProcessedDateTime'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Define CSV headers in the order we want them
-    csv_headers = [
-        'ProcessedDateTime', 'InvoiceDate', 'Name', 'Address', 'OnlineChequeNo',
-        'TitheMonth', 'TitheAmount', 'MembershipMonth', 'MembershipAmount',
-        'BirthdayThankOffering', 'WeddingAnniversaryThankOffering', 'HomeMissionPledges',
-        'MissionAndEvangelismFund', 'StStephensSocialAidFund', 'SpecialThanksAmount',
-        'CharityFundAmount', 'DonationFor', 'DonationAmount', 'HarvestAuctionComment',
-        'HarvestAuctionAmount', 'Total', 'Description'
-    ]
-    
-    # Check if file exists
-    file_exists = os.path.exists(csv_filename)
-    
+    return enhanced_data
+
+
+def export_to_csv(receipt_data, csv_filename="Extract.csv"):
+    """Export receipt data to CSV file, appending if file exists"""
+    enhanced_data = build_ledger_row(receipt_data)
     try:
-        with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=csv_headers)
-            
-            # Write header only if file is new
-            if not file_exists:
-                writer.writeheader()
-                print(f"Created new CSV file: {csv_filename}")
-            
-            # Write the data row
-            writer.writerow({field: enhanced_data.get(field, '') for field in csv_headers})
-            print(f"Data appended to: {csv_filename}")
-            print(f"Total Amount: ₹{total_amount:.2f}")
-            print(f"Description: {description}")
-            
+        get_ledger_writer(csv_filename).write(enhanced_data)
+        logging.info(
+            f"Data appended to {csv_filename}: total ₹{enhanced_data['Total']:.2f}, "
+            f"{enhanced_data['Description']}"
+        )
     except Exception as e:
-        print(f"Error writing to CSV file: {e}")
+        logging.error(f"Error writing to CSV file: {e}")
+
+
+def export_many_to_csv(receipts, csv_filename="Extract.csv"):
+    """Export several receipts to the CSV file with one locked write"""
+    rows = [build_ledger_row(receipt_data) for receipt_data in receipts]
+    get_ledger_writer(csv_filename).write_many(rows)
+    logging.info(f"{len(rows)} rows appended to {csv_filename}")
 
 
 def select_file_gui():
@@ -402,6 +357,65 @@ def main():
         json.dump(result, f, indent=2) 
 
 
+# Connection pool shared by every Content Understanding client in the process
+HTTP_POOL_SIZE = int(os.getenv("CU_HTTP_POOL_SIZE", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("CU_MAX_RETRIES", "5"))
+HTTP_TIMEOUT = (10, 60)  # connect, read seconds
+# Operations kept in flight by AsyncContentUnderstandingClient.analyze_many
+ANALYZE_CONCURRENCY = int(os.getenv("CU_CONCURRENCY", "8"))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 30.0
+# Polls start at this interval and grow up to polling_interval_seconds
+POLL_INITIAL_SECONDS = 0.25
+POLL_BACKOFF_FACTOR = 1.5
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """Return the process-wide HTTP session with a sized connection pool"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _shared_session = session
+    return _shared_session
+
+
+def _retry_after_seconds(response: requests.Response) -> float | None:
+    """Return the Retry-After header in seconds, if the service sent one"""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            # HTTP-date form is not used by the service
+            return None
+    return None
+
+
+@dataclass
+class AnalysisMetrics:
+    operation_id: str = ""
+    polls: int = 0
+    retries: int = 0
+    started_at: float = 0.0
+    wall_seconds: float = 0.0
+    status: str = "running"
+
+
 @dataclass(frozen=True, kw_only=True)
 class Settings:
     endpoint: str
@@ -434,7 +448,16 @@ class Settings:
         return lambda: aad_token
 
 
-class AzureContentUnderstandingClient:
+class _ContentUnderstandingBase:
+    """
+    Transport-independent parts of the Content Understanding clients: argument
+    checks, URLs and headers, retry backoff, the extraction cache and metrics.
+
+    Per-operation state (the AnalysisMetrics and cache keys of an analysis) is
+    attached to the response returned by begin_analyze, so nothing is kept on
+    the client for operations that are never polled.
+    """
+
     def __init__(
         self,
         endpoint: str,
@@ -442,6 +465,8 @@ class AzureContentUnderstandingClient:
         subscription_key: str | None = None,
         token_provider: Callable[[], str] | None = None,
         x_ms_useragent: str = "cu-sample-code",
+        max_retries: int = HTTP_MAX_RETRIES,
+        cache: Any = None,
     ) -> None:
         if not subscription_key and token_provider is None:
             raise ValueError(
@@ -459,14 +484,214 @@ class AzureContentUnderstandingClient:
         self._headers: dict[str, str] = self._get_headers(
             subscription_key, token_provider and token_provider(), x_ms_useragent
         )
+        self._max_retries: int = max_retries
+        self._cache = cache or get_extraction_cache()
+        self.last_metrics: AnalysisMetrics | None = None
+        self.metrics_totals: dict[str, float] = {
+            "analyses": 0, "polls": 0, "retries": 0, "wall_seconds": 0.0
+        }
 
-    def begin_analyze(self, analyzer_id: str, file_location: str):
+    def _retry_delay(
+        self, method: str, url: str, attempt: int, delay: float | None, metrics: AnalysisMetrics | None
+    ) -> float:
+        """Returns the wait before retry attempt + 1: Retry-After when sent, else backoff with jitter."""
+        if delay is None:
+            ceiling = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt)
+            delay = random.uniform(ceiling / 2, ceiling)
+        if metrics is not None:
+            metrics.retries += 1
+        self._logger.warning(
+            f"{method} {url.split('?')[0]} failed, retry {attempt + 1} in {delay:.2f}s"
+        )
+        return delay
+
+    def _request_kwargs(self, file_location: str, data: bytes | None) -> dict[str, Any]:
+        """
+        Returns the body and headers of an analyze request.
+
+        Raises:
+            ValueError: If the file location is not a valid path or URL.
+        """
+        if data is not None:
+            return {"data": data, "headers": {"Content-Type": "application/octet-stream", **self._headers}}
+        if "https://" in file_location or "http://" in file_location:
+            return {"json": {"url": file_location}, "headers": {"Content-Type": "application/json", **self._headers}}
+        raise ValueError("File location must be a valid path or URL.")
+
+    def _cache_lookup(
+        self, analyzer_id: str, file_location: str, use_cache: bool
+    ) -> tuple[tuple[str, str | None] | None, requests.Response | None]:
+        """
+        Looks up a local file in the extraction cache.
+
+        Returns:
+            The cache keys (None for URLs or when caching is off) and, on a hit,
+            a ready-made response whose operation-location starts with "cache:".
+        """
+        if not self._cache.enabled or not Path(file_location).is_file():
+            return None, None
+        keys = self._cache.keys_for(
+            file_location, f"cu:{self._endpoint}:{analyzer_id}", self._api_version
+        )
+        if not use_cache:
+            return keys, None
+        cached = self._cache.get(keys)
+        if cached is None:
+            return keys, None
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["operation-location"] = f"cache:{keys[0]}"
+        response._content = json.dumps(cached).encode("utf-8")
+        self._logger.info(f"Extraction cache hit for {file_location}")
+        return keys, response
+
+    def _start_operation(self, response: Any, cache_keys: tuple[str, str | None] | None,
+                         metrics: AnalysisMetrics, file_location: str, analyzer_id: str) -> None:
+        """Attaches the metrics and cache keys of a new analysis to its response."""
+        operation_location = response.headers.get("operation-location", "")
+        metrics.operation_id = operation_location.split('/')[-1].split('?')[0]
+        response.analysis_metrics = metrics
+        response.cache_keys = cache_keys
+        self._logger.info(
+            f"Analyzing file {file_location} with analyzer: {analyzer_id}"
+        )
+
+    def _operation_state(self, response: Any) -> tuple[str, AnalysisMetrics, tuple[str, str | None] | None]:
+        """
+        Returns the operation location, metrics and cache keys of a begin_analyze response.
+
+        Raises:
+            ValueError: If the operation location is not found in the response headers.
+        """
+        operation_location = response.headers.get("operation-location", "")
+        if not operation_location:
+            raise ValueError("Operation location not found in response headers.")
+        metrics = getattr(response, "analysis_metrics", None) or AnalysisMetrics(
+            operation_id=operation_location.split('/')[-1].split('?')[0],
+            started_at=time.time(),
+        )
+        return operation_location, metrics, getattr(response, "cache_keys", None)
+
+    def _check_status(self, result: dict[str, Any], metrics: AnalysisMetrics,
+                      cache_keys: tuple[str, str | None] | None) -> bool:
+        """
+        Handles one poll result.
+
+        Returns:
+            True once the operation has succeeded (the result is then cached).
+
+        Raises:
+            RuntimeError: If the operation failed.
+        """
+        status = result.get("status", "").lower()
+        if status == "succeeded":
+            metrics.status = "succeeded"
+            if cache_keys:
+                self._cache.put(cache_keys, result)
+            return True
+        if status == "failed":
+            metrics.status = "failed"
+            self._logger.error(f"Request failed. Reason: {result}")
+            raise RuntimeError("Request failed.")
+        self._logger.info(f"Request {metrics.operation_id} in progress ...")
+        return False
+
+    def _record_metrics(self, metrics: AnalysisMetrics) -> None:
+        """Stores the metrics of a finished analysis and logs them."""
+        metrics.wall_seconds = time.time() - metrics.started_at
+        self.last_metrics = metrics
+        self.metrics_totals["analyses"] += 1
+        self.metrics_totals["polls"] += metrics.polls
+        self.metrics_totals["retries"] += metrics.retries
+        self.metrics_totals["wall_seconds"] += metrics.wall_seconds
+        self._logger.info(
+            f"Analysis {metrics.operation_id} {metrics.status}: {metrics.polls} polls, "
+            f"{metrics.retries} retries, {metrics.wall_seconds:.2f}s wall time"
+        )
+
+    def _get_analyze_url(self, endpoint: str, api_version: str, analyzer_id: str):
+        return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}:analyze?api-version={api_version}&stringEncoding=utf16"
+
+    def _get_headers(
+        self, subscription_key: str | None, api_token: str | None, x_ms_useragent: str
+    ) -> dict[str, str]:
+        """Returns the headers for the HTTP requests.
+        Args:
+            subscription_key (str): The subscription key for the service.
+            api_token (str): The API token for the service.
+            enable_face_identification (bool): A flag to enable face identification.
+        Returns:
+            dict: A dictionary containing the headers for the HTTP requests.
+        """
+        headers = (
+            {"Ocp-Apim-Subscription-Key": subscription_key}
+            if subscription_key
+            else {"Authorization": f"Bearer {api_token}"}
+        )
+        headers["x-ms-useragent"] = x_ms_useragent
+        return headers
+
+
+class AzureContentUnderstandingClient(_ContentUnderstandingBase):
+    def __init__(
+        self,
+        endpoint: str,
+        api_version: str,
+        subscription_key: str | None = None,
+        token_provider: Callable[[], str] | None = None,
+        x_ms_useragent: str = "cu-sample-code",
+        session: requests.Session | None = None,
+        max_retries: int = HTTP_MAX_RETRIES,
+        cache: Any = None,
+    ) -> None:
+        super().__init__(
+            endpoint,
+            api_version,
+            subscription_key=subscription_key,
+            token_provider=token_provider,
+            x_ms_useragent=x_ms_useragent,
+            max_retries=max_retries,
+            cache=cache,
+        )
+        self._session: requests.Session = session or get_shared_session()
+
+    def _request(
+        self, method: str, url: str, metrics: AnalysisMetrics | None = None, **kwargs: Any
+    ) -> requests.Response:
+        """
+        Sends a request on the pooled session, retrying throttling and server errors.
+
+        Waits for Retry-After when the service sends it, otherwise backs off
+        exponentially with jitter. Gives up after max_retries retries.
+        """
+        kwargs.setdefault("timeout", HTTP_TIMEOUT)
+        attempt = 0
+        while True:
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self._max_retries:
+                    raise
+                delay = None
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self._max_retries:
+                    return response
+                delay = _retry_after_seconds(response)
+
+            time.sleep(self._retry_delay(method, url, attempt, delay, metrics))
+            attempt += 1
+
+    def begin_analyze(self, analyzer_id: str, file_location: str, use_cache: bool = True):
         """
         Begins the analysis of a file or URL using the specified analyzer.
 
+        Local files are hashed first; a file analyzed before with the same
+        analyzer and API version is answered from the extraction cache.
+
         Args:
             analyzer_id (str): The ID of the analyzer to use.
             file_location (str): The path to the file or the URL to analyze.
+            use_cache (bool, optional): Set to False to bypass the cache lookup. Defaults to True.
 
         Returns:
             Response: The response from the analysis request.
@@ -475,38 +700,21 @@ class AzureContentUnderstandingClient:
             ValueError: If the file location is not a valid path or URL.
             HTTPError: If the HTTP request returned an unsuccessful status code.
         """
-        if Path(file_location).exists():
-            with open(file_location, "rb") as file:
-                data = file.read()
-            headers = {"Content-Type": "application/octet-stream"}
-        elif "https://" in file_location or "http://" in file_location:
-            data = {"url": file_location}
-            headers = {"Content-Type": "application/json"}
-        else:
-            raise ValueError("File location must be a valid path or URL.")
-
-        headers.update(self._headers)
-        if isinstance(data, dict):
-            response = requests.post(
-                url=self._get_analyze_url(
-                    self._endpoint, self._api_version, analyzer_id
-                ),
-                headers=headers,
-                json=data,
-            )
-        else:
-            response = requests.post(
-                url=self._get_analyze_url(
-                    self._endpoint, self._api_version, analyzer_id
-                ),
-                headers=headers,
-                data=data,
-            )
+        cache_keys, cached_response = self._cache_lookup(analyzer_id, file_location, use_cache)
+        if cached_response is not None:
+            return cached_response
 
-        response.raise_for_status()
-        self._logger.info(
-            f"Analyzing file {file_location} with analyzer: {analyzer_id}"
+        data = Path(file_location).read_bytes() if Path(file_location).exists() else None
+        kwargs = self._request_kwargs(file_location, data)
+        metrics = AnalysisMetrics(started_at=time.time())
+        response = self._request(
+            "POST",
+            self._get_analyze_url(self._endpoint, self._api_version, analyzer_id),
+            metrics=metrics,
+            **kwargs,
         )
+        response.raise_for_status()
+        self._start_operation(response, cache_keys, metrics, file_location, analyzer_id)
         return response
 
     def poll_result(
@@ -521,7 +729,9 @@ class AzureContentUnderstandingClient:
         Args:
             response (Response): The initial response object containing the operation location.
             timeout_seconds (int, optional): The maximum number of seconds to wait for the operation to complete. Defaults to 120.
-            polling_interval_seconds (int, optional): The number of seconds to wait between polling attempts. Defaults to 2.
+            polling_interval_seconds (int, optional): The longest wait between polling attempts. Polling starts
+                every POLL_INITIAL_SECONDS and backs off to this interval; a Retry-After header from the service
+                takes precedence. Defaults to 2.
 
         Raises:
             ValueError: If the operation location is not found in the response headers.
@@ -531,64 +741,305 @@ class AzureContentUnderstandingClient:
         Returns:
             dict: The JSON response of the completed operation if it succeeds.
         """
-        operation_location = response.headers.get("operation-location", "")
-        if not operation_location:
-            raise ValueError("Operation location not found in response headers.")
-
-        headers = {"Content-Type": "application/json"}
-        headers.update(self._headers)
+        operation_location, metrics, cache_keys = self._operation_state(response)
+        if operation_location.startswith("cache:"):
+            return response.json()
 
+        delay = _retry_after_seconds(response)
+        if delay is None:
+            delay = min(POLL_INITIAL_SECONDS, polling_interval_seconds)
         start_time = time.time()
-        while True:
-            elapsed_time = time.time() - start_time
-            self._logger.info(
-                "Waiting for service response", extra={"elapsed": elapsed_time}
-            )
-            if elapsed_time > timeout_seconds:
-                raise TimeoutError(
-                    f"Operation timed out after {timeout_seconds:.2f} seconds."
-                )
+        try:
+            while True:
+                elapsed_time = time.time() - start_time
+                remaining = timeout_seconds - elapsed_time
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Operation timed out after {timeout_seconds:.2f} seconds."
+                    )
+                time.sleep(min(delay, remaining))
 
-            response = requests.get(operation_location, headers=self._headers)
-            response.raise_for_status()
-            result = cast(dict[str, str], response.json())
-            status = result.get("status", "").lower()
-            if status == "succeeded":
                 self._logger.info(
-                    f"Request result is ready after {elapsed_time:.2f} seconds."
+                    "Waiting for service response", extra={"elapsed": time.time() - start_time}
                 )
-                return response.json()  # pyright: ignore[reportAny]
-            elif status == "failed":
-                self._logger.error(f"Request failed. Reason: {response.json()}")
-                raise RuntimeError("Request failed.")
+                response = self._request("GET", operation_location, metrics=metrics, headers=self._headers)
+                metrics.polls += 1
+                response.raise_for_status()
+                result = cast(dict[str, str], response.json())
+                if self._check_status(result, metrics, cache_keys):
+                    self._logger.info(
+                        f"Request result is ready after {time.time() - start_time:.2f} seconds."
+                    )
+                    return result  # pyright: ignore[reportReturnType]
+
+                retry_after = _retry_after_seconds(response)
+                if retry_after is not None:
+                    delay = retry_after
+                else:
+                    delay = min(delay * POLL_BACKOFF_FACTOR, polling_interval_seconds)
+        except TimeoutError:
+            metrics.status = "timeout"
+            raise
+        finally:
+            self._record_metrics(metrics)
+
+
+class AsyncContentUnderstandingClient(_ContentUnderstandingBase):
+    """
+    asyncio Content Understanding client built on aiohttp.
+
+    begin_analyze and poll_result take the same arguments as in
+    AzureContentUnderstandingClient and share its retries, adaptive polling,
+    cache and metrics, but are coroutines. Use the client as an async
+    context manager so its connection pool is closed when done.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        api_version: str,
+        subscription_key: str | None = None,
+        token_provider: Callable[[], str] | None = None,
+        x_ms_useragent: str = "cu-sample-code",
+        max_retries: int = HTTP_MAX_RETRIES,
+        pool_size: int = HTTP_POOL_SIZE,
+        cache: Any = None,
+    ) -> None:
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("aiohttp is required for AsyncContentUnderstandingClient. Please install it with: pip install aiohttp")
+        super().__init__(
+            endpoint,
+            api_version,
+            subscription_key=subscription_key,
+            token_provider=token_provider,
+            x_ms_useragent=x_ms_useragent,
+            max_retries=max_retries,
+            cache=cache,
+        )
+        self._pool_size: int = pool_size
+        self._aiohttp_session: "aiohttp.ClientSession | None" = None
+
+    async def __aenter__(self) -> "AsyncContentUnderstandingClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Closes the aiohttp session and its connection pool."""
+        if self._aiohttp_session is not None:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        # Created on first use so it binds to the running event loop
+        if self._aiohttp_session is None:
+            self._aiohttp_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size),
+                timeout=aiohttp.ClientTimeout(connect=HTTP_TIMEOUT[0], sock_read=HTTP_TIMEOUT[1]),
+            )
+        return self._aiohttp_session
+
+    async def _request(
+        self, method: str, url: str, metrics: AnalysisMetrics | None = None, **kwargs: Any
+    ) -> "aiohttp.ClientResponse":
+        """
+        Sends a request, retrying throttling and server errors like the sync client.
+
+        The body is read before returning, so response.json() can be awaited
+        after the connection has gone back to the pool.
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self._get_session().request(method, url, **kwargs) as response:
+                    await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self._max_retries:
+                    raise
+                delay = None
             else:
-                self._logger.info(
-                    f"Request {operation_location.split('/')[-1].split('?')[0]} in progress ..."
-                )
-            time.sleep(polling_interval_seconds)
+                if response.status not in RETRY_STATUS_CODES or attempt >= self._max_retries:
+                    return response
+                delay = _retry_after_seconds(response)
 
-    def _get_analyze_url(self, endpoint: str, api_version: str, analyzer_id: str):
-        return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}:analyze?api-version={api_version}&stringEncoding=utf16"
+            await asyncio.sleep(self._retry_delay(method, url, attempt, delay, metrics))
+            attempt += 1
+
+    async def begin_analyze(self, analyzer_id: str, file_location: str, use_cache: bool = True):
+        """
+        Begins the analysis of a file or URL using the specified analyzer.
 
-    def _get_headers(
-        self, subscription_key: str | None, api_token: str | None, x_ms_useragent: str
-    ) -> dict[str, str]:
-        """Returns the headers for the HTTP requests.
-        Args:
-            subscription_key (str): The subscription key for the service.
-            api_token (str): The API token for the service.
-            enable_face_identification (bool): A flag to enable face identification.
         Returns:
-            dict: A dictionary containing the headers for the HTTP requests.
+            ClientResponse: The response from the analysis request, or a
+            cached response for a file that was analyzed before.
         """
-        headers = (
-            {"Ocp-Apim-Subscription-Key": subscription_key}
-            if subscription_key
-            else {"Authorization": f"Bearer {api_token}"}
+        loop = asyncio.get_running_loop()
+        cache_keys, cached_response = await loop.run_in_executor(
+            None, self._cache_lookup, analyzer_id, file_location, use_cache
         )
-        headers["x-ms-useragent"] = x_ms_useragent
-        return headers
+        if cached_response is not None:
+            return cached_response
+
+        data = None
+        if Path(file_location).exists():
+            data = await loop.run_in_executor(None, Path(file_location).read_bytes)
+        kwargs = self._request_kwargs(file_location, data)
+        metrics = AnalysisMetrics(started_at=time.time())
+        response = await self._request(
+            "POST",
+            self._get_analyze_url(self._endpoint, self._api_version, analyzer_id),
+            metrics=metrics,
+            **kwargs,
+        )
+        response.raise_for_status()
+        self._start_operation(response, cache_keys, metrics, file_location, analyzer_id)
+        return response
+
+    async def poll_result(
+        self,
+        response: "aiohttp.ClientResponse",
+        timeout_seconds: int = 120,
+        polling_interval_seconds: int = 2,
+    ) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        """
+        Polls the result of an asynchronous operation until it completes or times out.
+
+        Same behaviour as AzureContentUnderstandingClient.poll_result.
+        """
+        operation_location, metrics, cache_keys = self._operation_state(response)
+        if operation_location.startswith("cache:"):
+            return response.json()
+
+        delay = _retry_after_seconds(response)
+        if delay is None:
+            delay = min(POLL_INITIAL_SECONDS, polling_interval_seconds)
+        start_time = time.time()
+        try:
+            while True:
+                remaining = timeout_seconds - (time.time() - start_time)
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Operation timed out after {timeout_seconds:.2f} seconds."
+                    )
+                await asyncio.sleep(min(delay, remaining))
+
+                response = await self._request("GET", operation_location, metrics=metrics, headers=self._headers)
+                metrics.polls += 1
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+                if self._check_status(result, metrics, cache_keys):
+                    return result
+
+                retry_after = _retry_after_seconds(response)
+                if retry_after is not None:
+                    delay = retry_after
+                else:
+                    delay = min(delay * POLL_BACKOFF_FACTOR, polling_interval_seconds)
+        except TimeoutError:
+            metrics.status = "timeout"
+            raise
+        finally:
+            self._record_metrics(metrics)
+
+    async def analyze(
+        self,
+        analyzer_id: str,
+        file_location: str,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: int = 2,
+    ) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        """Runs begin_analyze and poll_result for one file."""
+        response = await self.begin_analyze(analyzer_id, file_location)
+        return await self.poll_result(response, timeout_seconds, polling_interval_seconds)
+
+    async def analyze_many(
+        self,
+        analyzer_id: str,
+        paths: list[str],
+        concurrency: int = ANALYZE_CONCURRENCY,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: int = 2,
+    ):
+        """
+        Analyzes many files, keeping up to concurrency operations in flight.
+
+        Yields:
+            (path, result) tuples in completion order. A file that fails yields
+            the exception as its result instead of stopping the batch.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def analyze_one(path: str):
+            async with semaphore:
+                try:
+                    return path, await self.analyze(
+                        analyzer_id, path, timeout_seconds, polling_interval_seconds
+                    )
+                except Exception as e:
+                    return path, e
+
+        tasks = [asyncio.ensure_future(analyze_one(path)) for path in paths]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def analyze_backlog(paths: list[str], concurrency: int = ANALYZE_CONCURRENCY) -> int:
+    """
+    Analyzes a backlog of payment forms concurrently.
+
+    Each result is saved next to its form as <name>_result.json.
+    Returns the number of forms that failed.
+    """
+    azure_endpoint = os.getenv('AZURE_ENDPOINT')
+    azure_api_key = os.getenv('AZURE_API_KEY')
+    if not azure_endpoint or not azure_api_key:
+        print("Error: Azure credentials not configured. Please set AZURE_ENDPOINT and AZURE_API_KEY environment variables.")
+        return len(paths)
+
+    failed = 0
+    async with AsyncContentUnderstandingClient(
+        azure_endpoint, "2025-05-01-preview", subscription_key=azure_api_key
+    ) as client:
+        async for path, result in client.analyze_many(
+            "invoice-analyzer", paths, concurrency=concurrency, timeout_seconds=60 * 60
+        ):
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"FAILED {path}: {result}")
+                continue
+            result_path = os.path.splitext(path)[0] + "_result.json"
+            with open(result_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"Done {path} -> {result_path}")
+        totals = client.metrics_totals
+        print(f"\nAnalyzed {len(paths) - failed} of {len(paths)} forms, "
+              f"{totals['polls']} polls, {totals['retries']} retries")
+    return failed
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "backlog":
+        # python invoiceanalyzer.py backlog <form files or folder> [--concurrency N]
+        args = sys.argv[2:]
+        concurrency = ANALYZE_CONCURRENCY
+        if "--concurrency" in args:
+            index = args.index("--concurrency")
+            concurrency = int(args[index + 1])
+            del args[index:index + 2]
+        paths = []
+        for arg in args:
+            if os.path.isdir(arg):
+                paths.extend(sorted(
+                    os.path.join(arg, name) for name in os.listdir(arg)
+                    if name.lower().endswith(('.jpg', '.jpeg', '.png', '.pdf'))
+                ))
+            else:
+                paths.append(arg)
+        sys.exit(1 if asyncio.run(analyze_backlog(paths, concurrency)) else 0)
+    else:
+        main()
@@ -0,0 +1,227 @@
+"""
+Ledger Archive
+Compact columnar copy of the receipt ledger for fast historical analytics.
+
+Receipts are split into one partition per month under
+Receipts store/archive/YYYY-MM/, each holding typed NumPy columns:
+  invoice_date.npy   int32 date ordinals
+  name.npy           int32 codes into the archive dictionary of donor names
+  payment_method.npy int8 codes into the dictionary of payment methods
+  receipt_no.npy     int64 receipt number (0 when unknown)
+  amounts.npy        int64 paise, one column per AMOUNT_FIELDS entry, stored
+                     column-major so each category is contiguous; negative
+                     amounts are stored as 0, as in the receipt total
+Partitions are opened memory-mapped, and partitions outside the requested
+date range are never touched, so year-to-date totals over years of history
+come back in milliseconds.
+
+Usage: python ledger_archive.py build
+       python ledger_archive.py ytd [year]
+"""
+
+import os
+import sys
+import json
+import shutil
+import calendar
+import datetime
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+from receipt_record import AMOUNT_FIELDS, TOTAL_FIELDS, parse_paise
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(SCRIPT_DIR, "Receipts store", "archive")
+ARCHIVE_VERSION = 2
+DICTIONARY_FILE = "dictionary.json"
+
+
+def _require_numpy():
+    if not NUMPY_AVAILABLE:
+        raise ImportError("numpy is required for the ledger archive. Please install it with: pip install numpy")
+
+
+def load_ledger_receipts():
+    """Return every receipt in the SQLite ledger, or from Extract.csv if there is none"""
+    from receipt_ledger import LEDGER_DB, EXTRACT_FILES, get_receipt_ledger, _clean_receipt
+    if os.path.exists(LEDGER_DB):
+        return get_receipt_ledger().receipts_with_numbers()
+
+    import csv
+    from ledger_writer import ledger_files
+    receipts = []
+    for csv_path in [path for extract in EXTRACT_FILES for path in ledger_files(extract)]:
+        with open(csv_path, 'r', newline='', encoding='utf-8-sig') as f:
+            receipts.extend(_clean_receipt(row) for row in csv.DictReader(f) if row.get('Name'))
+    return receipts
+
+
+def build_archive(receipts=None, archive_dir=ARCHIVE_DIR):
+    """
+    Rebuild the monthly partitions from the ledger
+    Args:
+        receipts: Receipt data dictionaries (defaults to the whole ledger)
+        archive_dir: Directory to write the archive to
+    Returns:
+        Dictionary with the number of receipts archived per month and the
+        number skipped for having no valid date
+    """
+    _require_numpy()
+    if receipts is None:
+        receipts = load_ledger_receipts()
+
+    names, name_codes = [], {}
+    methods, method_codes = [], {}
+    months = {}
+    skipped = 0
+    for receipt in receipts:
+        try:
+            date = datetime.date.fromisoformat(str(receipt.get('InvoiceDate', ''))[:10])
+        except ValueError:
+            skipped += 1
+            continue
+        name = ' '.join(str(receipt.get('Name') or '').split())
+        method = str(receipt.get('PaymentMethod') or 'CASH').upper()
+        if name not in name_codes:
+            name_codes[name] = len(names)
+            names.append(name)
+        if method not in method_codes:
+            method_codes[method] = len(methods)
+            methods.append(method)
+        receipt_no = str(receipt.get('ReceiptNo') or '')
+        months.setdefault(f"{date:%Y-%m}", []).append((
+            date.toordinal(), name_codes[name], method_codes[method],
+            int(receipt_no) if receipt_no.isdigit() else 0,
+            [max(parse_paise(receipt.get(field)), 0) for field in AMOUNT_FIELDS],
+        ))
+
+    # Write into a fresh directory and swap it in, so readers never see a half-built archive
+    staging_dir = archive_dir + ".building"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    for month, rows in months.items():
+        rows.sort(key=lambda row: row[0])
+        partition_dir = os.path.join(staging_dir, month)
+        os.makedirs(partition_dir)
+        np.save(os.path.join(partition_dir, "invoice_date.npy"), np.array([r[0] for r in rows], dtype=np.int32))
+        np.save(os.path.join(partition_dir, "name.npy"), np.array([r[1] for r in rows], dtype=np.int32))
+        np.save(os.path.join(partition_dir, "payment_method.npy"), np.array([r[2] for r in rows], dtype=np.int8))
+        np.save(os.path.join(partition_dir, "receipt_no.npy"), np.array([r[3] for r in rows], dtype=np.int64))
+        np.save(os.path.join(partition_dir, "amounts.npy"),
+                np.asfortranarray(np.array([r[4] for r in rows], dtype=np.int64).reshape(len(rows), len(AMOUNT_FIELDS))))
+
+    with open(os.path.join(staging_dir, DICTIONARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'version': ARCHIVE_VERSION, 'amount_fields': AMOUNT_FIELDS,
+                   'names': names, 'payment_methods': methods}, f, ensure_ascii=False)
+
+    old_dir = archive_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(archive_dir):
+        os.replace(archive_dir, old_dir)
+    os.replace(staging_dir, archive_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return {'months': {month: len(rows) for month, rows in sorted(months.items())}, 'skipped': skipped}
+
+
+class LedgerArchive:
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        """Open the archive in archive_dir for reading"""
+        _require_numpy()
+        self.archive_dir = archive_dir
+        with open(os.path.join(archive_dir, DICTIONARY_FILE), 'r', encoding='utf-8') as f:
+            dictionary = json.load(f)
+        if dictionary.get('version') != ARCHIVE_VERSION:
+            raise ValueError("Ledger archive was built by a different version; rebuild it")
+        self.amount_fields = dictionary['amount_fields']
+        self.names = dictionary['names']
+        self.payment_methods = dictionary['payment_methods']
+        # Columns counted in the receipt total (HomeMissionPledges is not)
+        self._total_columns = [index for index, field in enumerate(self.amount_fields) if field in TOTAL_FIELDS]
+        self._partitions = {}
+
+    def months(self):
+        """Return the archived months as YYYY-MM strings"""
+        return sorted(entry for entry in os.listdir(self.archive_dir)
+                      if os.path.isdir(os.path.join(self.archive_dir, entry)))
+
+    def partition(self, month):
+        """Return the memory-mapped columns of one month"""
+        if month not in self._partitions:
+            partition_dir = os.path.join(self.archive_dir, month)
+            self._partitions[month] = {
+                column: np.load(os.path.join(partition_dir, f"{column}.npy"), mmap_mode='r')
+                for column in ('invoice_date', 'name', 'payment_method', 'receipt_no', 'amounts')
+            }
+        return self._partitions[month]
+
+    def totals(self, start_date, end_date):
+        """
+        Sum every amount category over an inclusive date range
+        Args:
+            start_date, end_date: datetime.date or YYYY-MM-DD strings
+        Returns:
+            Dictionary with total receipts, total amount (over the fields
+            counted in the receipt total) and the amount of every category,
+            all amounts in rupees
+        """
+        if isinstance(start_date, str):
+            start_date = datetime.date.fromisoformat(start_date)
+        if isinstance(end_date, str):
+            end_date = datetime.date.fromisoformat(end_date)
+        first_month, last_month = f"{start_date:%Y-%m}", f"{end_date:%Y-%m}"
+
+        sums = np.zeros(len(self.amount_fields), dtype=np.int64)
+        count = 0
+        for month in self.months():
+            if month < first_month or month > last_month:
+                continue
+            columns = self.partition(month)
+            amounts = columns['amounts']
+            if first_month < month < last_month:
+                # Whole month inside the range: no date filter needed
+                sums += amounts.sum(axis=0)
+                count += len(amounts)
+                continue
+            dates = columns['invoice_date']
+            # Partitions are sorted by date, so the range is a contiguous slice
+            lo = np.searchsorted(dates, start_date.toordinal(), side='left')
+            hi = np.searchsorted(dates, end_date.toordinal(), side='right')
+            sums += amounts[lo:hi].sum(axis=0)
+            count += int(hi - lo)
+
+        return {
+            'total_receipts': count,
+            'total_amount': int(sums[self._total_columns].sum()) / 100,
+            'by_category': {field: int(value) / 100 for field, value in zip(self.amount_fields, sums)},
+        }
+
+    def year_to_date(self, year=None, as_of=None):
+        """
+        Return totals from 1 January of year up to as_of (default today)
+        For an earlier year the same day of the year is used, with
+        29 February becoming 28 February outside leap years.
+        """
+        as_of = as_of or datetime.date.today()
+        year = year or as_of.year
+        end = as_of
+        if year != as_of.year:
+            day = min(as_of.day, calendar.monthrange(year, as_of.month)[1])
+            end = as_of.replace(year=year, day=day)
+        return self.totals(datetime.date(year, 1, 1), end)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "build":
+        print(json.dumps(build_archive(), indent=2))
+    elif command == "ytd":
+        year = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        print(json.dumps(LedgerArchive().year_to_date(year), indent=2))
+    else:
+        print("Usage: python ledger_archive.py build | ytd [year]")
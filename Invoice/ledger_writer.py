@@ -0,0 +1,156 @@
+"""
+Ledger Writer
+Appends receipt rows to Extract.csv safely from many threads and workers.
+
+All appends go through one path that holds an exclusive file lock, so rows
+from different gunicorn workers never interleave and the header is written
+exactly once. Rows are formatted before the lock is taken and written with
+a single call. EXTRACT_CSV_FSYNC chooses when data is flushed to disk:
+'always' (every write), 'interval' (at most once per EXTRACT_CSV_FSYNC_SECONDS)
+or 'never'. Rotation is off by default; with EXTRACT_CSV_ROTATE=monthly the
+first write of a new month moves the rows of the active file into
+Extract-YYYY-MM.csv archives, one per month of the rows' InvoiceDate.
+"""
+
+import io
+import os
+import csv
+import glob
+import time
+import datetime
+import threading
+
+from file_locks import exclusive_lock
+from receipt_record import normalize_date
+
+CSV_HEADERS = [
+    'ProcessedDateTime', 'InvoiceDate', 'Name', 'Address', 'OnlineChequeNo',
+    'TitheMonth', 'TitheAmount', 'MembershipMonth', 'MembershipAmount',
+    'BirthdayThankOffering', 'WeddingAnniversaryThankOffering', 'HomeMissionPledges',
+    'MissionAndEvangelismFund', 'StStephensSocialAidFund', 'SpecialThanksAmount',
+    'CharityFundAmount', 'DonationFor', 'DonationAmount', 'HarvestAuctionComment',
+    'HarvestAuctionAmount', 'Total', 'Description'
+]
+
+FSYNC_POLICY = os.getenv("EXTRACT_CSV_FSYNC", "always")
+FSYNC_INTERVAL_SECONDS = float(os.getenv("EXTRACT_CSV_FSYNC_SECONDS", "5"))
+ROTATION = os.getenv("EXTRACT_CSV_ROTATE", "none")
+
+
+class LedgerWriter:
+    def __init__(self, csv_path, fsync_policy=FSYNC_POLICY, rotation=ROTATION,
+                 fsync_interval=FSYNC_INTERVAL_SECONDS):
+        """Initialize a writer appending to csv_path"""
+        if fsync_policy not in ('always', 'interval', 'never'):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.csv_path = os.path.abspath(csv_path)
+        self.lock_path = self.csv_path + ".lock"
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.rotation = rotation
+        self._lock = threading.Lock()
+        self._last_fsync = 0.0
+
+    def write(self, row):
+        """Append one row (a dict keyed by CSV_HEADERS)"""
+        self.write_many([row])
+
+    def write_many(self, rows):
+        """Append several rows with one locked write"""
+        if not rows:
+            return
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_HEADERS, extrasaction='ignore')
+        writer.writerows({field: row.get(field, '') for field in CSV_HEADERS} for row in rows)
+        data = buffer.getvalue()
+
+        with self._lock, exclusive_lock(self.lock_path):
+            if self.rotation == 'monthly':
+                self._rotate_if_new_month()
+            with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
+                if f.tell() == 0:
+                    header = io.StringIO()
+                    csv.writer(header).writerow(CSV_HEADERS)
+                    data = header.getvalue() + data
+                f.write(data)
+                f.flush()
+                self._maybe_fsync(f)
+
+    def _maybe_fsync(self, f):
+        if self.fsync_policy == 'always':
+            os.fsync(f.fileno())
+        elif self.fsync_policy == 'interval':
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(f.fileno())
+                self._last_fsync = now
+
+    def _rotate_if_new_month(self):
+        """
+        Archive the active file if it was last written in an earlier month
+        Rows go to the archive for the month of their InvoiceDate (falling
+        back to ProcessedDateTime, then the file's last write), appending to
+        an archive that already exists.
+        """
+        try:
+            stat = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return
+        last_write = datetime.date.fromtimestamp(stat.st_mtime)
+        today = datetime.date.today()
+        if (last_write.year, last_write.month) == (today.year, today.month) or stat.st_size == 0:
+            return
+
+        months = {}
+        with open(self.csv_path, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                month = _row_month(row) or f"{last_write:%Y-%m}"
+                months.setdefault(month, []).append(row)
+
+        base, ext = os.path.splitext(self.csv_path)
+        for month, rows in sorted(months.items()):
+            archive_path = f"{base}-{month}{ext}"
+            with open(archive_path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=CSV_HEADERS, extrasaction='ignore')
+                if f.tell() == 0:
+                    writer.writeheader()
+                writer.writerows({field: row.get(field) or '' for field in CSV_HEADERS} for row in rows)
+                f.flush()
+                os.fsync(f.fileno())
+        os.remove(self.csv_path)
+
+    def ledger_files(self):
+        """Return the rotated monthly files followed by the active file"""
+        return ledger_files(self.csv_path)
+
+
+def _row_month(row):
+    """Return the YYYY-MM of a row's InvoiceDate or ProcessedDateTime, or None"""
+    for value in (row.get('InvoiceDate'), (row.get('ProcessedDateTime') or '').split(' ')[0]):
+        try:
+            return normalize_date(value)[:7]
+        except ValueError:
+            continue
+    return None
+
+
+def ledger_files(csv_path):
+    """Return the rotated monthly files of csv_path followed by csv_path itself"""
+    base, ext = os.path.splitext(os.path.abspath(csv_path))
+    files = sorted(glob.glob(f"{glob.escape(base)}-[0-9][0-9][0-9][0-9]-[0-9][0-9]*{ext}"))
+    if os.path.exists(csv_path):
+        files.append(os.path.abspath(csv_path))
+    return files
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_ledger_writer(csv_path="Extract.csv"):
+    """Return the process-wide writer for csv_path"""
+    key = os.path.abspath(csv_path)
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = LedgerWriter(key)
+        return _writers[key]
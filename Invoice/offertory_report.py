@@ -6,17 +6,19 @@ Generates offertory collection reports based on receipt data and Excel templates
 try:
     import openpyxl
     from openpyxl import load_workbook
+    from report_template import get_report_template
     OPENPYXL_AVAILABLE = True
 except ImportError:
     OPENPYXL_AVAILABLE = False
     openpyxl = None
     load_workbook = None
+    get_report_template = None
 
 try:
     from reportlab.pdfgen import canvas
     from reportlab.lib.pagesizes import A4, letter
     from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
     from reportlab.lib import colors
     from reportlab.lib.units import inch
     PDF_AVAILABLE = True
@@ -24,10 +26,19 @@ except ImportError:
     PDF_AVAILABLE = False
 
 import os
-import json
 import datetime
+import itertools
 from pathlib import Path
-import glob
+
+from werkzeug.utils import secure_filename
+
+from result_cache import get_result_cache
+from receipt_record import LONG_LABELS, as_records, format_rupees
+from report_cache import get_or_build, report_fingerprint
+
+# Section B header and the contribution rows per PDF page
+SPECIAL_OFFERTORY_HEADER = ['Sr.No.', 'Name', 'Contribution Details', 'Amount (₹)']
+SPECIAL_ROWS_PER_PAGE = 28
 
 class OffertoryReportGenerator:
     def __init__(self, template_path=None):
@@ -50,45 +61,40 @@ class OffertoryReportGenerator:
         Returns:
             List of receipt data dictionaries
         """
+        from receipt_ledger import get_receipt_ledger, ledger_ready
+        if ledger_ready():
+            return get_receipt_ledger().query(date_prefix=date_filter)
+        
         receipts_data = []
         
-        # Look for receipt data in multiple locations
-        search_paths = [
+        # Only new or changed result files are parsed; the rest come from the cache
+        for receipt_data in get_result_cache().scan(self._result_search_paths(), self._extract_receipt_data_from_result):
+            # Apply date filter if specified
+            if date_filter:
+                receipt_date = receipt_data.get('InvoiceDate', '')
+                if not isinstance(receipt_date, str) or not receipt_date.startswith(date_filter):
+                    continue
+            
+            # Copy so report code cannot change the cached entry
+            receipts_data.append(dict(receipt_data))
+        
+        return receipts_data
+    
+    def _result_search_paths(self):
+        """Locations that hold *_result.json files"""
+        return [
             os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads"),
             os.path.join(os.path.dirname(os.path.abspath(__file__)), "Receipts store"),
         ]
-        
-        for search_path in search_paths:
-            if os.path.exists(search_path):
-                # Find all JSON result files
-                json_files = glob.glob(os.path.join(search_path, "*_result.json"))
-                
-                for json_file in json_files:
-                    try:
-                        with open(json_file, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        
-                        # Extract receipt data from the analysis result
-                        receipt_data = self._extract_receipt_data_from_result(data)
-                        
-                        # Apply date filter if specified
-                        if date_filter:
-                            receipt_date = receipt_data.get('InvoiceDate', '')
-                            if not receipt_date.startswith(date_filter):
-                                continue
-                        
-                        receipts_data.append(receipt_data)
-                    
-                    except Exception as e:
-                        print(f"Error reading {json_file}: {e}")
-                        continue
-        
-        return receipts_data
     
     def _extract_receipt_data_from_result(self, result_data):
         """Extract receipt data from JSON result file"""
         receipt_data = {}
         
+        # Results from the GPT-4o extractor are already mapped to field names
+        if 'gpt4o_result' in result_data:
+            return {field: value for field, value in result_data['gpt4o_result'].items() if value}
+        
         # Try to extract from the result structure
         if 'result' in result_data and 'contents' in result_data['result']:
             contents = result_data['result']['contents']
@@ -136,12 +142,13 @@ class OffertoryReportGenerator:
         
         return receipt_data
     
-    def generate_offertory_report(self, service_date=None, service_type="Worship Service"):
+    def generate_offertory_report(self, service_date=None, service_type="Worship Service", receipts_data=None):
         """
         Generate offertory report similar to the sample image
         Args:
             service_date: Date of the service (YYYY-MM-DD format)
             service_type: Type of service (default: "Worship Service")
+            receipts_data: Receipts for the date, if already loaded
         Returns:
             Path to generated Excel report
         """
@@ -151,41 +158,50 @@ class OffertoryReportGenerator:
         if service_date is None:
             service_date = datetime.date.today().strftime("%Y-%m-%d")
         
-        # Collect receipt data for the specified date
-        receipts_data = self.collect_receipt_data(service_date)
+        # Collect receipt data for the specified date, parsed once for every section
+        if receipts_data is None:
+            receipts_data = self.collect_receipt_data(service_date)
+        receipts_data = as_records(receipts_data)
         
-        # Load the template
+        # Check the template before anything else
         if not os.path.exists(self.template_path):
             raise FileNotFoundError(f"Template file not found: {self.template_path}")
         
-        wb = load_workbook(self.template_path)
-        ws = wb.active
-        
-        # Update header information
-        self._update_header_info(ws, service_date, service_type)
-        
-        # Fill Section A - Bag Offertory Collection (Cash denominations)
-        total_cash_a = self._fill_section_a(ws, receipts_data)
-        
-        # Fill Section B - Special Offertory (Individual contributions)
-        total_special_b = self._fill_section_b(ws, receipts_data)
-        
-        # Update totals
-        self._update_totals(ws, total_cash_a, total_special_b)
-        
-        # Generate filename and save
-        report_filename = f"Offertory_Report_{service_date}_{service_type.replace(' ', '_')}.xlsx"
+        # Generate filename; an unchanged report is served from disk
+        report_filename = f"Offertory_Report_{service_date}_{secure_filename(service_type)}.xlsx"
         report_path = os.path.join(self.output_dir, report_filename)
-        
-        wb.save(report_path)
+        fingerprint = report_fingerprint(receipts_data, service_type, self.template_path)
+        report_path, _ = get_or_build(
+            report_path, fingerprint,
+            lambda path: self._write_offertory_excel(path, service_date, service_type, receipts_data))
         return report_path
     
-    def generate_offertory_report_pdf(self, service_date=None, service_type="Worship Service"):
+    def _write_offertory_excel(self, report_path, service_date, service_type, receipts_data):
+        """Fill the Excel template for one service and save it to report_path"""
+        template = get_report_template(self.template_path)
+        with template.fill() as ws:
+            # Update header information
+            self._update_header_info(ws, template, service_date, service_type)
+            
+            # Fill Section A - Bag Offertory Collection (Cash denominations)
+            total_cash_a = self._fill_section_a(ws, template, receipts_data,
+                                                self._cash_total_for_date(service_date, receipts_data))
+            
+            # Fill Section B - Special Offertory (Individual contributions)
+            total_special_b = self._fill_section_b(ws, template, receipts_data)
+            
+            # Update totals
+            self._update_totals(ws, template, total_cash_a, total_special_b)
+            
+            ws.parent.save(report_path)
+    
+    def generate_offertory_report_pdf(self, service_date=None, service_type="Worship Service", receipts_data=None):
         """
         Generate offertory report as PDF based on Excel template structure
         Args:
             service_date: Date of the service (YYYY-MM-DD format)
             service_type: Type of service (default: "Worship Service")
+            receipts_data: Receipts for the date, if already loaded
         Returns:
             Path to generated PDF report
         """
@@ -195,16 +211,25 @@ class OffertoryReportGenerator:
         if service_date is None:
             service_date = datetime.date.today().strftime("%Y-%m-%d")
         
-        # Collect receipt data for the specified date
-        receipts_data = self.collect_receipt_data(service_date)
+        # Collect receipt data for the specified date, parsed once for every section
+        if receipts_data is None:
+            receipts_data = self.collect_receipt_data(service_date)
+        receipts_data = as_records(receipts_data)
         
+        # Generate filename; an unchanged report is served from disk
+        report_filename = f"Offertory_Report_{service_date}_{secure_filename(service_type)}.pdf"
+        report_path = os.path.join(self.output_dir, report_filename)
+        fingerprint = report_fingerprint(receipts_data, service_type)
+        report_path, _ = get_or_build(
+            report_path, fingerprint,
+            lambda path: self._write_offertory_pdf(path, service_date, service_type, receipts_data))
+        return report_path
+    
+    def _write_offertory_pdf(self, report_path, service_date, service_type, receipts_data):
+        """Build the offertory PDF for one service at report_path"""
         # First, read the Excel template to understand its structure
         template_structure = self._read_excel_template()
         
-        # Generate filename
-        report_filename = f"Offertory_Report_{service_date}_{service_type.replace(' ', '_')}.pdf"
-        report_path = os.path.join(self.output_dir, report_filename)
-        
         # Create PDF document with same layout as Excel template
         doc = SimpleDocTemplate(report_path, pagesize=A4, 
                                topMargin=0.5*inch, bottomMargin=0.5*inch,
@@ -253,7 +278,7 @@ class OffertoryReportGenerator:
         elements.append(Spacer(1, 10))
         
         # Calculate total cash from receipts
-        total_cash = self._calculate_total_cash(receipts_data)
+        total_cash = self._cash_total_for_date(service_date, receipts_data)
         
         # Cash denominations table (exactly as in Excel template)
         cash_data = [
@@ -297,42 +322,20 @@ class OffertoryReportGenerator:
         elements.append(cash_table)
         elements.append(Spacer(1, 25))
         
-        # Section B - Special Offertory (matching Excel template)
+        # Section B - Special Offertory (matching Excel template), one page-sized
+        # table per chunk of rows so large services lay out in linear time
+        special_tables, total_special = self._special_offertory_tables(receipts_data)
+        if len(special_tables) > 1:
+            # Each chunk fills a page of its own, with the header repeated
+            elements.append(PageBreak())
         section_b_title = Paragraph("<b>B. Special Offertory - Cash(B1) & Cheque(B2)</b>", styles['Heading3'])
         elements.append(section_b_title)
         elements.append(Spacer(1, 10))
         
-        # Create special offertory table with data
-        special_data, total_special = self._create_special_offertory_data(receipts_data)
-        
-        # Style the special offertory table to match Excel
-        special_table = Table(special_data, colWidths=[0.8*inch, 2.2*inch, 2.2*inch, 1*inch])
-        special_table.setStyle(TableStyle([
-            # Header row styling
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,-1), 9),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            
-            # Grid and borders
-            ('GRID', (0,0), (-1,-1), 1, colors.black),
-            ('BOX', (0,0), (-1,-1), 2, colors.black),
-            
-            # Total row styling (last row)
-            ('BACKGROUND', (0,-1), (-1,-1), colors.lightgrey),
-            ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
-            ('SPAN', (0,-1), (2,-1)),  # Merge first three columns for total
-            
-            # Data rows - left align name and description, center others
-            ('ALIGN', (1,1), (1,-2), 'LEFT'),    # Names column
-            ('ALIGN', (2,1), (2,-2), 'LEFT'),    # Description column
-            
-            # Padding
-            ('TOPPADDING', (0,0), (-1,-1), 6),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-        ]))
-        elements.append(special_table)
+        for page, special_table in enumerate(special_tables):
+            if page:
+                elements.append(PageBreak())
+            elements.append(special_table)
         elements.append(Spacer(1, 25))
         
         # Grand Total (matching Excel template)
@@ -379,7 +382,6 @@ class OffertoryReportGenerator:
         
         # Build PDF
         doc.build(elements)
-        return report_path
     
     def _read_excel_template(self):
         """Read the Excel template to understand its structure"""
@@ -396,67 +398,38 @@ class OffertoryReportGenerator:
     
     def _calculate_total_cash(self, receipts_data):
         """Calculate total cash amount from receipts"""
-        total_cash = 0
-        for receipt in receipts_data:
-            payment_method = receipt.get('PaymentMethod', 'CASH')
-            if payment_method.upper() == 'CASH':
-                for field in ['TitheAmount', 'MembershipAmount', 'BirthdayThankOffering',
-                             'WeddingAnniversaryThankOffering', 'SpecialThanksAmount',
-                             'MissionAndEvangelismFund', 'CharityFundAmount',
-                             'StStephensSocialAidFund', 'HarvestAuctionAmount',
-                             'DonationAmount']:
-                    amount = receipt.get(field, 0)
-                    if amount:
-                        try:
-                            total_cash += float(amount)
-                        except (ValueError, TypeError):
-                            continue
-        return total_cash
+        return sum(record.total for record in as_records(receipts_data) if record.is_cash) / 100
     
-    def _create_special_offertory_data(self, receipts_data):
-        """Create special offertory table data matching Excel template"""
-        special_data = [['Sr.No.', 'Name', 'Contribution Details', 'Amount (₹)']]
-        
-        total_special = 0
+    def _cash_total_for_date(self, service_date, receipts_data):
+        """Total cash for a service date, read from the ledger rollups when available"""
+        from receipt_ledger import get_receipt_ledger, ledger_ready
+        if ledger_ready():
+            return get_receipt_ledger().payment_totals(service_date).get('CASH', 0.0)
+        return self._calculate_total_cash(receipts_data)
+    
+    def _special_offertory_rows(self, receipts_data):
+        """Yield (row, paise) for each contribution in the special offertory table"""
         sr_no = 1
-        
-        # Process each receipt
-        for receipt in receipts_data:
-            name = receipt.get('Name', 'Unknown')
-            if not name or name == 'Unknown':
+        for record in as_records(receipts_data):
+            if not record.name or record.name == 'Unknown':
                 continue
             
-            # Contribution types mapping (matching Excel template)
-            contribution_types = {
-                'TitheAmount': 'Tithe',
-                'MembershipAmount': 'Membership',
-                'BirthdayThankOffering': 'Birthday Thank Offering',
-                'WeddingAnniversaryThankOffering': 'Wedding Anniversary Thank Offering',
-                'SpecialThanksAmount': 'Special Thanks',
-                'MissionAndEvangelismFund': 'Mission and Evangelism Fund',
-                'CharityFundAmount': 'Charity Fund',
-                'StStephensSocialAidFund': 'St.Stephens Social Aid Fund',
-                'HarvestAuctionAmount': 'Harvest Auction',
-                'DonationAmount': f"Donation for {receipt.get('DonationFor', 'General')}"
-            }
-            
             # Add each contribution as a separate row
-            for field, description in contribution_types.items():
-                amount = receipt.get(field, 0)
-                if amount:
-                    try:
-                        amount_float = float(amount)
-                        if amount_float > 0:
-                            special_data.append([
-                                str(sr_no), 
-                                name[:25],  # Limit name length
-                                description, 
-                                f'{amount_float:.2f}'
-                            ])
-                            total_special += amount_float
-                            sr_no += 1
-                    except (ValueError, TypeError):
-                        continue
+            for field, paise in record.contributions:
+                description = LONG_LABELS[field]
+                if field == 'DonationAmount':
+                    description = f"Donation for {record.data.get('DonationFor', 'General')}"
+                yield [str(sr_no), record.name[:25], description, format_rupees(paise)], paise  # Limit name length
+                sr_no += 1
+    
+    def _create_special_offertory_data(self, receipts_data):
+        """Create special offertory table data matching Excel template"""
+        special_data = [SPECIAL_OFFERTORY_HEADER]
+        total_special = 0
+        for row, paise in self._special_offertory_rows(receipts_data):
+            special_data.append(row)
+            total_special += paise
+        total_special = total_special / 100
         
         # Add empty rows if needed (to match Excel template spacing)
         while len(special_data) < 15:  # Ensure minimum rows for consistency
@@ -467,172 +440,139 @@ class OffertoryReportGenerator:
         
         return special_data, total_special
     
-    def _update_header_info(self, ws, service_date, service_type):
+    def _special_offertory_tables(self, receipts_data, rows_per_page=SPECIAL_ROWS_PER_PAGE):
+        """
+        Build the special offertory section as one table per page
+        Rows come from the _special_offertory_rows() generator and are cut
+        into pages with islice, so no full row list is built. They are read
+        from the receipts already loaded rather than a second ledger query:
+        the report fingerprint and the Section A cash total need every
+        receipt for the date before layout starts, and doc.build() takes the
+        whole list of tables anyway.
+        Args:
+            receipts_data: Receipts for the service
+            rows_per_page: Contribution rows per table
+        Returns:
+            Tuple of (list of Tables, total special offertory in rupees)
+        """
+        rows = self._special_offertory_rows(receipts_data)
+        first_chunk = list(itertools.islice(rows, rows_per_page + 1))
+        if len(first_chunk) <= rows_per_page:
+            # Fits on one page: a single table padded like the Excel template
+            special_data, total_special = self._create_special_offertory_data(receipts_data)
+            return [self._special_offertory_table(special_data, total_rows=1)], total_special
+        
+        tables = []
+        total_special = 0
+        rows = itertools.chain(first_chunk, rows)
+        while True:
+            chunk = list(itertools.islice(rows, rows_per_page))
+            if not chunk:
+                break
+            page_total = sum(paise for _, paise in chunk)
+            total_special += page_total
+            special_data = [SPECIAL_OFFERTORY_HEADER] + [row for row, _ in chunk]
+            special_data.append(['', f'Page {len(tables) + 1} subtotal', '', format_rupees(page_total)])
+            tables.append(special_data)
+        # The section total goes under the last page's subtotal
+        tables[-1].append(['', 'TOTAL SPECIAL OFFERTORY - B', '', format_rupees(total_special)])
+        return ([self._special_offertory_table(special_data, total_rows=1 + (page == len(tables) - 1))
+                 for page, special_data in enumerate(tables)], total_special / 100)
+    
+    def _special_offertory_table(self, special_data, total_rows=1):
+        """Style one special offertory table whose last total_rows rows are totals"""
+        special_table = Table(special_data, colWidths=[0.8*inch, 2.2*inch, 2.2*inch, 1*inch], repeatRows=1)
+        style = [
+            # Header row styling
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0,0), (-1,-1), 9),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            
+            # Grid and borders
+            ('GRID', (0,0), (-1,-1), 1, colors.black),
+            ('BOX', (0,0), (-1,-1), 2, colors.black),
+            
+            # Data rows - left align name and description, center others
+            ('ALIGN', (1,1), (1,-1 - total_rows), 'LEFT'),    # Names column
+            ('ALIGN', (2,1), (2,-1 - total_rows), 'LEFT'),    # Description column
+            
+            # Padding
+            ('TOPPADDING', (0,0), (-1,-1), 6),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+        ]
+        # Total rows styling, merging the first three columns
+        for row in range(-total_rows, 0):
+            style += [
+                ('BACKGROUND', (0,row), (-1,row), colors.lightgrey),
+                ('FONTNAME', (0,row), (-1,row), 'Helvetica-Bold'),
+                ('SPAN', (0,row), (2,row)),
+            ]
+        special_table.setStyle(TableStyle(style))
+        return special_table
+    
+    def _update_header_info(self, ws, template, service_date, service_type):
         """Update the header information in the report"""
-        # Find and update the date field
-        for row in ws.iter_rows(min_row=1, max_row=10):
-            for cell in row:
-                if cell.value and "Date:" in str(cell.value):
-                    # Update date in adjacent cell
-                    date_obj = datetime.datetime.strptime(service_date, "%Y-%m-%d")
-                    formatted_date = date_obj.strftime("%d/%m/%y")
-                    ws[f"{chr(ord(cell.column_letter) + 1)}{cell.row}"] = formatted_date
-                
-                if cell.value and "Sunday" in str(cell.value):
-                    # Update service type
-                    ws[cell.coordinate] = f"Sunday - {service_type}"
+        if template.date_cell:
+            date_obj = datetime.datetime.strptime(service_date, "%Y-%m-%d")
+            ws[template.date_cell] = date_obj.strftime("%d/%m/%y")
+        if template.service_cell:
+            ws[template.service_cell] = f"Sunday - {service_type}"
     
-    def _fill_section_a(self, ws, receipts_data):
+    def _fill_section_a(self, ws, template, receipts_data, total_cash=None):
         """Fill Section A - Bag Offertory Collection with cash denominations"""
         # This section would be manually filled or based on cash collection data
         # For now, we'll calculate totals from receipts and estimate denominations
+        if total_cash is None:
+            total_cash = self._calculate_total_cash(receipts_data)
         
-        total_cash = 0
-        for receipt in receipts_data:
-            # Sum all cash amounts from receipts
-            payment_method = receipt.get('PaymentMethod', 'CASH')
-            if payment_method.upper() == 'CASH':
-                for field in ['TitheAmount', 'MembershipAmount', 'BirthdayThankOffering',
-                             'WeddingAnniversaryThankOffering', 'SpecialThanksAmount',
-                             'MissionAndEvangelismFund', 'CharityFundAmount',
-                             'StStephensSocialAidFund', 'HarvestAuctionAmount',
-                             'DonationAmount']:
-                    amount = receipt.get(field, 0)
-                    if amount:
-                        try:
-                            total_cash += float(amount)
-                        except (ValueError, TypeError):
-                            continue
-        
-        # Find the total cash cell in Section A and update it
-        for row in ws.iter_rows():
-            for cell in row:
-                if cell.value and "TOTAL CASH - A" in str(cell.value):
-                    # Update the adjacent cell with total
-                    ws[f"{chr(ord(cell.column_letter) + 1)}{cell.row}"] = total_cash
-                    break
+        # The total goes right of the "TOTAL CASH - A" label (past its merged cells)
+        if template.total_cash_cell:
+            ws[template.total_cash_cell] = total_cash
         
         return total_cash
     
-    def _fill_section_b(self, ws, receipts_data):
+    def _fill_section_b(self, ws, template, receipts_data):
         """Fill Section B - Special Offertory with individual contributions"""
         total_special = 0
         sr_no = 1
+        current_row = template.section_b_row
         
-        # Find the starting row for Section B data
-        start_row = None
-        for row_idx, row in enumerate(ws.iter_rows(), 1):
-            for cell in row:
-                if cell.value and "Special Offertory" in str(cell.value):
-                    start_row = row_idx + 3  # Start a few rows below the header
-                    break
-            if start_row:
-                break
-        
-        if not start_row:
-            start_row = 15  # Default starting row if not found
-        
-        current_row = start_row
-        
-        for receipt in receipts_data:
-            name = receipt.get('Name', 'Unknown')
-            if not name or name == 'Unknown':
+        for record in as_records(receipts_data):
+            if not record.name or record.name == 'Unknown':
                 continue
             
-            # Calculate total amount for this person
-            person_total = 0
-            contributions = []
-            
-            # Check all contribution types
-            contribution_types = {
-                'TitheAmount': 'Tithe',
-                'MembershipAmount': 'Membership',
-                'BirthdayThankOffering': 'Birthday Offering',
-                'WeddingAnniversaryThankOffering': 'Anniversary Offering',
-                'SpecialThanksAmount': 'Special Thanks',
-                'MissionAndEvangelismFund': 'Mission & Evangelism',
-                'CharityFundAmount': 'Charity Fund',
-                'StStephensSocialAidFund': 'Social Aid',
-                'HarvestAuctionAmount': 'Harvest Auction',
-                'DonationAmount': 'Donation'
-            }
-            
-            for field, description in contribution_types.items():
-                amount = receipt.get(field, 0)
-                if amount:
-                    try:
-                        amount_val = float(amount)
-                        if amount_val > 0:
-                            person_total += amount_val
-                            
-                            # Add specific details
-                            if field == 'TitheAmount' and receipt.get('TitheMonth'):
-                                contributions.append(f"{description} ({receipt.get('TitheMonth')})")
-                            elif field == 'MembershipAmount' and receipt.get('MembershipMonth'):
-                                contributions.append(f"{description} ({receipt.get('MembershipMonth')})")
-                            elif field == 'DonationAmount' and receipt.get('DonationFor'):
-                                contributions.append(f"{description} ({receipt.get('DonationFor')})")
-                            elif field == 'HarvestAuctionAmount' and receipt.get('HarvestAuctionComment'):
-                                contributions.append(f"{description} ({receipt.get('HarvestAuctionComment')})")
-                            else:
-                                contributions.append(description)
-                    except (ValueError, TypeError):
-                        continue
-            
-            if person_total > 0 and contributions:
+            if record.total > 0:
                 # Fill the row with data
                 # Assuming columns: Sr No, Name, Amount, Details
                 ws[f"A{current_row}"] = sr_no  # Sr No
-                ws[f"B{current_row}"] = name   # Name
-                ws[f"C{current_row}"] = person_total  # Amount
-                ws[f"D{current_row}"] = "; ".join(contributions)  # Details
+                ws[f"B{current_row}"] = record.name   # Name
+                ws[f"C{current_row}"] = record.total_rupees  # Amount
+                ws[f"D{current_row}"] = record.details  # Details
                 
-                total_special += person_total
+                total_special += record.total
                 sr_no += 1
                 current_row += 1
+        total_special = total_special / 100
         
         # Update the total for Section B
-        for row in ws.iter_rows():
-            for cell in row:
-                if cell.value and "& B(I)" in str(cell.value):
-                    # This is likely the total cell for Section B
-                    # Find the amount cell in this row
-                    amount_cell = None
-                    for c in row:
-                        if c.column > cell.column:
-                            try:
-                                if c.value is None or isinstance(c.value, (int, float)):
-                                    amount_cell = c
-                                    break
-                            except:
-                                continue
-                    if amount_cell:
-                        amount_cell.value = total_special
-                    break
+        if template.total_special_cell:
+            ws[template.total_special_cell] = total_special
         
         return total_special
     
-    def _update_totals(self, ws, total_cash_a, total_special_b):
+    def _update_totals(self, ws, template, total_cash_a, total_special_b):
         """Update the grand totals in the report"""
-        grand_total = total_cash_a + total_special_b
-        
-        # Find and update grand total cells
-        for row in ws.iter_rows():
-            for cell in row:
-                if cell.value and "GRAND TOTAL" in str(cell.value):
-                    # Look for amount cells in this row
-                    for c in row:
-                        if c.column > cell.column:
-                            try:
-                                if c.value is None or isinstance(c.value, (int, float)):
-                                    c.value = grand_total
-                                    break
-                            except:
-                                continue
-                    break
+        if template.grand_total_cell:
+            ws[template.grand_total_cell] = total_cash_a + total_special_b
     
     def get_available_receipt_dates(self):
         """Get list of available receipt dates for report generation"""
+        from receipt_ledger import get_receipt_ledger, ledger_ready
+        if ledger_ready():
+            return get_receipt_ledger().dates()
+        
         receipts_data = self.collect_receipt_data()
         dates = set()
         
@@ -653,57 +593,19 @@ class OffertoryReportGenerator:
         if end_date is None:
             end_date = datetime.date.today().strftime("%Y-%m-%d")
         
-        receipts_data = self.collect_receipt_data()
-        
-        # Filter by date range
-        filtered_data = []
-        for receipt in receipts_data:
-            receipt_date = receipt.get('InvoiceDate', '')
-            if 'T' in receipt_date:
-                receipt_date = receipt_date.split('T')[0]
-            
-            if start_date <= receipt_date <= end_date:
-                filtered_data.append(receipt)
-        
-        # Generate summary statistics
-        summary = {
-            'total_receipts': len(filtered_data),
-            'total_amount': 0,
-            'by_type': {},
-            'by_date': {},
-            'start_date': start_date,
-            'end_date': end_date
-        }
-        
-        for receipt in filtered_data:
-            # Sum amounts
-            receipt_total = 0
-            for field in ['TitheAmount', 'MembershipAmount', 'BirthdayThankOffering',
-                         'WeddingAnniversaryThankOffering', 'SpecialThanksAmount',
-                         'MissionAndEvangelismFund', 'CharityFundAmount',
-                         'StStephensSocialAidFund', 'HarvestAuctionAmount',
-                         'DonationAmount']:
-                amount = receipt.get(field, 0)
-                if amount:
-                    try:
-                        receipt_total += float(amount)
-                    except (ValueError, TypeError):
-                        continue
-            
-            summary['total_amount'] += receipt_total
-            
-            # Group by date
-            receipt_date = receipt.get('InvoiceDate', '')
-            if 'T' in receipt_date:
-                receipt_date = receipt_date.split('T')[0]
-            
-            if receipt_date not in summary['by_date']:
-                summary['by_date'][receipt_date] = {'count': 0, 'amount': 0}
-            
-            summary['by_date'][receipt_date]['count'] += 1
-            summary['by_date'][receipt_date]['amount'] += receipt_total
-        
-        return summary
+        # The ledger keeps daily rollups, so its summary costs one row per day
+        from receipt_ledger import get_receipt_ledger, ledger_ready
+        if ledger_ready():
+            return get_receipt_ledger().summary(start_date, end_date)
+        
+        from receipt_aggregation import NUMPY_AVAILABLE, summarize, summary_columns
+        if not NUMPY_AVAILABLE:
+            return summarize(self.collect_receipt_data(), start_date, end_date)
+        # The columns are rebuilt only when a result file was added, changed or deleted
+        columns = get_result_cache().derived(
+            'summary_columns', self._result_search_paths(), self._extract_receipt_data_from_result, summary_columns
+        )
+        return summarize(columns, start_date, end_date)
 
 def create_offertory_report(service_date=None, service_type="Worship Service"):
     """Convenience function to generate offertory report"""
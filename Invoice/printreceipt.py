@@ -20,198 +20,196 @@ HarvestAuctionAmount: None
 OnlineChequeNo: None
 """
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import datetime
 import random
 import os
+import threading
+
+from receipt_numbers import get_receipt_allocator
+from receipt_assets import get_fonts, get_logo, get_signature
+from receipt_record import AMOUNT_FIELDS, ReceiptRecord, format_rupees
 
 def get_next_receipt_number():
-    """Get the next receipt number from file, increment and save"""
-    # Use absolute path to ensure we always use the receipt_counter.txt in Invoice folder
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    receipt_file = os.path.join(script_dir, "receipt_counter.txt")
-    try:
-        if os.path.exists(receipt_file):
-            with open(receipt_file, 'r') as f:
-                current_number = int(f.read().strip())
-        else:
-            current_number = 0
-        
-        next_number = current_number + 1
-        
-        # Save the next number
-        with open(receipt_file, 'w') as f:
-            f.write(str(next_number))
-        
-        return str(next_number)
-    except:
-        return "1"
+    """Get the next receipt number from the shared, lock-protected counter"""
+    return str(get_receipt_allocator().next_number())
 
 def reset_receipt_counter():
     """Reset receipt counter to 1"""
-    # Use absolute path to ensure we always use the receipt_counter.txt in Invoice folder
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    receipt_file = os.path.join(script_dir, "receipt_counter.txt")
-    with open(receipt_file, 'w') as f:
-        f.write("0")
+    get_receipt_allocator().reset(0)
     print("Receipt counter reset to 1")
 
-def generate_receipt(invoice_data, output_formats=["jpg", "pdf"]):
-    # Receipt dimensions (1/4th of A4 size: A4 is 210x297mm, 1/4th is approximately 210x74mm)
-    # At 96 DPI: 210mm = ~794px, 74mm = ~280px, but we need more height for content
-    width, height = 500, 700
-    
+# Receipt dimensions (1/4th of A4 size: A4 is 210x297mm, 1/4th is approximately 210x74mm)
+# At 96 DPI: 210mm = ~794px, 74mm = ~280px, but we need more height for content
+RECEIPT_WIDTH, RECEIPT_HEIGHT = 500, 700
+
+# Bump whenever the static part of the receipt changes so cached backgrounds are redrawn
+RECEIPT_LAYOUT_VERSION = 1
+
+# Colors
+RED_COLOR = (220, 20, 60)
+BLACK_COLOR = (0, 0, 0)
+
+# Fixed vertical positions of the receipt rows
+DETAILS_Y = 135
+NAME_Y = DETAILS_Y + 35
+AMOUNT_WORDS_Y = NAME_Y + 20
+TOWARDS_Y = AMOUNT_WORDS_Y + 20
+TABLE_TOP = TOWARDS_Y + 25
+ROW_HEIGHT = 30
+
+# Table rows: label, detail field and amount field
+TABLE_ROWS = [
+    ("Monthly Tithe for", 'TitheMonth', 'TitheAmount'),
+    ("Membership Fee for", 'MembershipMonth', 'MembershipAmount'),
+    ("Birthday Offering", None, 'BirthdayThankOffering'),
+    ("Wedding Anniversary Offering", None, 'WeddingAnniversaryThankOffering'),
+    ("Special Thanks Offering", None, 'SpecialThanksAmount'),
+    ("Mission & Evangelism", None, 'MissionAndEvangelismFund'),
+    ("Charity Relief Fund", None, 'CharityFundAmount'),
+    ("St. Stephen's Social aid", None, 'StStephensSocialAidFund'),
+    ("Harvest Auction", 'HarvestAuctionComment', 'HarvestAuctionAmount'),
+    ("Donation for", 'DonationFor', 'DonationAmount')
+]
+TOTAL_ROW_Y = TABLE_TOP + ROW_HEIGHT * (len(TABLE_ROWS) + 1)
+FOOTER_Y = TOTAL_ROW_Y + 50
+
+_receipt_backgrounds = {}
+_background_lock = threading.Lock()
+
+def _draw_centered(draw, y, text, font, fill):
+    """Draw text horizontally centered on the receipt"""
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    draw.text(((RECEIPT_WIDTH - text_width) // 2, y), text, fill=fill, font=font)
+
+def _draw_receipt_background():
+    """Draw everything that is identical on every receipt"""
     # Create a white background
-    img = Image.new('RGB', (width, height), 'white')
+    img = Image.new('RGB', (RECEIPT_WIDTH, RECEIPT_HEIGHT), 'white')
     draw = ImageDraw.Draw(img)
+    fonts = get_fonts()
     
-    # Try to use different font sizes
-    try:
-        title_font = ImageFont.truetype("arial.ttf", 22)
-        title_bold_font = ImageFont.truetype("arialbd.ttf", 22)  # Bold version
-        header_font = ImageFont.truetype("arial.ttf", 14)
-        header_bold_font = ImageFont.truetype("arialbd.ttf", 14)  # Bold version
-        body_font = ImageFont.truetype("arial.ttf", 12)
-        body_bold_font = ImageFont.truetype("arialbd.ttf", 12)  # Bold version
-        small_font = ImageFont.truetype("arial.ttf", 10)
-        large_num_font = ImageFont.truetype("arial.ttf", 28)
-    except:
-        # Fallback to default font if arial is not available
-        title_font = ImageFont.load_default()
-        title_bold_font = ImageFont.load_default()
-        header_font = ImageFont.load_default()
-        header_bold_font = ImageFont.load_default()
-        body_font = ImageFont.load_default()
-        body_bold_font = ImageFont.load_default()
-        small_font = ImageFont.load_default()
-        large_num_font = ImageFont.load_default()
-    
-    # Colors
-    red_color = (220, 20, 60)
-    black_color = (0, 0, 0)
-    
-    # Load and place the Methodist Church Logo
-    try:
-        # Use absolute path to ensure logo is always found
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        logo_path = os.path.join(script_dir, "logo.jpg")
-        logo = Image.open(logo_path)
-        # Resize logo to fit appropriately (reduced size to avoid overlap)
-        logo_size = (50, 50)
-        logo = logo.resize(logo_size, Image.Resampling.LANCZOS)
+    # Place the Methodist Church Logo (cached, already resized to 50x50)
+    logo = get_logo()
+    if logo is not None:
+        logo_image, logo_mask = logo
         # Position logo on the left side
-        logo_x = 15
-        logo_y = 20
-        if logo.mode != 'RGBA':
-            logo = logo.convert('RGBA')
-        img.paste(logo, (logo_x, logo_y), logo)
-    except Exception as e:
-        print(f"Warning: Could not load logo.jpg: {e}")
+        img.paste(logo_image, (15, 20), logo_mask)
+    else:
         # Fallback: Draw Methodist Church Logo area (simplified flame/cross symbol)
         # Outer flame shape
         draw.polygon([(30, 40), (45, 25), (60, 40), (65, 60), (60, 80), (50, 95), 
-                      (40, 95), (30, 80), (25, 60)], fill=red_color)
+                      (40, 95), (30, 80), (25, 60)], fill=RED_COLOR)
         
         # Inner cross
         draw.rectangle([(40, 45), (50, 85)], fill='white', width=2)
         draw.rectangle([(35, 58), (55, 68)], fill='white', width=2)
     
     # Church Title (centered, moved higher, bold)
-    title_text = "The Methodist English Church"
-    title_bbox = draw.textbbox((0, 0), title_text, font=title_bold_font)
-    title_width = title_bbox[2] - title_bbox[0]
-    title_x = (width - title_width) // 2
-    draw.text((title_x, 25), title_text, fill=black_color, font=title_bold_font)
+    _draw_centered(draw, 25, "The Methodist English Church", fonts['title_bold'], BLACK_COLOR)
     
     # Church Address (centered)
-    address_text = "39, Elphinstone Road, Kirkee, Pune - 411 003."
-    address_bbox = draw.textbbox((0, 0), address_text, font=header_font)
-    address_width = address_bbox[2] - address_bbox[0]
-    address_x = (width - address_width) // 2
-    draw.text((address_x, 55), address_text, fill=black_color, font=header_font)
+    _draw_centered(draw, 55, "39, Elphinstone Road, Kirkee, Pune - 411 003.", fonts['header'], BLACK_COLOR)
     
     # Registration info (centered)
-    reg_text = "(Bombay Public Trust Act - Regn No. D-36)"
-    reg_bbox = draw.textbbox((0, 0), reg_text, font=small_font)
-    reg_width = reg_bbox[2] - reg_bbox[0]
-    reg_x = (width - reg_width) // 2
-    draw.text((reg_x, 75), reg_text, fill=black_color, font=small_font)
+    _draw_centered(draw, 75, "(Bombay Public Trust Act - Regn No. D-36)", fonts['small'], BLACK_COLOR)
     
     # Bible Verse in red (centered) - reduced space from registration line
-    verse_text = '"Give and it will be given to you, a good measure, pressed down,'
-    verse_text2 = 'shaken together and running over will be given..." Luke 6:38'
+    _draw_centered(draw, 95, '"Give and it will be given to you, a good measure, pressed down,', fonts['small'], RED_COLOR)
+    _draw_centered(draw, 110, 'shaken together and running over will be given..." Luke 6:38', fonts['small'], RED_COLOR)
+    
+    # Receipt details labels
+    draw.text((50, DETAILS_Y), "Rec No.", fill=BLACK_COLOR, font=fonts['body'])
+    draw.text((50, NAME_Y), "Received with thanks from", fill=BLACK_COLOR, font=fonts['body'])
+    draw.text((50, AMOUNT_WORDS_Y), "a sum of rupees", fill=BLACK_COLOR, font=fonts['body'])
+    
+    # Table headers
+    y_pos = TABLE_TOP
+    draw.rectangle([(50, y_pos), (450, y_pos + 30)], outline=BLACK_COLOR, width=2)
+    # Draw vertical line before Rs column (more space)
+    draw.line([(340, y_pos), (340, y_pos + 30)], fill=BLACK_COLOR, width=1)
+    # Move Amount(₹) header more to the right
+    draw.text((375, y_pos + 5), "Amount(₹)", fill=BLACK_COLOR, font=fonts['body'])
+    
+    # Table rows with empty check boxes; ticks and amounts are drawn per receipt
+    y_pos += ROW_HEIGHT
+    for item, _, _ in TABLE_ROWS:
+        draw.rectangle([(50, y_pos), (450, y_pos + 30)], outline=BLACK_COLOR, width=1)
+        draw.line([(340, y_pos), (340, y_pos + 30)], fill=BLACK_COLOR, width=1)
+        draw.rectangle([(60, y_pos + 8), (75, y_pos + 23)], outline=BLACK_COLOR, width=1)
+        draw.text((85, y_pos + 5), item, fill=BLACK_COLOR, font=fonts['body'])
+        y_pos += ROW_HEIGHT
+    
+    # Total row
+    draw.rectangle([(50, y_pos), (450, y_pos + 40)], outline=BLACK_COLOR, width=2)
+    # Draw vertical line before Rs column in total row (more space)
+    draw.line([(340, y_pos), (340, y_pos + 40)], fill=BLACK_COLOR, width=1)
+    draw.text((290, y_pos + 10), "Total", fill=BLACK_COLOR, font=fonts['header'])
+    
+    # Signature
+    draw.text((320, FOOTER_Y), "Treasurer / Secretary", fill=BLACK_COLOR, font=fonts['body'])
+    # Place NameT.jpg image directly below Treasurer/Secretary text
+    signature = get_signature()
+    if signature is not None:
+        signature_image, signature_mask = signature
+        img.paste(signature_image, (330, FOOTER_Y + 15), signature_mask)
+    else:
+        # Fallback: Draw a simple signature placeholder
+        draw.rectangle([(330, FOOTER_Y + 15), (410, FOOTER_Y + 55)], outline=BLACK_COLOR, width=1)
+        draw.text((340, FOOTER_Y + 30), "Signature", fill=BLACK_COLOR, font=fonts['body'])
     
-    # Center first line of Bible verse
-    verse1_bbox = draw.textbbox((0, 0), verse_text, font=small_font)
-    verse1_width = verse1_bbox[2] - verse1_bbox[0]
-    verse1_x = (width - verse1_width) // 2
-    draw.text((verse1_x, 95), verse_text, fill=red_color, font=small_font)
+    return img
+
+def get_receipt_background(layout_version=RECEIPT_LAYOUT_VERSION):
+    """Return the cached static receipt layer for layout_version (do not modify it)"""
+    background = _receipt_backgrounds.get(layout_version)
+    if background is None:
+        with _background_lock:
+            background = _receipt_backgrounds.get(layout_version)
+            if background is None:
+                background = _draw_receipt_background()
+                _receipt_backgrounds[layout_version] = background
+    return background
+
+def _draw_underlined(draw, position, text, font):
+    """Draw text with a one pixel underline just below it"""
+    draw.text(position, text, fill=BLACK_COLOR, font=font)
+    bbox = draw.textbbox(position, text, font=font)
+    draw.line([(position[0], bbox[3] + 2), (bbox[2], bbox[3] + 2)], fill=BLACK_COLOR, width=1)
+
+def generate_receipt(invoice_data, output_formats=["jpg", "pdf"]):
+    # Start from a copy of the pre-rendered static layer and draw only what varies
+    img = get_receipt_background().copy()
+    draw = ImageDraw.Draw(img)
     
-    # Center second line of Bible verse
-    verse2_bbox = draw.textbbox((0, 0), verse_text2, font=small_font)
-    verse2_width = verse2_bbox[2] - verse2_bbox[0]
-    verse2_x = (width - verse2_width) // 2
-    draw.text((verse2_x, 110), verse_text2, fill=red_color, font=small_font)
+    # Fonts are loaded once per process (falls back to the default font)
+    fonts = get_fonts()
+    header_font = fonts['header']
+    header_bold_font = fonts['header_bold']
+    body_font = fonts['body']
+    body_bold_font = fonts['body_bold']
+    black_color = BLACK_COLOR
     
     # Generate receipt number (dynamic)
-    receipt_no = invoice_data.get('ReceiptNo', get_next_receipt_number())
+    receipt_no = str(invoice_data.get('ReceiptNo') or get_next_receipt_number())
     
-    # Receipt details header (reduced space after Bible verse)
-    y_pos = 135
-    draw.text((50, y_pos), "Rec No.", fill=black_color, font=body_font)
     # Align receipt number with "Rec No." text using smaller font
-    draw.text((110, y_pos), receipt_no, fill=black_color, font=header_font)
+    draw.text((110, DETAILS_Y), receipt_no, fill=black_color, font=header_font)
     
     # Date (formatted to match the image format)
     date_formatted = datetime.datetime.strptime(invoice_data['InvoiceDate'], '%Y-%m-%d').strftime('%d/%m/%Y')
-    draw.text((320, y_pos), f"Date : {date_formatted}", fill=black_color, font=body_font)
+    draw.text((320, DETAILS_Y), f"Date : {date_formatted}", fill=black_color, font=body_font)
     
-    y_pos += 35
-    draw.text((50, y_pos), "Received with thanks from", fill=black_color, font=body_font)
     # Name in bold with underline
-    name_start_x = 220
-    draw.text((name_start_x, y_pos), invoice_data['Name'], fill=black_color, font=body_bold_font)
-    # Draw underline for name
-    name_bbox = draw.textbbox((name_start_x, y_pos), invoice_data['Name'], font=body_bold_font)
-    draw.line([(name_start_x, name_bbox[3] + 2), (name_bbox[2], name_bbox[3] + 2)], fill=black_color, width=1)
+    _draw_underlined(draw, (220, NAME_Y), invoice_data['Name'], body_bold_font)
     
-    y_pos += 20
-    draw.text((50, y_pos), "a sum of rupees", fill=black_color, font=body_font)
-    
-    # Calculate total amount first to get the correct sum in words
-    temp_total = 0
-    temp_items = [
-        invoice_data.get('TitheAmount', ''),
-        invoice_data.get('MembershipAmount', ''), 
-        invoice_data.get('BirthdayThankOffering', ''),
-        invoice_data.get('WeddingAnniversaryThankOffering', ''),
-        invoice_data.get('SpecialThanksAmount', ''),
-        invoice_data.get('MissionAndEvangelismFund', ''),
-        invoice_data.get('CharityFundAmount', ''),
-        invoice_data.get('StStephensSocialAidFund', ''),
-        invoice_data.get('HarvestAuctionAmount', ''),
-        invoice_data.get('DonationAmount', '')
-    ]
-    
-    for amount in temp_items:
-        try:
-            if isinstance(amount, str):
-                amount_value = float(amount) if amount and amount.strip() != '' and amount != 'None' else 0
-            elif isinstance(amount, (int, float)):
-                amount_value = float(amount) if amount > 0 else 0
-            else:
-                amount_value = 0
-            temp_total += amount_value
-        except (ValueError, TypeError):
-            temp_total += 0
+    y_pos = AMOUNT_WORDS_Y
+    # Amounts are parsed once; the total gives the sum in words
+    record = ReceiptRecord(invoice_data)
     
     # Convert total amount to words in bold with underline
-    # Safely convert amount to integer for number_to_words
-    try:
-        amount_int = int(temp_total) if temp_total > 0 else 0
-    except (ValueError, TypeError):
-        amount_int = 0
-        
+    amount_int = record.total // 100
     if amount_int > 0:
         amount_words = number_to_words(amount_int) + " Only"
         amount_start_x = 160
@@ -230,172 +228,49 @@ def generate_receipt(invoice_data, output_formats=["jpg", "pdf"]):
     towards_bbox = draw.textbbox((50, y_pos), towards_text, font=body_font)
     contribution_start_x = towards_bbox[2] + 5  # Add 5 pixels spacing
     
-    # Generate dynamic contribution comments based on actual contributions
-    def get_contribution_comments(invoice_data):
-        """Generate contribution comments based on non-zero amounts"""
-        contributions = []
-        
-        # Check each contribution type and add to list if amount exists
-        try:
-            if invoice_data.get('TitheAmount') and float(invoice_data.get('TitheAmount', 0) or 0) > 0:
-                contributions.append("Tithe")
-            if invoice_data.get('MembershipAmount') and float(invoice_data.get('MembershipAmount', 0) or 0) > 0:
-                contributions.append("Membership")
-            if invoice_data.get('BirthdayThankOffering') and float(invoice_data.get('BirthdayThankOffering', 0) or 0) > 0:
-                contributions.append("Birthday Offering")
-            if invoice_data.get('WeddingAnniversaryThankOffering') and float(invoice_data.get('WeddingAnniversaryThankOffering', 0) or 0) > 0:
-                contributions.append("Anniversary Offering")
-            if invoice_data.get('SpecialThanksAmount') and float(invoice_data.get('SpecialThanksAmount', 0) or 0) > 0:
-                contributions.append("Special Thanks")
-            if invoice_data.get('MissionAndEvangelismFund') and float(invoice_data.get('MissionAndEvangelismFund', 0) or 0) > 0:
-                contributions.append("Mission & Evangelism")
-            if invoice_data.get('CharityFundAmount') and float(invoice_data.get('CharityFundAmount', 0) or 0) > 0:
-                contributions.append("Charity Fund")
-            if invoice_data.get('StStephensSocialAidFund') and float(invoice_data.get('StStephensSocialAidFund', 0) or 0) > 0:
-                contributions.append("Social Aid")
-            if invoice_data.get('HarvestAuctionAmount') and float(invoice_data.get('HarvestAuctionAmount', 0) or 0) > 0:
-                contributions.append("Harvest Auction")
-            if invoice_data.get('DonationAmount') and float(invoice_data.get('DonationAmount', 0) or 0) > 0:
-                contributions.append("Donation")
-        except (ValueError, TypeError):
-            # If there's any error in conversion, default to generic
-            pass
-        
-        # Format the contributions list
-        if len(contributions) == 0:
-            return "Contribution"
-        elif len(contributions) == 1:
-            return contributions[0]
-        elif len(contributions) == 2:
-            return f"{contributions[0]} & {contributions[1]}"
-        elif len(contributions) <= 4:
-            return f"{', '.join(contributions[:-1])} & {contributions[-1]}"
-        else:
-            # If more than 4 contributions, show first 3 and "& Others"
-            return f"{', '.join(contributions[:3])} & Others"
-    
-    contribution_text = get_contribution_comments(invoice_data)
+    # Contribution comments based on the non-zero amounts
+    contribution_text = record.summary
     draw.text((contribution_start_x, y_pos), contribution_text, fill=black_color, font=body_bold_font)
     # Draw underline for contribution text
     contribution_bbox = draw.textbbox((contribution_start_x, y_pos), contribution_text, font=body_bold_font)
     draw.line([(contribution_start_x, contribution_bbox[3] + 2), (contribution_bbox[2], contribution_bbox[3] + 2)], fill=black_color, width=1)
     
-    # Draw table (reduced space)
-    y_pos += 25
-    table_top = y_pos
+    # Table rows (grid, item labels and empty check boxes come from the background)
+    y_pos = TABLE_TOP + ROW_HEIGHT
     
-    # Table headers
-    draw.rectangle([(50, y_pos), (450, y_pos + 30)], outline=black_color, width=2)
-    # Draw vertical line before Rs column (more space)
-    draw.line([(340, y_pos), (340, y_pos + 30)], fill=black_color, width=1)
-    # Move Amount(₹) header more to the right
-    draw.text((375, y_pos + 5), "Amount(₹)", fill=black_color, font=body_font)
-    
-    # Table rows
-    table_items = [
-        ("Monthly Tithe for", invoice_data.get('TitheMonth', ''), invoice_data.get('TitheAmount', '')),
-        ("Membership Fee for", invoice_data.get('MembershipMonth', ''), invoice_data.get('MembershipAmount', '')),
-        ("Birthday Offering", '', invoice_data.get('BirthdayThankOffering', '')),
-        ("Wedding Anniversary Offering", '', invoice_data.get('WeddingAnniversaryThankOffering', '')),
-        ("Special Thanks Offering", '', invoice_data.get('SpecialThanksAmount', '')),
-        ("Mission & Evangelism", '', invoice_data.get('MissionAndEvangelismFund', '')),
-        ("Charity Relief Fund", '', invoice_data.get('CharityFundAmount', '')),
-        ("St. Stephen's Social aid", '', invoice_data.get('StStephensSocialAidFund', '')),
-        ("Harvest Auction", invoice_data.get('HarvestAuctionComment', ''), invoice_data.get('HarvestAuctionAmount', '')),
-        ("Donation for", invoice_data.get('DonationFor', ''), invoice_data.get('DonationAmount', ''))
-    ]
-    
-    y_pos += 30
-    total_amount = 0
-    
-    for item, detail, amount in table_items:
-        draw.rectangle([(50, y_pos), (450, y_pos + 30)], outline=black_color, width=1)
-        
-        # Draw vertical line before Rs column (more space)
-        draw.line([(340, y_pos), (340, y_pos + 30)], fill=black_color, width=1)
+    for item, detail_field, amount_field in TABLE_ROWS:
+        detail = invoice_data.get(detail_field, '') if detail_field else ''
+        amount = record.amount(amount_field)
         
         # Check box - tick at the beginning of line if amount exists
-        if amount and amount != 'None' and amount != '':
+        if amount > 0:
             draw.rectangle([(60, y_pos + 8), (75, y_pos + 23)], outline=black_color, width=2)
             # Better tick mark
             draw.text((63, y_pos + 6), "✓", fill=black_color, font=body_bold_font)
-            # Right-align the amount in the Rs column
-            # Format amount with 2 decimal places
-            if isinstance(amount, (int, float)) and amount > 0:
-                amount_text = f"{amount:.2f}"
-            else:
-                amount_text = str(amount) if amount else ""
-            
+            # Right-align the amount (2 decimal places) in the Rs column
+            amount_text = format_rupees(amount)
             amount_bbox = draw.textbbox((0, 0), amount_text, font=body_font)
             amount_width = amount_bbox[2] - amount_bbox[0]
             amount_x = 440 - amount_width  # Right-align within the column
             draw.text((amount_x, y_pos + 5), amount_text, fill=black_color, font=body_font)
-            
-            # Add to total with proper decimal handling
-            try:
-                # Convert to float, handling both string and numeric inputs
-                if isinstance(amount, str):
-                    amount_value = float(amount) if amount and amount.strip() != '' and amount != 'None' else 0
-                elif isinstance(amount, (int, float)):
-                    amount_value = float(amount) if amount > 0 else 0
-                else:
-                    amount_value = 0
-                total_amount += amount_value
-            except (ValueError, TypeError):
-                total_amount += 0
-        else:
-            draw.rectangle([(60, y_pos + 8), (75, y_pos + 23)], outline=black_color, width=1)
         
-        # Item text
-        full_text = f"{item}"
+        # Detail (month, comment or purpose) in bold with underline after the item text
         if detail and detail != 'None':
-            # Check if this is TitheMonth, MembershipMonth, HarvestAuctionComment, or DonationFor to make it bold
-            if item in ["Monthly Tithe for", "Membership Fee for"] and detail:
-                # Draw the item text in regular font
-                draw.text((85, y_pos + 5), full_text + " ", fill=black_color, font=body_font)
-                # Calculate the width of the item text to position the detail text
-                item_bbox = draw.textbbox((0, 0), full_text + " ", font=body_font)
-                item_width = item_bbox[2] - item_bbox[0]
-                # Draw the detail (month) in bold font
-                detail_x = 85 + item_width
-                draw.text((detail_x, y_pos + 5), detail, fill=black_color, font=body_bold_font)
-                # Draw underline for the detail (month)
-                detail_bbox = draw.textbbox((detail_x, y_pos + 5), detail, font=body_bold_font)
-                draw.line([(detail_x, detail_bbox[3] + 2), (detail_bbox[2], detail_bbox[3] + 2)], fill=black_color, width=1)
-            elif item in ["Harvest Auction", "Donation for"] and detail:
-                # Draw the item text in regular font
-                draw.text((85, y_pos + 5), full_text + " ", fill=black_color, font=body_font)
-                # Calculate the width of the item text to position the detail text
-                item_bbox = draw.textbbox((0, 0), full_text + " ", font=body_font)
-                item_width = item_bbox[2] - item_bbox[0]
-                # Draw the detail (comment/purpose) in bold font
-                detail_x = 85 + item_width
-                draw.text((detail_x, y_pos + 5), detail, fill=black_color, font=body_bold_font)
-                # Draw underline for the detail (comment/purpose)
-                detail_bbox = draw.textbbox((detail_x, y_pos + 5), detail, font=body_bold_font)
-                draw.line([(detail_x, detail_bbox[3] + 2), (detail_bbox[2], detail_bbox[3] + 2)], fill=black_color, width=1)
-            else:
-                full_text += f" {detail}"
-                draw.text((85, y_pos + 5), full_text, fill=black_color, font=body_font)
-        else:
-            draw.text((85, y_pos + 5), full_text, fill=black_color, font=body_font)
+            item_bbox = draw.textbbox((0, 0), item + " ", font=body_font)
+            detail_x = 85 + item_bbox[2] - item_bbox[0]
+            _draw_underlined(draw, (detail_x, y_pos + 5), detail, body_bold_font)
         
-        y_pos += 30
+        y_pos += ROW_HEIGHT
     
-    # Total row
-    draw.rectangle([(50, y_pos), (450, y_pos + 40)], outline=black_color, width=2)
-    # Draw vertical line before Rs column in total row (more space)
-    draw.line([(340, y_pos), (340, y_pos + 40)], fill=black_color, width=1)
-    draw.text((290, y_pos + 10), "Total", fill=black_color, font=header_font)
     # Right-align the total amount in bold
-    total_text = f"{total_amount:.2f}"
+    total_text = format_rupees(record.total)
     total_bbox = draw.textbbox((0, 0), total_text, font=header_bold_font)
     total_width = total_bbox[2] - total_bbox[0]
     total_x = 440 - total_width  # Right-align within the column
-    draw.text((total_x, y_pos + 10), total_text, fill=black_color, font=header_bold_font)
+    draw.text((total_x, TOTAL_ROW_Y + 10), total_text, fill=black_color, font=header_bold_font)
     
     # Online/Cheque number (reduced space) - Dynamic based on payment method
-    y_pos += 50
+    y_pos = FOOTER_Y
     payment_method = invoice_data.get('PaymentMethod', 'CASH').upper()
     if payment_method == 'CHEQUE':
         number_label = "Cheque No."
@@ -412,27 +287,6 @@ def generate_receipt(invoice_data, output_formats=["jpg", "pdf"]):
     value_x = 50 + label_width + 10  # Label start + label width + small gap
     draw.text((value_x, y_pos), str(cheque_no), fill=black_color, font=body_font)
     
-    # Signature
-    draw.text((320, y_pos), "Treasurer / Secretary", fill=black_color, font=body_font)
-    # Place NameT.jpg image directly below Treasurer/Secretary text
-    try:
-        # Use absolute path to ensure signature image is always found
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        signature_path = os.path.join(script_dir, "NameT.jpg")
-        signature = Image.open(signature_path)
-        signature_size = (80, 40)
-        signature = signature.resize(signature_size, Image.Resampling.LANCZOS)
-        signature_x = 330
-        signature_y = y_pos + 15
-        if signature.mode != 'RGBA':
-            signature = signature.convert('RGBA')
-        img.paste(signature, (signature_x, signature_y), signature)
-    except Exception as e:
-        print(f"Warning: Could not load NameT.jpg: {e}")
-        # Fallback: Draw a simple signature placeholder
-        draw.rectangle([(330, y_pos + 15), (410, y_pos + 55)], outline=black_color, width=1)
-        draw.text((340, y_pos + 30), "Signature", fill=black_color, font=body_font)
-    
     # Return the image along with receipt details for filename generation
     # Create filename-friendly date format: DD-MMM-YYYY (e.g., 08-Aug-2025)
     date_for_filename = datetime.datetime.strptime(invoice_data['InvoiceDate'], '%Y-%m-%d').strftime('%d-%b-%Y')
@@ -597,11 +451,7 @@ def edit_invoice_data(invoice_data):
                         print(f"✗ Empty value not allowed. {field_name} kept as current value")
                     else:
                         # Convert to appropriate type
-                        if field_name in ['TitheAmount', 'MembershipAmount', 'BirthdayThankOffering', 
-                                        'WeddingAnniversaryThankOffering', 'HomeMissionPledges', 
-                                        'MissionAndEvangelismFund', 'StStephensSocialAidFund',
-                                        'SpecialThanksAmount', 'CharityFundAmount', 'DonationAmount',
-                                        'HarvestAuctionAmount']:
+                        if field_name in AMOUNT_FIELDS:
                             try:
                                 invoice_data[field_name] = int(new_value)
                                 print(f"✓ {field_name} updated to: {invoice_data[field_name]}")
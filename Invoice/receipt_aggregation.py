@@ -0,0 +1,194 @@
+"""
+Receipt Aggregation
+Column-oriented totals over receipts for the summary and analytics reports.
+
+Receipts are turned into NumPy columns on first use: amounts as int64 paise
+(one array per category), and dates, months, donors and payment methods as
+integer codes into small label lists. Only the columns a report needs are
+built, and each only once. Totals by date, category, payment
+method, donor or month are then single grouped reductions (np.bincount)
+instead of a Python loop that re-parses every amount. Summing in paise also
+keeps totals exact to the paisa. Like ReceiptRecord.total, negative amounts
+count as zero everywhere.
+
+The summary report keeps its columns in the result file cache (see
+summary_columns), so they are only rebuilt after a result file changes.
+
+When NumPy is not installed, summarize() falls back to the plain loop.
+"""
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+from receipt_record import AMOUNT_FIELDS, TOTAL_FIELDS, ReceiptRecord, parse_paise
+
+# The summary counts the same amounts as the receipt total
+SUMMARY_FIELDS = TOTAL_FIELDS
+
+GROUP_KEYS = ('date', 'month', 'payment_method', 'donor')
+
+
+def _receipt_date(receipt):
+    receipt_date = receipt.get('InvoiceDate', '') or ''
+    if 'T' in receipt_date:
+        receipt_date = receipt_date.split('T')[0]
+    return receipt_date
+
+
+class ReceiptColumns:
+    def __init__(self, receipts):
+        """Wrap receipt data dictionaries; columns are built as they are needed"""
+        if not NUMPY_AVAILABLE:
+            raise ImportError("numpy is required for column aggregation. Please install it with: pip install numpy")
+        self.receipts = list(receipts)
+        self.size = len(self.receipts)
+        self.labels, self._codes, self._amounts, self._totals = {}, {}, {}, {}
+
+    def _column_values(self, key):
+        if key == 'date':
+            return [_receipt_date(receipt) for receipt in self.receipts]
+        if key == 'payment_method':
+            return [str(receipt.get('PaymentMethod') or 'CASH').upper() for receipt in self.receipts]
+        if key == 'donor':
+            return [' '.join(str(receipt.get('Name') or '').split()) for receipt in self.receipts]
+        raise ValueError(f"Unknown grouping: {key}")
+
+    def codes(self, key):
+        """Return the integer code array for key, encoding the column on first use"""
+        if key not in self._codes:
+            if key == 'month':
+                # Months derive from the already encoded date labels
+                date_codes = self.codes('date')
+                lookup = {}
+                label_codes = [lookup.setdefault(label[:7], len(lookup)) for label in self.labels['date']]
+                self.labels[key] = list(lookup)
+                self._codes[key] = np.array(label_codes, dtype=np.int64)[date_codes] if label_codes else date_codes
+            else:
+                # Dictionary-encode: a new value gets the next code
+                lookup = {}
+                codes = [lookup.setdefault(value, len(lookup)) for value in self._column_values(key)]
+                self.labels[key] = list(lookup)
+                self._codes[key] = np.array(codes, dtype=np.int64)
+        return self._codes[key]
+
+    def amounts(self, field):
+        """Return the int64 paise array of one amount field, parsing it on first use"""
+        if field not in self._amounts:
+            column = [receipt.get(field, 0) for receipt in self.receipts]
+            paise = None
+            try:
+                # Fast path: every value is already a number (ledger receipts are)
+                values = np.array(column, dtype=np.float64)
+                if np.isfinite(values).all():
+                    paise = np.rint(values * 100).astype(np.int64)
+            except (ValueError, TypeError):
+                pass
+            if paise is None:
+                paise = np.array([parse_paise(value) for value in column], dtype=np.int64)
+            self._amounts[field] = paise
+        return self._amounts[field]
+
+    def date_mask(self, start_date=None, end_date=None):
+        """Return a boolean mask of receipts dated within the inclusive range"""
+        date_codes = self.codes('date')
+        # Compare each distinct date once, then broadcast to the receipts
+        keep = np.array([(start_date is None or start_date <= label) and (end_date is None or label <= end_date)
+                         for label in self.labels['date']], dtype=bool)
+        return keep[date_codes] if len(keep) else np.zeros(0, dtype=bool)
+
+    def receipt_totals(self, fields=SUMMARY_FIELDS):
+        """Return each receipt's total in paise over the given amount fields"""
+        key = tuple(fields)
+        if key not in self._totals:
+            totals = np.zeros(self.size, dtype=np.int64)
+            for field in fields:
+                # Like ReceiptRecord.total, only positive amounts count
+                totals += np.maximum(self.amounts(field), 0)
+            self._totals[key] = totals
+        return self._totals[key]
+
+    def totals_by(self, key, mask=None, fields=SUMMARY_FIELDS):
+        """
+        Group receipt counts and totals
+        Args:
+            key: 'date', 'month', 'payment_method' or 'donor'
+            mask: Optional boolean mask selecting receipts
+            fields: Amount fields counted in the totals
+        Returns:
+            Dictionary of label -> {'count': receipts, 'amount': rupees},
+            ordered by label
+        """
+        codes = self.codes(key)
+        totals = self.receipt_totals(fields)
+        if mask is not None:
+            codes, totals = codes[mask], totals[mask]
+        size = len(self.labels[key])
+        counts = np.bincount(codes, minlength=size)
+        amounts = np.bincount(codes, weights=totals, minlength=size)
+        return {
+            label: {'count': int(counts[code]), 'amount': round(float(amounts[code])) / 100}
+            for code, label in sorted(enumerate(self.labels[key]), key=lambda item: item[1])
+            if counts[code]
+        }
+
+    def totals_by_category(self, mask=None):
+        """Return the total in rupees of every amount field, counting only positive amounts"""
+        totals = {}
+        for field in AMOUNT_FIELDS:
+            paise = np.maximum(self.amounts(field), 0)
+            totals[field] = int((paise if mask is None else paise[mask]).sum()) / 100
+        return totals
+
+
+def summary_columns(receipts):
+    """
+    Build the ReceiptColumns used by summarize(), with the date codes and
+    receipt totals already computed so the shared object is only read
+    """
+    columns = ReceiptColumns(receipts)
+    columns.codes('date')
+    columns.receipt_totals()
+    return columns
+
+
+def _summarize_loop(receipts, start_date, end_date):
+    """Pure Python summary, used when NumPy is unavailable"""
+    summary = {'total_receipts': 0, 'total_amount': 0, 'by_type': {}, 'by_date': {},
+               'start_date': start_date, 'end_date': end_date}
+    for receipt in receipts:
+        receipt_date = _receipt_date(receipt)
+        if not start_date <= receipt_date <= end_date:
+            continue
+        receipt_total = ReceiptRecord(receipt).total_rupees
+        summary['total_receipts'] += 1
+        summary['total_amount'] += receipt_total
+        day = summary['by_date'].setdefault(receipt_date, {'count': 0, 'amount': 0})
+        day['count'] += 1
+        day['amount'] += receipt_total
+    return summary
+
+
+def summarize(receipts, start_date, end_date):
+    """
+    Summarize receipts dated within an inclusive range
+    Returns:
+        Dictionary with total_receipts, total_amount, by_type, by_date,
+        start_date and end_date, as returned by generate_summary_report
+    """
+    if not NUMPY_AVAILABLE:
+        return _summarize_loop(receipts, start_date, end_date)
+    columns = receipts if isinstance(receipts, ReceiptColumns) else ReceiptColumns(receipts)
+    mask = columns.date_mask(start_date, end_date)
+    totals = columns.receipt_totals()
+    return {
+        'total_receipts': int(mask.sum()),
+        'total_amount': int(totals[mask].sum()) / 100,
+        'by_type': {},
+        'by_date': columns.totals_by('date', mask),
+        'start_date': start_date,
+        'end_date': end_date
+    }
@@ -0,0 +1,91 @@
+"""
+Receipt Asset Cache
+Loads the fonts, logo and signature used on receipts once per process.
+
+Images are decoded, resized and converted to RGBA on first use and the same
+objects are handed to every caller afterwards. They are shared between
+threads, so callers must treat them as read-only (pasting them is fine).
+"""
+
+import os
+import logging
+import threading
+
+from PIL import Image, ImageFont
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_PATH = os.path.join(SCRIPT_DIR, "logo.jpg")
+SIGNATURE_PATH = os.path.join(SCRIPT_DIR, "NameT.jpg")
+LOGO_SIZE = (50, 50)
+SIGNATURE_SIZE = (80, 40)
+
+# Font name and size for every font style used on receipts
+FONT_SPECS = {
+    'title': ("arial.ttf", 22),
+    'title_bold': ("arialbd.ttf", 22),
+    'header': ("arial.ttf", 14),
+    'header_bold': ("arialbd.ttf", 14),
+    'body': ("arial.ttf", 12),
+    'body_bold': ("arialbd.ttf", 12),
+    'small': ("arial.ttf", 10),
+    'large_num': ("arial.ttf", 28),
+}
+
+_fonts = None
+_images = {}
+_lock = threading.Lock()
+
+
+def get_fonts():
+    """Return the shared font dictionary keyed by style name"""
+    global _fonts
+    if _fonts is None:
+        with _lock:
+            if _fonts is None:
+                try:
+                    _fonts = {name: ImageFont.truetype(font_file, size)
+                              for name, (font_file, size) in FONT_SPECS.items()}
+                except (OSError, ImportError):
+                    # Fallback to default font if arial is not available
+                    default_font = ImageFont.load_default()
+                    _fonts = {name: default_font for name in FONT_SPECS}
+    return _fonts
+
+
+def get_image(path, size):
+    """
+    Return a cached RGBA image resized to size, with its alpha mask
+    Returns:
+        Tuple of (image, mask), or None if the file could not be loaded
+    """
+    key = (path, size)
+    if key not in _images:
+        with _lock:
+            if key not in _images:
+                try:
+                    with Image.open(path) as source:
+                        image = source.resize(size, Image.Resampling.LANCZOS)
+                    if image.mode != 'RGBA':
+                        image = image.convert('RGBA')
+                    _images[key] = (image, image.getchannel('A'))
+                except Exception as e:
+                    logging.warning(f"Could not load {os.path.basename(path)}: {e}")
+                    _images[key] = None
+    return _images[key]
+
+
+def get_logo():
+    """Return the (image, mask) pair for the church logo, or None"""
+    return get_image(LOGO_PATH, LOGO_SIZE)
+
+
+def get_signature():
+    """Return the (image, mask) pair for the treasurer signature, or None"""
+    return get_image(SIGNATURE_PATH, SIGNATURE_SIZE)
+
+
+def warm_up():
+    """Load every receipt asset now so the first receipt is not slowed down"""
+    get_fonts()
+    get_logo()
+    get_signature()
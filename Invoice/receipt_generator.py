@@ -3,11 +3,14 @@ Methodist Church Receipt Generator
 This script generates official receipts for The Methodist English Church donations
 """
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import datetime
 import random
 import os
 
+from receipt_assets import get_fonts, get_logo, get_signature
+from receipt_record import ReceiptRecord
+
 class ReceiptGenerator:
     def __init__(self):
         self.width = 800
@@ -20,44 +23,18 @@ class ReceiptGenerator:
         }
     
     def _load_fonts(self):
-        """Load fonts with fallback options"""
-        try:
-            return {
-                'title': ImageFont.truetype("arial.ttf", 22),
-                'header': ImageFont.truetype("arial.ttf", 14),
-                'body': ImageFont.truetype("arial.ttf", 12),
-                'small': ImageFont.truetype("arial.ttf", 10),
-                'large_num': ImageFont.truetype("arial.ttf", 28)
-            }
-        except:
-            # Fallback to default fonts
-            default_font = ImageFont.load_default()
-            return {
-                'title': default_font,
-                'header': default_font,
-                'body': default_font,
-                'small': default_font,
-                'large_num': default_font
-            }
+        """Load fonts from the shared asset cache (with fallback to default)"""
+        fonts = get_fonts()
+        return {name: fonts[name] for name in ('title', 'header', 'body', 'small', 'large_num')}
     
     def _draw_church_logo(self, draw, img):
-        """Draw the Methodist Church logo using actual logo.jpg file"""
-        try:
-            # Use absolute path to ensure logo is always found
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            logo_path = os.path.join(script_dir, "logo.jpg")
-            logo = Image.open(logo_path)
-            # Resize logo to fit appropriately
-            logo_size = (50, 50)
-            logo = logo.resize(logo_size, Image.Resampling.LANCZOS)
+        """Draw the Methodist Church logo using the cached logo.jpg image"""
+        logo = get_logo()
+        if logo is not None:
+            logo_image, logo_mask = logo
             # Position logo on the left side
-            logo_x = 15
-            logo_y = 20
-            if logo.mode != 'RGBA':
-                logo = logo.convert('RGBA')
-            img.paste(logo, (logo_x, logo_y), logo)
-        except Exception as e:
-            print(f"Warning: Could not load logo.jpg: {e}")
+            img.paste(logo_image, (15, 20), logo_mask)
+        else:
             # Fallback: Draw Methodist Church flame/cross logo
             # Outer flame shape
             draw.polygon([(30, 40), (45, 25), (60, 40), (65, 60), (60, 80), (50, 95), 
@@ -170,51 +147,8 @@ class ReceiptGenerator:
         towards_bbox = draw.textbbox((50, y_pos), towards_text, font=self.fonts['body'])
         contribution_start_x = towards_bbox[2] + 5  # Add 5 pixels spacing
         
-        # Generate dynamic contribution comments based on actual contributions
-        def get_contribution_comments(invoice_data):
-            """Generate contribution comments based on non-zero amounts"""
-            contributions = []
-            
-            # Check each contribution type and add to list if amount exists
-            try:
-                if invoice_data.get('TitheAmount') and float(invoice_data.get('TitheAmount', 0) or 0) > 0:
-                    contributions.append("Tithe")
-                if invoice_data.get('MembershipAmount') and float(invoice_data.get('MembershipAmount', 0) or 0) > 0:
-                    contributions.append("Membership")
-                if invoice_data.get('BirthdayThankOffering') and float(invoice_data.get('BirthdayThankOffering', 0) or 0) > 0:
-                    contributions.append("Birthday Offering")
-                if invoice_data.get('WeddingAnniversaryThankOffering') and float(invoice_data.get('WeddingAnniversaryThankOffering', 0) or 0) > 0:
-                    contributions.append("Anniversary Offering")
-                if invoice_data.get('SpecialThanksAmount') and float(invoice_data.get('SpecialThanksAmount', 0) or 0) > 0:
-                    contributions.append("Special Thanks")
-                if invoice_data.get('MissionAndEvangelismFund') and float(invoice_data.get('MissionAndEvangelismFund', 0) or 0) > 0:
-                    contributions.append("Mission & Evangelism")
-                if invoice_data.get('CharityFundAmount') and float(invoice_data.get('CharityFundAmount', 0) or 0) > 0:
-                    contributions.append("Charity Fund")
-                if invoice_data.get('StStephensSocialAidFund') and float(invoice_data.get('StStephensSocialAidFund', 0) or 0) > 0:
-                    contributions.append("Social Aid")
-                if invoice_data.get('HarvestAuctionAmount') and float(invoice_data.get('HarvestAuctionAmount', 0) or 0) > 0:
-                    contributions.append("Harvest Auction")
-                if invoice_data.get('DonationAmount') and float(invoice_data.get('DonationAmount', 0) or 0) > 0:
-                    contributions.append("Donation")
-            except (ValueError, TypeError):
-                # If there's any error in conversion, default to generic
-                pass
-            
-            # Format the contributions list
-            if len(contributions) == 0:
-                return "Contribution"
-            elif len(contributions) == 1:
-                return contributions[0]
-            elif len(contributions) == 2:
-                return f"{contributions[0]} & {contributions[1]}"
-            elif len(contributions) <= 4:
-                return f"{', '.join(contributions[:-1])} & {contributions[-1]}"
-            else:
-                # If more than 4 contributions, show first 3 and "& Others"
-                return f"{', '.join(contributions[:3])} & Others"
-        
-        contribution_text = get_contribution_comments(invoice_data)
+        # Contribution comments based on the non-zero amounts
+        contribution_text = ReceiptRecord(invoice_data).summary
         draw.text((contribution_start_x, y_pos), contribution_text, 
                  fill=self.colors['black'], font=self.fonts['body'])
         draw.line([(contribution_start_x, y_pos + 20), (contribution_start_x + 100, y_pos + 20)], 
@@ -237,18 +171,8 @@ class ReceiptGenerator:
         return img, full_output_path
     
     def _calculate_total_amount(self, invoice_data):
-        """Calculate total amount from all donation types"""
-        total = 0
-        amount_fields = ['TitheAmount', 'MembershipAmount', 'BirthdayThankOffering', 
-                        'WeddingAnniversaryThankOffering', 'MissionAndEvangelismFund', 
-                        'StStephensSocialAidFund']
-        
-        for field in amount_fields:
-            value = invoice_data.get(field)
-            if value and value != 'None' and str(value).isdigit():
-                total += int(value)
-        
-        return total
+        """Calculate the total amount in whole rupees from all donation types"""
+        return ReceiptRecord(invoice_data).total // 100
     
     def _draw_donation_table(self, draw, invoice_data, start_y):
         """Draw the donation items table"""
@@ -331,20 +255,11 @@ class ReceiptGenerator:
                  fill=self.colors['black'], font=self.fonts['body'])
         
         # Place NameT.jpg image below Treasurer/Secretary text
-        try:
-            # Use absolute path to ensure signature image is always found
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            signature_path = os.path.join(script_dir, "NameT.jpg")
-            signature = Image.open(signature_path)
-            signature_size = (80, 40)
-            signature = signature.resize(signature_size, Image.Resampling.LANCZOS)
-            signature_x = 610
-            signature_y = y_pos + 15
-            if signature.mode != 'RGBA':
-                signature = signature.convert('RGBA')
-            img.paste(signature, (signature_x, signature_y), signature)
-        except Exception as e:
-            print(f"Warning: Could not load NameT.jpg: {e}")
+        signature = get_signature()
+        if signature is not None:
+            signature_image, signature_mask = signature
+            img.paste(signature_image, (610, y_pos + 15), signature_mask)
+        else:
             # Fallback: Draw simple text signature
             draw.text((650, y_pos + 20), "APS", 
                      fill=self.colors['black'], font=self.fonts['body'])
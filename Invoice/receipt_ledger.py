@@ -0,0 +1,449 @@
+"""
+Receipt Ledger
+Indexed SQLite store of generated receipts used by the report generators.
+
+Every analyzed form is recorded under its upload file name when its result
+is saved, so reports query by date instead of globbing and parsing every
+result JSON file. Generating a receipt from that upload replaces the row
+with the edited form and its receipt number, so each form is counted once;
+receipts with no upload (manual entry, batches) are added as new rows.
+Existing result files are brought in once by the importer, which runs on
+first use (unless RECEIPT_LEDGER_AUTO_IMPORT=0) or by hand:
+
+Rollup tables (totals per service date, category and payment method, and
+per donor per month) are updated in the same transaction as each insert,
+so summaries cost one row per day rather than one per receipt. They can be
+rebuilt from the receipts at any time:
+
+Usage: python receipt_ledger.py import
+       python receipt_ledger.py rebuild-rollups
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from receipt_record import AMOUNT_FIELDS, TEXT_FIELDS, ReceiptRecord, normalize_date, parse_paise
+from file_locks import exclusive_lock
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LEDGER_DB = os.getenv("RECEIPT_LEDGER_DB", os.path.join(SCRIPT_DIR, "Receipts store", "receipt_ledger.db"))
+# Import existing result files the first time reports need the ledger
+AUTO_IMPORT = os.getenv("RECEIPT_LEDGER_AUTO_IMPORT", "1") != "0"
+# Bump when the rollup tables change so existing ledgers rebuild them on open
+ROLLUP_VERSION = 1
+
+# Locations scanned by the one-shot import
+RESULT_DIRS = [
+    os.path.join(SCRIPT_DIR, "uploads"),
+    os.path.join(SCRIPT_DIR, "Receipts store"),
+]
+RESULT_SUFFIX = "_result.json"
+# Extract.csv is not imported: its rows are the same forms as the result files,
+# without the upload name needed to tell them apart. The archive falls back to it.
+EXTRACT_FILES = [
+    os.path.join(SCRIPT_DIR, "Extract.csv"),
+    os.path.join(os.path.dirname(SCRIPT_DIR), "Extract.csv"),
+]
+
+
+def _clean_receipt(receipt):
+    """Return a copy of receipt with a YYYY-MM-DD date and numeric amounts"""
+    cleaned = {}
+    for field in ['InvoiceDate'] + TEXT_FIELDS:
+        value = receipt.get(field)
+        if value not in (None, ''):
+            cleaned[field] = str(value).strip()
+    try:
+        cleaned['InvoiceDate'] = normalize_date(cleaned.get('InvoiceDate', '').split('T')[0])
+    except ValueError:
+        pass
+    for field in AMOUNT_FIELDS:
+        cleaned[field] = parse_paise(receipt.get(field)) / 100
+    cleaned['PaymentMethod'] = str(receipt.get('PaymentMethod') or 'CASH').upper()
+    return cleaned
+
+
+def _receipt_from_result(result_data, generator=None):
+    """Return the receipt data in an analysis result, or None if it has no name or date"""
+    if generator is None:
+        from offertory_report import OffertoryReportGenerator
+        generator = OffertoryReportGenerator()
+    receipt = generator._extract_receipt_data_from_result(result_data)
+    if receipt.get('Name') and receipt.get('InvoiceDate'):
+        return receipt
+    return None
+
+
+class ReceiptLedger:
+    def __init__(self, db_path=LEDGER_DB):
+        """Initialize the ledger backed by the SQLite file at db_path"""
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS receipts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    receipt_no TEXT,
+                    upload TEXT,
+                    invoice_date TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    payment_method TEXT NOT NULL,
+                    source TEXT,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_receipts_date ON receipts (invoice_date)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_receipts_name ON receipts (name COLLATE NOCASE)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_receipts_payment ON receipts (payment_method, invoice_date)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_receipts_upload ON receipts (upload) "
+                         "WHERE upload IS NOT NULL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_totals (
+                    invoice_date TEXT NOT NULL,
+                    payment_method TEXT NOT NULL,
+                    receipts INTEGER NOT NULL,
+                    total_paise INTEGER NOT NULL,
+                    PRIMARY KEY (invoice_date, payment_method)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_rollup (
+                    invoice_date TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    payment_method TEXT NOT NULL,
+                    receipts INTEGER NOT NULL,
+                    amount_paise INTEGER NOT NULL,
+                    PRIMARY KEY (invoice_date, category, payment_method)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS donor_monthly (
+                    month TEXT NOT NULL,
+                    name TEXT NOT NULL COLLATE NOCASE,
+                    receipts INTEGER NOT NULL,
+                    total_paise INTEGER NOT NULL,
+                    PRIMARY KEY (month, name)
+                ) WITHOUT ROWID
+            """)
+            version = conn.execute("SELECT value FROM meta WHERE key = 'rollup_version'").fetchone()
+        if version is None or version[0] != str(ROLLUP_VERSION):
+            self.rebuild_rollups()
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the ledger thread-safe
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, receipt_data, receipt_no=None, source='generated', upload=None):
+        """Add one generated receipt to the ledger and return its row id"""
+        return self.record_many([receipt_data], [receipt_no], source=source, uploads=[upload])[0]
+
+    def record_upload(self, upload, result_data, source='upload'):
+        """
+        Record the form in an analysis result under its upload file name
+        Returns:
+            Row id, or None if the result has no name or date
+        """
+        receipt = _receipt_from_result(result_data)
+        if receipt is None:
+            return None
+        return self.record_many([receipt], source=source, uploads=[upload])[0]
+
+    def record_many(self, receipts, receipt_numbers=None, source='generated', uploads=None, skip_existing=False):
+        """
+        Add several receipts in one transaction
+        Args:
+            receipts: Receipt data dictionaries in the /generate_receipt format
+            receipt_numbers: Matching receipt numbers (or None)
+            source: Where the receipts came from, kept for auditing
+            uploads: Matching upload file names (or None). A receipt for an
+                     upload that is already in the ledger replaces it.
+            skip_existing: Leave uploads that are already in the ledger
+                           untouched instead (used by the importer)
+        Returns:
+            Row ids, with None for skipped receipts
+        """
+        receipt_numbers = receipt_numbers or [None] * len(receipts)
+        uploads = uploads or [None] * len(receipts)
+        row_ids = []
+        now = time.time()
+        with self._connect() as conn:
+            # Take the write lock first so two writers cannot both add the same upload
+            conn.execute("BEGIN IMMEDIATE")
+            for receipt, receipt_no, upload in zip(receipts, receipt_numbers, uploads):
+                cleaned = _clean_receipt(receipt)
+                existing = None
+                if upload:
+                    existing = conn.execute("SELECT id, data FROM receipts WHERE upload = ?", (upload,)).fetchone()
+                if existing and skip_existing:
+                    row_ids.append(None)
+                    continue
+                values = (str(receipt_no) if receipt_no else None, cleaned.get('InvoiceDate', ''),
+                          cleaned.get('Name', ''), cleaned['PaymentMethod'], source,
+                          json.dumps(cleaned, ensure_ascii=False))
+                if existing:
+                    row_id, old_data = existing
+                    self._add_to_rollups(conn, ReceiptRecord(json.loads(old_data)), sign=-1)
+                    conn.execute(
+                        "UPDATE receipts SET receipt_no = COALESCE(?, receipt_no), invoice_date = ?, name = ?, "
+                        "payment_method = ?, source = ?, data = ? WHERE id = ?",
+                        values + (row_id,),
+                    )
+                else:
+                    row_id = conn.execute(
+                        "INSERT INTO receipts (receipt_no, invoice_date, name, payment_method, source, data, "
+                        "upload, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        values + (upload, now),
+                    ).lastrowid
+                row_ids.append(row_id)
+                self._add_to_rollups(conn, ReceiptRecord(cleaned))
+        return row_ids
+
+    @staticmethod
+    def _add_to_rollups(conn, record, sign=1):
+        """Add one receipt to the rollup tables, or take it out with sign=-1 (inside the caller's transaction)"""
+        conn.execute(
+            "INSERT INTO daily_totals (invoice_date, payment_method, receipts, total_paise) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (invoice_date, payment_method) DO UPDATE SET "
+            "receipts = receipts + excluded.receipts, total_paise = total_paise + excluded.total_paise",
+            (record.invoice_date, record.payment_method, sign, sign * record.total),
+        )
+        conn.executemany(
+            "INSERT INTO daily_rollup (invoice_date, category, payment_method, receipts, amount_paise) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (invoice_date, category, payment_method) DO UPDATE SET "
+            "receipts = receipts + excluded.receipts, amount_paise = amount_paise + excluded.amount_paise",
+            [(record.invoice_date, field, record.payment_method, sign, sign * paise)
+             for field, paise in zip(AMOUNT_FIELDS, record.amounts) if paise > 0],
+        )
+        conn.execute(
+            "INSERT INTO donor_monthly (month, name, receipts, total_paise) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (month, name) DO UPDATE SET "
+            "receipts = receipts + excluded.receipts, total_paise = total_paise + excluded.total_paise",
+            (record.invoice_date[:7], ' '.join(record.name.split()), sign, sign * record.total),
+        )
+        if sign < 0:
+            for table in ('daily_totals', 'daily_rollup', 'donor_monthly'):
+                conn.execute(f"DELETE FROM {table} WHERE receipts = 0")
+
+    def rebuild_rollups(self):
+        """Recompute every rollup table from the receipts; returns the number of receipts counted"""
+        with self._connect() as conn:
+            # Take the write lock first so receipts cannot be added mid-rebuild
+            conn.execute("BEGIN IMMEDIATE")
+            for table in ('daily_totals', 'daily_rollup', 'donor_monthly'):
+                conn.execute(f"DELETE FROM {table}")
+            count = 0
+            for (data,) in conn.execute("SELECT data FROM receipts").fetchall():
+                self._add_to_rollups(conn, ReceiptRecord(json.loads(data)))
+                count += 1
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollup_version', ?)",
+                         (str(ROLLUP_VERSION),))
+        return count
+
+    def summary(self, start_date, end_date):
+        """
+        Summarize receipts dated within an inclusive range from the rollups
+        Returns:
+            Dictionary in the generate_summary_report format
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT invoice_date, SUM(receipts), SUM(total_paise) FROM daily_totals "
+                "WHERE invoice_date BETWEEN ? AND ? GROUP BY invoice_date ORDER BY invoice_date",
+                (start_date, end_date),
+            ).fetchall()
+        return {
+            'total_receipts': sum(row[1] for row in rows),
+            'total_amount': sum(row[2] for row in rows) / 100,
+            'by_type': {},
+            'by_date': {row[0]: {'count': row[1], 'amount': row[2] / 100} for row in rows},
+            'start_date': start_date,
+            'end_date': end_date
+        }
+
+    def payment_totals(self, invoice_date):
+        """Return {payment method: total in rupees} for one date"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payment_method, total_paise FROM daily_totals WHERE invoice_date = ?", (invoice_date,)
+            ).fetchall()
+        return {method: total / 100 for method, total in rows}
+
+    def category_totals(self, start_date, end_date, payment_method=None):
+        """Return {amount field: {'count', 'amount'}} for an inclusive date range"""
+        sql = ("SELECT category, SUM(receipts), SUM(amount_paise) FROM daily_rollup "
+               "WHERE invoice_date BETWEEN ? AND ?")
+        params = [start_date, end_date]
+        if payment_method:
+            sql += " AND payment_method = ?"
+            params.append(payment_method.upper())
+        with self._connect() as conn:
+            rows = conn.execute(sql + " GROUP BY category", params).fetchall()
+        return {category: {'count': count, 'amount': amount / 100} for category, count, amount in rows}
+
+    def donor_totals(self, month):
+        """Return {donor name: {'count', 'amount'}} for a YYYY-MM month"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name, receipts, total_paise FROM donor_monthly WHERE month = ? ORDER BY name", (month,)
+            ).fetchall()
+        return {name: {'count': count, 'amount': total / 100} for name, count, total in rows}
+
+    def query(self, date_prefix=None, start_date=None, end_date=None, name=None, payment_method=None):
+        """
+        Return receipt data dictionaries matching every given filter
+        Args:
+            date_prefix: Receipt date starts with this (e.g. 2025-08-03 or 2025-08)
+            start_date, end_date: Inclusive YYYY-MM-DD date range
+            name: Donor name (case-insensitive)
+            payment_method: CASH, CHEQUE or ONLINE
+        """
+        conditions, params = [], []
+        if date_prefix:
+            conditions.append("invoice_date GLOB ?")
+            params.append(f"{date_prefix}*")
+        if start_date:
+            conditions.append("invoice_date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("invoice_date <= ?")
+            params.append(end_date)
+        if name:
+            conditions.append("name = ? COLLATE NOCASE")
+            params.append(name)
+        if payment_method:
+            conditions.append("payment_method = ?")
+            params.append(payment_method.upper())
+
+        sql = "SELECT data FROM receipts"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY invoice_date, id"
+        with self._connect() as conn:
+            return [json.loads(row[0]) for row in conn.execute(sql, params)]
+
+    def receipts_with_numbers(self):
+        """Return every receipt data dictionary with its ReceiptNo, in date order"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT receipt_no, data FROM receipts ORDER BY invoice_date, id")
+            return [dict(json.loads(data), ReceiptNo=receipt_no or '') for receipt_no, data in rows]
+
+    def dates(self):
+        """Return the sorted list of distinct receipt dates"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT invoice_date FROM daily_totals WHERE invoice_date != '' ORDER BY invoice_date"
+            )
+            return [row[0] for row in rows]
+
+    def count(self):
+        """Return the number of receipts in the ledger"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM receipts").fetchone()[0]
+
+    def is_imported(self):
+        """True once the existing result files have been imported"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'legacy_import'").fetchone()
+        return row is not None
+
+    def import_legacy(self, result_dirs=None):
+        """
+        Import existing result JSON files once, keyed on their upload file name
+        Uploads already in the ledger (for example, ones a receipt was generated
+        from) are left as they are.
+        Returns:
+            Dictionary with the number of receipts imported and skipped
+        """
+        from offertory_report import OffertoryReportGenerator
+
+        generator = OffertoryReportGenerator()
+        stats = {'imported': 0, 'skipped': 0}
+
+        for search_path in result_dirs or RESULT_DIRS:
+            receipts, uploads = [], []
+            for json_file in sorted(glob.glob(os.path.join(search_path, "*" + RESULT_SUFFIX))):
+                try:
+                    with open(json_file, 'r', encoding='utf-8') as f:
+                        receipt = _receipt_from_result(json.load(f), generator)
+                except Exception as e:
+                    print(f"Error reading {json_file}: {e}")
+                    continue
+                if receipt is not None:
+                    receipts.append(receipt)
+                    uploads.append(os.path.basename(json_file)[:-len(RESULT_SUFFIX)])
+            row_ids = self.record_many(receipts, source='import', uploads=uploads, skip_existing=True)
+            stats['imported'] += sum(1 for row_id in row_ids if row_id)
+            stats['skipped'] += sum(1 for row_id in row_ids if not row_id)
+
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_import', ?)",
+                         (json.dumps(stats),))
+        return stats
+
+
+_default_ledger = None
+_default_lock = threading.Lock()
+
+
+def get_receipt_ledger():
+    """Return the process-wide ledger for receipt_ledger.db"""
+    global _default_ledger
+    if _default_ledger is None:
+        with _default_lock:
+            if _default_ledger is None:
+                _default_ledger = ReceiptLedger()
+    return _default_ledger
+
+
+_import_lock = threading.Lock()
+_ready = False
+_not_ready_logged = False
+
+
+def ledger_ready():
+    """
+    True if reports should be served from the ledger. On first use the
+    existing result files are imported, once for all workers.
+    """
+    global _ready, _not_ready_logged
+    if _ready:
+        return True
+    ledger = get_receipt_ledger()
+    if not ledger.is_imported() and AUTO_IMPORT:
+        with _import_lock, exclusive_lock(ledger.db_path + ".import.lock"):
+            # Another thread or worker may have finished the import while we waited
+            if not ledger.is_imported():
+                logging.info("Importing result files into the receipt ledger")
+                stats = ledger.import_legacy()
+                logging.info(f"Receipt ledger import finished: {stats}")
+    _ready = ledger.is_imported()
+    if not _ready and not _not_ready_logged:
+        _not_ready_logged = True
+        logging.warning("Receipt ledger has not been imported; reports scan the result files instead. "
+                        "Run: python receipt_ledger.py import")
+    return _ready
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "import":
+        print(json.dumps(get_receipt_ledger().import_legacy(), indent=2))
+    elif len(sys.argv) > 1 and sys.argv[1] == "rebuild-rollups":
+        print(f"Rolled up {get_receipt_ledger().rebuild_rollups()} receipts")
+    else:
+        print("Usage: python receipt_ledger.py import | rebuild-rollups")
@@ -0,0 +1,207 @@
+"""
+Receipt Number Allocator
+Hands out unique receipt numbers across threads and gunicorn workers.
+
+receipt_counter.txt holds the highest number ever reserved, followed on a
+second line by a reset epoch that reset() increments. It is only
+read and rewritten under an exclusive file lock, and every rewrite goes
+through fsync + rename, so a crash can never leave it empty or let two
+workers hand out the same number. Each reservation is also appended to
+receipt_counter.log so that audit() can spot gaps and duplicates.
+
+With RECEIPT_NUMBER_BLOCK_SIZE above 1 each process reserves a block of
+numbers at a time and serves them from memory. That skips the disk on
+most receipts, at the cost of numbers that interleave between workers
+and gaps for any part of a block left unused when a worker exits. Before
+serving from its block a worker checks the epoch, and drops a block that
+was reserved before another worker reset the counter.
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import logging
+import datetime
+import threading
+
+from file_locks import exclusive_lock, atomic_write_text
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+COUNTER_FILE = os.path.join(SCRIPT_DIR, "receipt_counter.txt")
+RECEIPTS_DIR = os.path.join(SCRIPT_DIR, "Receipts store")
+BLOCK_SIZE = int(os.getenv("RECEIPT_NUMBER_BLOCK_SIZE", "1"))
+
+# Matches receipt files saved as Receipt_No-[ReceiptNo]-[Date]-[Name].[ext]
+RECEIPT_FILE_PATTERN = re.compile(r"^Receipt_No-(\d+)-")
+
+
+class ReceiptNumberAllocator:
+    def __init__(self, counter_path=COUNTER_FILE, block_size=BLOCK_SIZE, receipts_dir=RECEIPTS_DIR):
+        """Initialize the allocator for the counter file at counter_path"""
+        self.counter_path = counter_path
+        self.lock_path = counter_path + ".lock"
+        self.log_path = os.path.splitext(counter_path)[0] + ".log"
+        self.block_size = max(1, block_size)
+        self.receipts_dir = receipts_dir
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._epoch = None
+        self._pid = None
+
+    def next_number(self):
+        """Return the next unused receipt number"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Never reuse a block inherited from the parent across a fork
+                self._next = self._end = 0
+                self._pid = os.getpid()
+            if self._next < self._end and self._read_counter()[1] != self._epoch:
+                # The counter was reset since this block was reserved
+                self._next = self._end = 0
+            if self._next >= self._end:
+                block, self._epoch = self._reserve(self.block_size)
+                self._next, self._end = block.start, block.stop
+            number = self._next
+            self._next += 1
+            return number
+
+    def reserve_block(self, count):
+        """Reserve count consecutive receipt numbers, returned as a range"""
+        if count <= 0:
+            return range(0)
+        return self._reserve(count)[0]
+
+    def reset(self, value=0):
+        """Set the counter so the next reserved number is value + 1, in every worker"""
+        with self._lock, exclusive_lock(self.lock_path):
+            epoch = (self._read_counter()[1] or 0) + 1
+            self._write_counter(value, epoch)
+            self._append_log(f"reset {value}")
+            self._next = self._end = 0
+
+    def _reserve(self, count):
+        """Reserve count numbers; returns the block and the epoch it belongs to"""
+        with exclusive_lock(self.lock_path):
+            high_water, epoch = self._read_counter()
+            if high_water is None:
+                high_water = self._recover_high_water()
+                if os.path.exists(self.counter_path):
+                    logging.warning(
+                        f"{self.counter_path} is unreadable; continuing from receipt number {high_water}"
+                    )
+            epoch = epoch or 0
+            block = range(high_water + 1, high_water + count + 1)
+            self._write_counter(block.stop - 1, epoch)
+            self._append_log(f"reserve {block.start} {block.stop - 1}")
+        return block, epoch
+
+    def _read_counter(self):
+        """
+        Read the counter file
+        Returns:
+            (high-water mark, reset epoch); the high-water mark is None when the
+            file is missing or unreadable, and a file without an epoch is epoch 0
+        """
+        try:
+            with open(self.counter_path, 'r') as f:
+                parts = f.read().split()
+            return int(parts[0]), int(parts[1]) if len(parts) > 1 else 0
+        except (FileNotFoundError, ValueError, IndexError):
+            return None, None
+
+    def _write_counter(self, high_water, epoch):
+        atomic_write_text(self.counter_path, f"{high_water}\n{epoch}\n")
+
+    def _recover_high_water(self):
+        """Highest number seen in the reservation log or saved receipts"""
+        reservations = self._read_reservations()
+        numbers = list(self._scan_receipt_files())
+        return max([end for _, end in reservations] + numbers + [0])
+
+    def _append_log(self, entry):
+        timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(f"{timestamp} pid={os.getpid()} {entry}\n")
+
+    def _read_reservations(self):
+        """Return (start, end) pairs for reservations since the last reset"""
+        reservations = []
+        if not os.path.exists(self.log_path):
+            return reservations
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 5 and parts[2] == 'reserve':
+                    reservations.append((int(parts[3]), int(parts[4])))
+                elif len(parts) >= 4 and parts[2] == 'reset':
+                    reservations = []
+        return reservations
+
+    def _scan_receipt_files(self):
+        """Yield the receipt number of every receipt saved in the store"""
+        for path in glob.glob(os.path.join(self.receipts_dir, "Receipt_No-*")):
+            match = RECEIPT_FILE_PATTERN.match(os.path.basename(path))
+            if match:
+                yield int(match.group(1))
+
+    def audit(self):
+        """
+        Check issued receipt numbers for gaps and duplicates
+        Returns:
+            Dictionary with the counter high-water mark, numbers that were
+            reserved more than once, numbers used by more than one saved
+            receipt, and numbers up to the high-water mark with no saved
+            receipt
+        """
+        with exclusive_lock(self.lock_path):
+            high_water = self._read_counter()[0]
+            reservations = self._read_reservations()
+
+        reserved_count = {}
+        for start, end in reservations:
+            for number in range(start, end + 1):
+                reserved_count[number] = reserved_count.get(number, 0) + 1
+
+        # The same receipt is saved once per format, so group by file stem
+        receipts = {}
+        for path in glob.glob(os.path.join(self.receipts_dir, "Receipt_No-*")):
+            name = os.path.basename(path)
+            match = RECEIPT_FILE_PATTERN.match(name)
+            if match:
+                stem = os.path.splitext(name)[0]
+                receipts.setdefault(int(match.group(1)), set()).add(stem)
+
+        upper = high_water if high_water is not None else max(list(receipts) + [0])
+        return {
+            'high_water': high_water,
+            'receipts_found': len(receipts),
+            'duplicate_reservations': sorted(n for n, c in reserved_count.items() if c > 1),
+            'duplicate_receipts': {n: sorted(stems) for n, stems in sorted(receipts.items()) if len(stems) > 1},
+            'gaps': [n for n in range(1, upper + 1) if n not in receipts],
+            'above_high_water': sorted(n for n in receipts if high_water is not None and n > high_water),
+        }
+
+
+_default_allocator = None
+_default_lock = threading.Lock()
+
+
+def get_receipt_allocator():
+    """Return the process-wide allocator for receipt_counter.txt"""
+    global _default_allocator
+    if _default_allocator is None:
+        with _default_lock:
+            if _default_allocator is None:
+                _default_allocator = ReceiptNumberAllocator()
+    return _default_allocator
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "audit":
+        print(json.dumps(get_receipt_allocator().audit(), indent=2))
+    else:
+        print("Usage: python receipt_numbers.py audit")
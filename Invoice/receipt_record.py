@@ -0,0 +1,202 @@
+"""
+Receipt Record
+One parsed receipt shared by the ledger, the reports and the receipt renderers.
+
+Amounts are parsed once into integer paise, so totals add up exactly and
+every module counts the same fields. HomeMissionPledges is a pledge, not
+money received: it is kept on the record (and listed in the description)
+but is not part of the receipt total, which is what the printed receipt
+has always shown.
+"""
+
+import datetime
+
+# Every amount field on the payment form, in Extract.csv column order
+AMOUNT_FIELDS = [
+    'TitheAmount', 'MembershipAmount', 'BirthdayThankOffering',
+    'WeddingAnniversaryThankOffering', 'HomeMissionPledges',
+    'MissionAndEvangelismFund', 'StStephensSocialAidFund',
+    'SpecialThanksAmount', 'CharityFundAmount', 'DonationAmount',
+    'HarvestAuctionAmount'
+]
+
+# Amounts counted in the receipt total, in the order they appear on the receipt
+TOTAL_FIELDS = [
+    'TitheAmount', 'MembershipAmount', 'BirthdayThankOffering',
+    'WeddingAnniversaryThankOffering', 'SpecialThanksAmount',
+    'MissionAndEvangelismFund', 'CharityFundAmount',
+    'StStephensSocialAidFund', 'HarvestAuctionAmount',
+    'DonationAmount'
+]
+
+# Free-text fields of a receipt
+TEXT_FIELDS = [
+    'Name', 'Address', 'MobileNumber', 'TitheMonth', 'MembershipMonth',
+    'DonationFor', 'HarvestAuctionComment', 'OnlineChequeNo'
+]
+# Date formats seen in uploads and in Extract.csv after editing in Excel
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d/%m/%y', '%Y-%m-%dT%H:%M:%S']
+
+# Labels used on the receipt and in Section B of the offertory report
+SHORT_LABELS = {
+    'TitheAmount': 'Tithe',
+    'MembershipAmount': 'Membership',
+    'BirthdayThankOffering': 'Birthday Offering',
+    'WeddingAnniversaryThankOffering': 'Anniversary Offering',
+    'SpecialThanksAmount': 'Special Thanks',
+    'MissionAndEvangelismFund': 'Mission & Evangelism',
+    'CharityFundAmount': 'Charity Fund',
+    'StStephensSocialAidFund': 'Social Aid',
+    'HarvestAuctionAmount': 'Harvest Auction',
+    'DonationAmount': 'Donation'
+}
+
+# Labels used in the PDF special offertory table
+LONG_LABELS = {
+    'TitheAmount': 'Tithe',
+    'MembershipAmount': 'Membership',
+    'BirthdayThankOffering': 'Birthday Thank Offering',
+    'WeddingAnniversaryThankOffering': 'Wedding Anniversary Thank Offering',
+    'SpecialThanksAmount': 'Special Thanks',
+    'MissionAndEvangelismFund': 'Mission and Evangelism Fund',
+    'CharityFundAmount': 'Charity Fund',
+    'StStephensSocialAidFund': 'St.Stephens Social Aid Fund',
+    'HarvestAuctionAmount': 'Harvest Auction',
+    'DonationAmount': 'Donation'
+}
+
+# Text field that qualifies an amount (e.g. the month a tithe is for)
+DETAIL_FIELDS = {
+    'TitheAmount': 'TitheMonth',
+    'MembershipAmount': 'MembershipMonth',
+    'DonationAmount': 'DonationFor',
+    'HarvestAuctionAmount': 'HarvestAuctionComment'
+}
+
+_FIELD_INDEX = {field: index for index, field in enumerate(AMOUNT_FIELDS)}
+
+
+def parse_paise(value):
+    """Parse an amount (number or text such as '1,250.50') into integer paise; bad values are 0"""
+    if value is None or isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        amount = value
+    else:
+        text = str(value).strip().replace(',', '')
+        if not text or text.lower() == 'none':
+            return 0
+        try:
+            amount = float(text)
+        except ValueError:
+            return 0
+    if amount != amount or amount in (float('inf'), float('-inf')):
+        return 0
+    return int(round(amount * 100))
+
+
+def normalize_date(value):
+    """Return value as YYYY-MM-DD, raising ValueError if it is not a date"""
+    value = str(value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised InvoiceDate '{value}'")
+
+
+def format_rupees(paise):
+    """Format paise as rupees with two decimals, e.g. 125050 -> '1250.50'"""
+    sign = '-' if paise < 0 else ''
+    rupees, paise = divmod(abs(paise), 100)
+    return f"{sign}{rupees}.{paise:02d}"
+
+
+def _join_contributions(labels):
+    if len(labels) == 0:
+        return "Contribution"
+    if len(labels) == 1:
+        return labels[0]
+    if len(labels) <= 4:
+        return f"{', '.join(labels[:-1])} & {labels[-1]}"
+    # If more than 4 contributions, show first 3 and "& Others"
+    return f"{', '.join(labels[:3])} & Others"
+
+
+class ReceiptRecord:
+    __slots__ = ('data', 'invoice_date', 'name', 'payment_method', 'receipt_no', 'amounts',
+                 'contributions', 'total', 'details', 'summary', 'description')
+
+    def __init__(self, data):
+        """Parse a receipt data dictionary (as extracted, posted or stored in the ledger)"""
+        self.data = data
+        self.invoice_date = str(data.get('InvoiceDate') or '').split('T')[0]
+        self.name = data.get('Name') or ''
+        self.payment_method = str(data.get('PaymentMethod') or 'CASH').upper()
+        self.receipt_no = str(data.get('ReceiptNo') or '')
+        self.amounts = tuple(parse_paise(data.get(field)) for field in AMOUNT_FIELDS)
+
+        # (field, paise) of every positive amount counted in the total
+        self.contributions = tuple(
+            (field, self.amounts[_FIELD_INDEX[field]]) for field in TOTAL_FIELDS
+            if self.amounts[_FIELD_INDEX[field]] > 0
+        )
+        self.total = sum(paise for _, paise in self.contributions)
+
+        details = []
+        for field, _ in self.contributions:
+            detail = data.get(DETAIL_FIELDS.get(field, ''))
+            details.append(f"{SHORT_LABELS[field]} ({detail})" if detail else SHORT_LABELS[field])
+        # e.g. "Tithe (JULY); Donation (Building Fund)" for report rows
+        self.details = "; ".join(details)
+        # e.g. "Tithe, Membership & Donation" after "towards" on the receipt
+        self.summary = _join_contributions([SHORT_LABELS[field] for field, _ in self.contributions])
+        self.description = self._describe()
+
+    def _describe(self):
+        """Description stored in the Extract.csv ledger, with the amount of each contribution"""
+        data = self.data
+        descriptions = {
+            'TitheAmount': f"Tithe for {data.get('TitheMonth', '')}",
+            'MembershipAmount': f"Membership for {data.get('MembershipMonth', '')}",
+            'BirthdayThankOffering': 'Birthday Thank Offering',
+            'WeddingAnniversaryThankOffering': 'Wedding Anniversary Thank Offering',
+            'HomeMissionPledges': 'Home Mission Pledges',
+            'MissionAndEvangelismFund': 'Mission and Evangelism Fund',
+            'StStephensSocialAidFund': 'St Stephens Social Aid Fund',
+            'SpecialThanksAmount': 'Special Thanks',
+            'CharityFundAmount': 'Charity Fund',
+            'DonationAmount': f"Donation for {data.get('DonationFor', 'General')}",
+            'HarvestAuctionAmount': f"Harvest Auction - {data.get('HarvestAuctionComment', '')}"
+        }
+        contributions = [f"{descriptions[field]} (₹{format_rupees(paise)})"
+                         for field, paise in zip(AMOUNT_FIELDS, self.amounts) if paise > 0]
+        return "; ".join(contributions) if contributions else "No contributions"
+
+    def amount(self, field):
+        """Return one amount in paise"""
+        return self.amounts[_FIELD_INDEX[field]]
+
+    @property
+    def is_cash(self):
+        return self.payment_method == 'CASH'
+
+    @property
+    def total_rupees(self):
+        return self.total / 100
+
+    def detail(self, field):
+        """Return the text qualifying an amount field (month, purpose or comment), or ''"""
+        detail = self.data.get(DETAIL_FIELDS.get(field, ''))
+        return '' if detail in (None, 'None') else str(detail)
+
+
+def as_record(receipt):
+    """Return receipt as a ReceiptRecord, parsing it only if needed"""
+    return receipt if isinstance(receipt, ReceiptRecord) else ReceiptRecord(receipt)
+
+
+def as_records(receipts):
+    """Return a list of ReceiptRecords for receipt dictionaries or records"""
+    return [as_record(receipt) for receipt in receipts]
@@ -0,0 +1,92 @@
+"""
+Report Output Cache
+Serves a previously generated offertory report when its inputs are unchanged.
+
+Each generated report gets a sidecar file holding a fingerprint of what it
+was built from: the receipts for the service date, the service type and the
+report template version. When the same report is requested again and the
+fingerprint still matches, the file on disk is returned without rebuilding
+it. Adding or editing a receipt for that date changes the fingerprint, so
+the next request rebuilds the report.
+"""
+
+import os
+import json
+import hashlib
+
+from file_locks import exclusive_lock, atomic_write_text
+
+# Bump whenever report layout code changes so cached reports are rebuilt
+REPORT_TEMPLATE_VERSION = 3
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE", "1") != "0"
+
+
+def report_fingerprint(receipts_data, service_type, template_path=None):
+    """
+    Return a fingerprint of everything a report is built from
+    Args:
+        receipts_data: Receipt dictionaries or ReceiptRecords for the date
+        service_type: Service type printed on the report
+        template_path: Excel template the report is filled from, if any
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{REPORT_TEMPLATE_VERSION}|{service_type}".encode('utf-8'))
+    if template_path and os.path.exists(template_path):
+        stat = os.stat(template_path)
+        digest.update(f"|{stat.st_mtime_ns}|{stat.st_size}".encode('utf-8'))
+    # Order-independent: the same receipts read in a different order match
+    receipts = sorted(
+        json.dumps(getattr(receipt, 'data', receipt), sort_keys=True, default=str)
+        for receipt in receipts_data
+    )
+    for receipt in receipts:
+        digest.update(b'\n')
+        digest.update(receipt.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _fingerprint_path(report_path):
+    return report_path + ".fingerprint"
+
+
+def is_current(report_path, fingerprint):
+    """True if report_path exists and was built from inputs with this fingerprint"""
+    try:
+        with open(_fingerprint_path(report_path), 'r', encoding='utf-8') as f:
+            return f.read().strip() == fingerprint and os.path.exists(report_path)
+    except FileNotFoundError:
+        return False
+
+
+def get_or_build(report_path, fingerprint, build):
+    """
+    Return report_path, building it only when its inputs changed
+    Args:
+        report_path: Final path of the report
+        fingerprint: report_fingerprint() of the current inputs
+        build: Function writing the report to the path it is given
+    Returns:
+        Tuple of (report_path, True if it was served from the cache)
+    """
+    if not REPORT_CACHE_ENABLED:
+        build(report_path)
+        return report_path, False
+    if is_current(report_path, fingerprint):
+        return report_path, True
+
+    # One builder per report; others wait and then reuse its result
+    with exclusive_lock(report_path + ".lock"):
+        if is_current(report_path, fingerprint):
+            return report_path, True
+        temp_path = f"{report_path}.{os.getpid()}.tmp"
+        # Forget the old fingerprint first, so a crash mid-build never leaves a stale match
+        if os.path.exists(_fingerprint_path(report_path)):
+            os.remove(_fingerprint_path(report_path))
+        try:
+            build(temp_path)
+            os.replace(temp_path, report_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        atomic_write_text(_fingerprint_path(report_path), fingerprint)
+    return report_path, False
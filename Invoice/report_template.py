@@ -0,0 +1,120 @@
+"""
+Offertory Report Template
+Reads the Excel offertory template once per process and indexes its cells.
+
+Scanning Offertory_Report_Template.xlsx for labels used to happen for every
+report. Now the template is read on first use (and again only when the file
+changes), every text label is indexed by coordinate, and the cells each
+report fills in (date, service, section totals, first Section B row) are
+resolved up front, so reports write cells by address.
+
+Only the label lookup is cached: the workbook XML is still parsed once per
+report, from the cached bytes. A parsed workbook cannot be copied instead,
+because copy.deepcopy() empties openpyxl's style tables and copy_worksheet()
+only copies within one workbook. Each report gets its own workbook, so
+reports can be built concurrently without a lock.
+"""
+
+import os
+import threading
+from io import BytesIO
+from contextlib import contextmanager
+
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter, coordinate_to_tuple
+
+# Row Section B starts at when the template has no "Special Offertory" heading
+DEFAULT_SECTION_B_ROW = 15
+HEADER_ROWS = 10
+
+class ReportTemplate:
+    def __init__(self, template_path):
+        """Read the template workbook and resolve the cells reports fill in"""
+        self.template_path = template_path
+        with open(template_path, 'rb') as f:
+            self.template_bytes = f.read()
+        ws = load_workbook(BytesIO(self.template_bytes)).active
+
+        # Text label -> coordinate, in row order
+        self.labels = {}
+        for row in ws.iter_rows():
+            for cell in row:
+                if isinstance(cell.value, str) and cell.value.strip():
+                    self.labels.setdefault(cell.value.strip(), cell.coordinate)
+
+        # (row, column) of every cell covered by a merged range -> that range
+        self._merged = {}
+        for merged in ws.merged_cells.ranges:
+            for row in range(merged.min_row, merged.max_row + 1):
+                for column in range(merged.min_col, merged.max_col + 1):
+                    self._merged[(row, column)] = merged
+
+        self.date_cell = self._next_cell(self.find("Date:", HEADER_ROWS))
+        self.service_cell = self.find("Sunday", HEADER_ROWS)
+        self.total_cash_cell = self._next_cell(self.find("TOTAL CASH - A"))
+        self.total_special_cell = self._amount_cell(ws, self.find("& B(I)"))
+        self.grand_total_cell = self._amount_cell(ws, self.find("GRAND TOTAL"))
+        special = self.find("Special Offertory")
+        self.section_b_row = coordinate_to_tuple(special)[0] + 3 if special else DEFAULT_SECTION_B_ROW
+
+    def find(self, text, max_row=None):
+        """Return the coordinate of the first label containing text, or None"""
+        for label, coordinate in self.labels.items():
+            if text in label and (max_row is None or coordinate_to_tuple(coordinate)[0] <= max_row):
+                return coordinate
+        return None
+
+    def _next_cell(self, coordinate):
+        """Coordinate of the cell right of a label, past any merged range it heads"""
+        if coordinate is None:
+            return None
+        row, column = coordinate_to_tuple(coordinate)
+        merged = self._merged.get((row, column))
+        last_column = merged.max_col if merged is not None else column
+        return f"{get_column_letter(last_column + 1)}{row}"
+
+    def _amount_cell(self, ws, coordinate):
+        """Coordinate of the first empty or numeric cell right of a label in its row"""
+        if coordinate is None:
+            return None
+        row, column = coordinate_to_tuple(coordinate)
+        for next_column in range(column + 1, ws.max_column + 1):
+            merged = self._merged.get((row, next_column))
+            if merged is not None and (merged.min_row, merged.min_col) != (row, next_column):
+                continue  # Cells inside a merged range are read-only
+            value = ws.cell(row=row, column=next_column).value
+            if value is None or isinstance(value, (int, float)):
+                return f"{get_column_letter(next_column)}{row}"
+        return None
+
+    @contextmanager
+    def fill(self):
+        """
+        Yield a fresh copy of the template worksheet for filling in one report
+        The workbook is parsed from the cached template bytes on every call.
+        Cells are written with ws[coordinate] = value, and the report is
+        saved with ws.parent.save(path).
+        """
+        workbook = load_workbook(BytesIO(self.template_bytes))
+        try:
+            yield workbook.active
+        finally:
+            workbook.close()
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_report_template(template_path):
+    """Return the parsed template for template_path, reloading it when the file changes"""
+    stat = os.stat(template_path)
+    key = (os.path.abspath(template_path), stat.st_mtime_ns, stat.st_size)
+    template = _templates.get(key[0])
+    if template is None or template[0] != key:
+        with _templates_lock:
+            template = _templates.get(key[0])
+            if template is None or template[0] != key:
+                template = (key, ReportTemplate(template_path))
+                _templates[key[0]] = template
+    return template[1]
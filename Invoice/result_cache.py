@@ -0,0 +1,163 @@
+"""
+Result File Cache
+Remembers the receipt data parsed from each *_result.json file.
+
+Entries are keyed by path and validated against the file's mtime and size,
+so a scan only parses files that are new or changed. Directory listings are
+reused while the directory mtime is unchanged. The cache is shared by every
+report in the process and persisted to a sidecar JSON file so a restarted
+worker starts warm. Values derived from the receipts (such as the summary
+columns) can be kept with derived(); they are rebuilt only after a scan
+finds a new, changed or deleted result file.
+"""
+
+import os
+import json
+import glob
+import logging
+import threading
+
+from file_locks import atomic_write_text
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(SCRIPT_DIR, "Receipts store", "result_cache.json")
+
+# Bump when _extract_receipt_data_from_result changes what it returns
+CACHE_VERSION = 2
+
+
+class ResultFileCache:
+    def __init__(self, cache_path=CACHE_FILE):
+        """Initialize the cache persisted at cache_path"""
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._listings = {}
+        self._loaded = False
+        self._dirty = False
+        # Bumped whenever a scan finds a change; derived values are stamped with it
+        self._generation = 0
+        self._derived = {}
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self._entries = {path: tuple(entry) for path, entry in data['entries'].items()}
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable result cache {self.cache_path}: {e}")
+        self._loaded = True
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        data = {'version': CACHE_VERSION,
+                'entries': {path: list(entry) for path, entry in self._entries.items()}}
+        try:
+            atomic_write_text(self.cache_path, json.dumps(data, ensure_ascii=False))
+            self._dirty = False
+        except OSError as e:
+            logging.warning(f"Could not save result cache: {e}")
+
+    def _list(self, directory):
+        """Return the result files in directory, re-globbing only when it changed"""
+        mtime = os.stat(directory).st_mtime_ns
+        cached = self._listings.get(directory)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        files = sorted(glob.glob(os.path.join(directory, "*_result.json")))
+        self._listings[directory] = (mtime, files)
+        return files
+
+    def scan(self, search_paths, extract):
+        """
+        Return receipt data for every result file in search_paths
+        Args:
+            search_paths: Directories holding *_result.json files
+            extract: Function turning a loaded result JSON into receipt data
+        Returns:
+            List of receipt data dictionaries (shared; copy before changing)
+        """
+        with self._lock:
+            return self._scan(search_paths, extract)
+
+    def derived(self, key, search_paths, extract, build):
+        """
+        Return a value computed from the scanned receipts, cached until they change
+        Args:
+            key: Name of the derived value
+            search_paths, extract: As for scan()
+            build: Function turning the receipt list into the value
+        Returns:
+            build(receipts), reused while no result file has changed
+        """
+        with self._lock:
+            receipts = self._scan(search_paths, extract)
+            stamp = (self._generation, tuple(search_paths))
+            cached = self._derived.get(key)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, build(receipts))
+                self._derived[key] = cached
+            return cached[1]
+
+    def _scan(self, search_paths, extract):
+        """scan() with the lock held"""
+        receipts = []
+        if not self._loaded:
+            self._load()
+
+        changed = False
+        seen = set()
+        for search_path in search_paths:
+            if not os.path.exists(search_path):
+                continue
+            for json_file in self._list(search_path):
+                try:
+                    stat = os.stat(json_file)
+                except FileNotFoundError:
+                    continue
+                seen.add(json_file)
+                entry = self._entries.get(json_file)
+                if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                    entry = (stat.st_mtime_ns, stat.st_size, self._parse(json_file, extract))
+                    self._entries[json_file] = entry
+                    self._dirty = changed = True
+                if entry[2] is not None:
+                    receipts.append(entry[2])
+
+        # Forget files that were deleted since the last scan
+        for path in [p for p in self._entries if p not in seen
+                     and os.path.dirname(p) in search_paths]:
+            del self._entries[path]
+            self._dirty = changed = True
+
+        if changed:
+            self._generation += 1
+        if self._dirty:
+            self._save()
+        return receipts
+
+    def _parse(self, json_file, extract):
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                return extract(json.load(f))
+        except Exception as e:
+            # Cached as None so a broken file is reported once, not on every scan
+            print(f"Error reading {json_file}: {e}")
+            return None
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide result file cache"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ResultFileCache()
+    return _default_cache
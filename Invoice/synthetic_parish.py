@@ -0,0 +1,461 @@
+"""
+Synthetic Parish Data
+Generates realistic fake donors and receipts for scale and load testing.
+
+The real ledger is a few hundred rows; this produces years of it. Donors
+have the variety of the real data (honorifics, couples, "and Family",
+stray double spaces and trailing full stops from handwriting), give on
+habits of their own (a monthly tithe, yearly membership, occasional
+offerings, Harvest auction bids in November) and pay by cash, cheque or
+online transfer with matching cheque or UTR numbers. Month fields use the
+messy formats found in Extract.csv ('Aug-25', 'June & July 2025',
+'Jan-2025 to Dec-2025', ...). The parish grows a little every year.
+
+Receipts can be written in every format the app reads:
+  Extract.csv            rows as the ledger writer appends them, a share of
+                         them mangled the way Excel re-saves the file
+  results/*_result.json  Content Understanding analyze results
+  gpt4o/*_output.json    GPT-4o output in the Input.json schema
+  forms/*.jpg            rendered payment form images to upload
+plus receipts.json with the ground truth behind all of them. Output is
+reproducible for a given seed.
+
+Usage: python synthetic_parish.py <output dir> [--receipts N] [--years N]
+                                  [--formats csv,cu,gpt4o,forms] [--seed N]
+"""
+
+import os
+import csv
+import json
+import uuid
+import random
+import argparse
+import datetime
+
+from receipt_record import AMOUNT_FIELDS, ReceiptRecord
+from ledger_writer import CSV_HEADERS
+
+FIRST_NAMES = [
+    'Anuj', 'Roshan', 'Ashley', 'Sandeep', 'Jones', 'Shonelle', 'Asheesh', 'Nitika', 'Rahul', 'Shirish',
+    'Manoj', 'Diana', 'Priya', 'Sneha', 'Joel', 'Samuel', 'Ruth', 'Esther', 'Daniel', 'Prakash', 'Sunil',
+    'Anita', 'Rebecca', 'Neha', 'Vinay', 'Grace', 'Joseph', 'Mary', 'Thomas', 'Sarah', 'Abraham', 'Leena',
+    'Pradeep', 'Sharon', 'Cynthia', 'Nathaniel', 'Sheetal', 'Vivek', 'Rachel', 'Emmanuel', 'Hannie', 'Moses',
+]
+SURNAMES = [
+    'Paul', 'Prabhudas', 'George', 'Williams', 'Christian', 'Bose', 'Barwad', 'Hiwale', 'Bhore', 'Bhatia',
+    'More', 'Gaikwad', 'Salve', "D'Souza", 'Fernandes', 'Pereira', 'Thomas', 'Kamble', 'Shinde', 'Sathe',
+    'Jadhav', 'Moses', 'Samuel', 'David', 'John', 'Mathew', 'Lobo', 'Rodrigues', 'Pawar', 'Wagh', 'Chand',
+]
+HONORIFICS = ['Mr', 'Mr.', 'Mrs', 'Mrs.', 'Dr', 'Dr.', 'Miss']
+SOCIETIES = ['Cassiopeia Classic', 'Amanora Park', 'Elphinstone Towers', 'Kirkee Heights', 'Range Hills',
+             'Sai Residency', 'Green Valley', 'Royal Enclave']
+AREAS = ['Baner', 'Aundh', 'Kirkee', 'Khadki', 'Bopodi', 'Aundh Road', 'Hadapsar', 'Pimpri', 'Wakad']
+DONATION_PURPOSES = ['Building Fund', 'Church Relief', 'Youth Fellowship', 'Christmas Decoration',
+                     'Flowers', 'General', 'Sunday School', 'Choir']
+HARVEST_ITEMS = ['Pumpkin', 'Cake', 'Rice bag', 'Coconuts', 'Saree', 'Fruit basket']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+          'October', 'November', 'December']
+
+# Fields printed on the payment form, the only ones a form image or analyzer result can carry
+FORM_AMOUNT_FIELDS = [
+    'TitheAmount', 'MembershipAmount', 'BirthdayThankOffering', 'WeddingAnniversaryThankOffering',
+    'HomeMissionPledges', 'MissionAndEvangelismFund', 'StStephensSocialAidFund', 'DonationAmount'
+]
+# Line item categories as the GPT-4o extractor maps them (see OpenAImodel/extractor.py)
+GPT4O_CATEGORIES = {
+    'TitheAmount': 'Tithe',
+    'MembershipAmount': 'Membership',
+    'BirthdayThankOffering': 'Birthday Thank Offering',
+    'WeddingAnniversaryThankOffering': 'Wedding Anniversary Thank Offering',
+    'HomeMissionPledges': 'Home Mission Pledges',
+    'MissionAndEvangelismFund': 'Mission & Evangelism Fund',
+    'StStephensSocialAidFund': 'St. Stephen’s Social Aid Fund',
+    'DonationAmount': 'Donation',
+}
+# Chance that a receipt includes each occasional offering
+OFFERING_RATES = {
+    'BirthdayThankOffering': 0.06, 'WeddingAnniversaryThankOffering': 0.03, 'HomeMissionPledges': 0.05,
+    'MissionAndEvangelismFund': 0.05, 'StStephensSocialAidFund': 0.05, 'SpecialThanksAmount': 0.04,
+    'CharityFundAmount': 0.04, 'DonationAmount': 0.10,
+}
+
+
+class ParishGenerator:
+    def __init__(self, seed=1, donors=400, yearly_growth=0.08):
+        """
+        Args:
+            seed: Random seed; the same seed gives the same data
+            donors: Size of the donor pool at the start
+            yearly_growth: Fraction by which giving grows each year
+        """
+        self.rng = random.Random(seed)
+        self.yearly_growth = yearly_growth
+        self.donors = [self._new_donor() for _ in range(donors)]
+
+    def _new_donor(self):
+        rng = self.rng
+        first, surname = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+        style = rng.random()
+        if style < 0.50:
+            name = f"{first} {surname}"
+        elif style < 0.65:
+            name = f"{first} {rng.choice(FIRST_NAMES)} {surname}"
+        elif style < 0.77:
+            name = f"{rng.choice(HONORIFICS)} {first} {surname}"
+        elif style < 0.87:
+            name = rng.choice([f"Mrs & Mr. {first} {surname}", f"Mrs & Mr {first} {surname}",
+                               f"{first} & {rng.choice(FIRST_NAMES)} {surname}",
+                               f"Mr {first} & {rng.choice(FIRST_NAMES)} {surname}"])
+        elif style < 0.95:
+            name = f"{first} {surname} and Family"
+        else:
+            name = f"{first} {surname} {rng.choice(['Sr', 'Jr'])}"
+
+        address = ''
+        if rng.random() < 0.3:
+            address = rng.choice([
+                f"{rng.choice('ABCD')}{rng.randint(1, 12)}{rng.randint(1, 9):02d} {rng.choice(SOCIETIES)}, "
+                f"{rng.choice(AREAS)}, Pune",
+                rng.choice(AREAS),
+                f"Pune, {rng.choice(AREAS)}, PIN-4110{rng.randint(1, 62):02d}",
+            ])
+
+        return {
+            'name': name,
+            'address': address,
+            'income': rng.choice([5000, 10000, 15000, 20000, 30000, 40000, 50000, 80000]),
+            'tithes': rng.random() < 0.7,
+            'membership': rng.random() < 0.6,
+            'yearly_membership': rng.random() < 0.2,
+            'payment_method': rng.choices(['CASH', 'ONLINE', 'CHEQUE'], weights=[4, 4, 2])[0],
+            'birthday': rng.randint(1, 12),
+        }
+
+    def _written_name(self, name):
+        """The donor name as written on one form, with the slips seen in the real data"""
+        rng = self.rng
+        if rng.random() < 0.08:
+            words = name.split(' ')
+            position = rng.randrange(len(words))
+            words[position] += ' '  # A double space somewhere
+            name = ' '.join(words).strip()
+        if rng.random() < 0.03:
+            name += '.'
+        return name
+
+    def _month_text(self, date, months=1, yearly=False):
+        """A month field in one of the formats people actually write"""
+        rng = self.rng
+        month = MONTHS[date.month - 1]
+        if yearly:
+            return rng.choice([f"Jan-{date.year} to Dec-{date.year}", f"Jan to Dec {date.year}", f"{date.year}"])
+        if months == 2:
+            previous = MONTHS[date.month - 2]
+            if date.month == 1:
+                return f"{previous} {date.year - 1} & {month} {date.year}"
+            return rng.choice([f"{previous} & {month} {date.year}", f"{previous[:3]}-{month[:3]} {date:%y}"])
+        return rng.choice([
+            f"{month[:3]}-{date:%y}", f"{month[:3]}-{date.year}", month.upper(), month,
+            f"{month} {date.year}", f"{date:%m/%Y}", f"{month[:3]}-{date:%y}",
+        ])
+
+    def _reference(self, payment_method, date):
+        """Cheque number or online transfer reference"""
+        rng = self.rng
+        if payment_method == 'CHEQUE':
+            return f"{rng.randint(100000, 999999)}"
+        if payment_method == 'ONLINE':
+            return rng.choice([
+                f"{rng.randint(10 ** 11, 10 ** 12 - 1)}",
+                f"ICIN{rng.randint(10 ** 11, 10 ** 12 - 1)}",
+                f"{date:%m%d}i{rng.randint(10 ** 11, 10 ** 12 - 1)}",
+            ])
+        return ''
+
+    def receipt(self, donor, date, growth=1.0):
+        """One receipt data dictionary (as posted to /generate_receipt) for a donor's gift"""
+        rng = self.rng
+        amounts = {field: 0.0 for field in AMOUNT_FIELDS}
+        receipt = {
+            'InvoiceDate': str(date),
+            'Name': self._written_name(donor['name']),
+            'Address': donor['address'],
+            'MobileNumber': '',
+            'TitheMonth': '', 'MembershipMonth': '', 'DonationFor': '', 'HarvestAuctionComment': '',
+            'PaymentMethod': donor['payment_method'] if rng.random() < 0.85 else rng.choice(['CASH', 'ONLINE', 'CHEQUE']),
+        }
+
+        if donor['tithes'] and rng.random() < 0.8:
+            months = 2 if rng.random() < 0.1 else 1
+            tithe = max(100, round(donor['income'] * 0.1 * growth / 100) * 100) * months
+            amounts['TitheAmount'] = float(tithe if rng.random() > 0.02 else tithe + 0.5)
+            receipt['TitheMonth'] = self._month_text(date, months)
+        if donor['membership'] and rng.random() < 0.5:
+            yearly = donor['yearly_membership']
+            amounts['MembershipAmount'] = float(4800 if yearly else rng.choice([200, 400]))
+            receipt['MembershipMonth'] = self._month_text(date, yearly=yearly)
+        for field, rate in OFFERING_RATES.items():
+            if field == 'BirthdayThankOffering' and date.month == donor['birthday']:
+                rate = 0.6
+            if rng.random() < rate:
+                amounts[field] = float(rng.choice([100, 250, 500, 500, 1000, 1500, 2000, 5000]))
+        if amounts['DonationAmount']:
+            receipt['DonationFor'] = rng.choice(DONATION_PURPOSES)
+        if rng.random() < (0.25 if date.month == 11 else 0.005):
+            amounts['HarvestAuctionAmount'] = float(rng.choice([500, 1000, 2500, 5000, 10000]))
+            receipt['HarvestAuctionComment'] = rng.choice([f"Harvest -{date.year}", f"Harvest {date.year} - "
+                                                           f"{rng.choice(HARVEST_ITEMS)}", rng.choice(HARVEST_ITEMS)])
+        if not any(amounts.values()):
+            amounts['DonationAmount'] = float(rng.choice([100, 200, 500]))
+            receipt['DonationFor'] = 'General'
+
+        receipt.update(amounts)
+        receipt['OnlineChequeNo'] = self._reference(receipt['PaymentMethod'], date)
+        return receipt
+
+    def receipts(self, count, start_date=datetime.date(2025, 1, 5), years=1):
+        """
+        Generate receipts spread over the Sundays of a period
+        Args:
+            count: Number of receipts
+            start_date: First Sunday
+            years: Length of the period; later years get more receipts
+        Returns:
+            List of receipt data dictionaries in date order
+        """
+        rng = self.rng
+        sundays = [start_date + datetime.timedelta(weeks=week) for week in range(max(1, round(52 * years)))]
+        weights = [(1 + self.yearly_growth) ** (index / 52) * (1.6 if sunday.month in (11, 12) else 1.0)
+                   for index, sunday in enumerate(sundays)]
+        # New families join as the parish grows; each gives only after joining
+        initial = len(self.donors)
+        final = round(initial * (1 + self.yearly_growth) ** years)
+        joined = [0] * initial + [rng.randrange(len(sundays)) for _ in range(final - initial)]
+        self.donors.extend(self._new_donor() for _ in range(final - initial))
+
+        receipts = []
+        for week in sorted(rng.choices(range(len(sundays)), weights=weights, k=count)):
+            donor = rng.randrange(len(self.donors))
+            if joined[donor] > week:
+                donor = rng.randrange(initial)
+            date = sundays[week]
+            if rng.random() < 0.15:
+                date -= datetime.timedelta(days=rng.randint(1, 6))  # Paid online during the week
+            receipts.append(self.receipt(self.donors[donor], date, (1 + self.yearly_growth) ** (week / 52)))
+        return receipts
+
+
+def _excel_number(value):
+    """A long number as Excel shows it after a re-save (e.g. 5.22208E+11)"""
+    return f"{float(value):.6G}" if value.isdigit() and len(value) > 11 else value
+
+
+def write_extract_csv(receipts, csv_path, excel_share=0.3, seed=1):
+    """
+    Write receipts as Extract.csv rows
+    Args:
+        receipts: Receipt data dictionaries
+        csv_path: File to write
+        excel_share: Fraction of rows written the way Excel re-saves them
+                     (DD-MM-YYYY dates, whole amounts, long numbers in E notation)
+    """
+    rng = random.Random(seed)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADERS, extrasaction='ignore')
+        writer.writeheader()
+        for receipt in receipts:
+            record = ReceiptRecord(receipt)
+            processed = datetime.datetime.fromisoformat(receipt['InvoiceDate']) + datetime.timedelta(
+                days=rng.randint(0, 7), minutes=rng.randint(9 * 60, 20 * 60))
+            row = dict(receipt, Total=record.total_rupees, Description=record.description,
+                       ProcessedDateTime=f"{processed:%Y-%m-%d %H:%M:%S}")
+            if rng.random() < excel_share:
+                invoice_date = datetime.date.fromisoformat(receipt['InvoiceDate'])
+                row['ProcessedDateTime'] = f"{processed:%d-%m-%Y %H:%M}"
+                row['InvoiceDate'] = f"{invoice_date:%d-%m-%Y}"
+                row['OnlineChequeNo'] = _excel_number(receipt['OnlineChequeNo'])
+                for field in AMOUNT_FIELDS + ['Total']:
+                    row[field] = f"{row[field]:g}"
+            writer.writerow(row)
+
+
+def content_understanding_result(receipt, analyzer_id="invoice-analyzer", seed=None):
+    """Return a Content Understanding analyze result for a receipt's payment form"""
+    rng = random.Random(seed if seed is not None else receipt.get('Name'))
+
+    def field(field_type, value):
+        entry = {'type': field_type}
+        if value not in (None, '', 0, 0.0):
+            key = {'date': 'valueDate', 'string': 'valueString', 'integer': 'valueInteger', 'number': 'valueNumber'}
+            entry[key[field_type]] = value
+        entry['confidence'] = round(rng.uniform(0.7, 0.97), 3)
+        return entry
+
+    fields = {
+        'InvoiceDate': field('date', receipt['InvoiceDate']),
+        'Name': field('string', receipt['Name']),
+        'Address': field('string', receipt.get('Address', '')),
+    }
+    for text_field in ('TitheMonth', 'MembershipMonth', 'DonationFor', 'OnlineChequeNo'):
+        fields[text_field] = field('string', receipt.get(text_field, ''))
+    for amount_field in FORM_AMOUNT_FIELDS:
+        amount = receipt.get(amount_field) or 0
+        whole = float(amount).is_integer()
+        fields[amount_field] = field('integer' if whole else 'number', int(amount) if whole else amount)
+
+    invoice_date = datetime.date.fromisoformat(receipt['InvoiceDate'])
+    markdown_lines = ["My Covenant with God for Witness and Service Through",
+                      "# THE METHODIST ENGLISH CHURCH 39, ELPHINSTONE ROAD, KIRKEE, PUNE - 411003.",
+                      f"Date :\n\n{invoice_date.day}/{invoice_date.month}/{invoice_date:%y}"]
+    for amount_field in FORM_AMOUNT_FIELDS:
+        if receipt.get(amount_field):
+            markdown_lines.append(f"{GPT4O_CATEGORIES[amount_field].upper()}\nRs\n\n{receipt[amount_field]:g}/-")
+    markdown_lines.append(f"Name :\n\n{receipt['Name']}")
+
+    return {
+        'id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'status': 'Succeeded',
+        'result': {
+            'analyzerId': analyzer_id,
+            'apiVersion': '2025-05-01-preview',
+            'createdAt': f"{receipt['InvoiceDate']}T10:00:00Z",
+            'warnings': [],
+            'contents': [{
+                'markdown': "\n\n".join(markdown_lines),
+                'fields': fields,
+                'kind': 'document',
+                'startPageNumber': 1,
+                'endPageNumber': 1,
+                'unit': 'pixel',
+                'pages': [{'pageNumber': 1, 'width': 856, 'height': 1600}],
+            }],
+        },
+    }
+
+
+def gpt4o_output(receipt):
+    """Return the GPT-4o model output (Input.json schema) for a receipt's payment form"""
+    line_items = []
+    for amount_field in FORM_AMOUNT_FIELDS:
+        amount = receipt.get(amount_field) or 0
+        if not amount:
+            continue
+        line_items.append({
+            'category': GPT4O_CATEGORIES[amount_field],
+            'month': receipt.get({'TitheAmount': 'TitheMonth', 'MembershipAmount': 'MembershipMonth'}.get(amount_field, ''), ''),
+            'purpose': receipt.get('DonationFor', '') if amount_field == 'DonationAmount' else '',
+            'amount': amount,
+        })
+    return {
+        'org_name': 'The Methodist English Church',
+        'org_address': '39, Elphinstone Road, Kirkee, Pune - 411003',
+        'date': receipt['InvoiceDate'],
+        'donor_name': receipt['Name'],
+        'address': receipt.get('Address', ''),
+        'line_items': line_items,
+        'total_amount': sum(item['amount'] for item in line_items),
+        'currency': 'INR',
+    }
+
+
+def render_form(receipt, image_path, seed=None):
+    """Render a filled-in payment form image for a receipt, as an usher would photograph it"""
+    from PIL import Image, ImageDraw
+    from receipt_assets import get_fonts
+
+    rng = random.Random(seed if seed is not None else receipt.get('Name'))
+    fonts = get_fonts()
+    image = Image.new('RGB', (856, 1600), (246, 246, 242))
+    draw = ImageDraw.Draw(image)
+    printed, ink = (30, 30, 30), (25, 45, 160)
+
+    draw.text((220, 70), "My Covenant with God for Witness and Service Through", font=fonts['header'], fill=printed)
+    draw.text((170, 165), "THE METHODIST ENGLISH CHURCH", font=fonts['title_bold'], fill=(200, 40, 40))
+    draw.text((175, 225), "39, ELPHINSTONE ROAD, KIRKEE, PUNE - 411003.", font=fonts['header'], fill=printed)
+    draw.text((530, 300), "Date :", font=fonts['header_bold'], fill=printed)
+    invoice_date = datetime.date.fromisoformat(receipt['InvoiceDate'])
+    draw.text((625, 285), f"{invoice_date.day}/{invoice_date.month}/{invoice_date:%y}", font=fonts['large_num'], fill=ink)
+
+    labels = ["1. TITHE (MONTH)", "2. MEMBERSHIP (MONTH)", "3. BIRTHDAY THANK OFFERING",
+              "4. WEDDING ANNIVERSARY THANK OFFERING", "5. HOME MISSION PLEDGES",
+              "6. MISSION & EVANGELISM FUND", "7. ST. STEPHEN'S SOCIAL AID FUND", "8. DONATION"]
+    details = {'TitheAmount': 'TitheMonth', 'MembershipAmount': 'MembershipMonth', 'DonationAmount': 'DonationFor'}
+    for index, (label, amount_field) in enumerate(zip(labels, FORM_AMOUNT_FIELDS)):
+        y = 380 + index * 95
+        draw.text((40, y), label, font=fonts['header_bold'], fill=printed)
+        draw.text((580, y), "Rs", font=fonts['header_bold'], fill=printed)
+        draw.line((615, y + 25, 800, y + 25), fill=printed, width=2)
+        amount = receipt.get(amount_field) or 0
+        if amount:
+            jitter = rng.randint(-6, 6)
+            draw.text((625, y - 12 + jitter), f"{amount:g}/-", font=fonts['large_num'], fill=ink)
+            detail = receipt.get(details.get(amount_field, ''), '')
+            if detail:
+                draw.text((290, y - 10 + jitter), str(detail), font=fonts['title'], fill=ink)
+
+    draw.text((40, 1200), "Name :", font=fonts['header_bold'], fill=printed)
+    draw.text((150, 1180), receipt['Name'], font=fonts['large_num'], fill=ink)
+    draw.text((40, 1280), "Address :", font=fonts['header_bold'], fill=printed)
+    draw.text((180, 1265), receipt.get('Address', ''), font=fonts['title'], fill=ink)
+    draw.text((260, 1430), "Make Cheque payable to :", font=fonts['body_bold'], fill=printed)
+    draw.text((40, 1460), "THE METHODIST ENGLISH CHURCH KIRKEE (GENERAL ACCOUNT)", font=fonts['header_bold'], fill=printed)
+    if receipt.get('PaymentMethod') == 'CASH':
+        draw.text((20, 15), "cash", font=fonts['title'], fill=printed)
+
+    # A phone photo is never square to the page
+    image = image.rotate(rng.uniform(-1.5, 1.5), resample=Image.BILINEAR, fillcolor=(90, 90, 90))
+    image.save(image_path, 'JPEG', quality=85)
+    return image_path
+
+
+def write_dataset(output_dir, receipts, formats=('csv', 'cu', 'gpt4o', 'forms')):
+    """
+    Write receipts in the requested formats under output_dir
+    Returns:
+        Dictionary of format -> number of files or rows written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'receipts.json'), 'w', encoding='utf-8') as f:
+        json.dump(receipts, f, indent=1, ensure_ascii=False)
+
+    written = {}
+    if 'csv' in formats:
+        write_extract_csv(receipts, os.path.join(output_dir, 'Extract.csv'))
+        written['csv'] = len(receipts)
+    writers = {
+        'cu': ('results', '_result.json', lambda receipt, path: _write_json(path, content_understanding_result(receipt))),
+        'gpt4o': ('gpt4o', '_output.json', lambda receipt, path: _write_json(path, gpt4o_output(receipt))),
+        'forms': ('forms', '.jpg', lambda receipt, path: render_form(receipt, path)),
+    }
+    for report_format, (folder, suffix, write) in writers.items():
+        if report_format not in formats:
+            continue
+        os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+        for number, receipt in enumerate(receipts, 1):
+            write(receipt, os.path.join(output_dir, folder, f"form_{number:06d}{suffix}"))
+        written[report_format] = len(receipts)
+    return written
+
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic parish receipts for scale and load testing")
+    parser.add_argument("output_dir", help="Directory to write the data set to")
+    parser.add_argument("--receipts", type=int, default=1000, help="Number of receipts")
+    parser.add_argument("--years", type=float, default=1, help="Years of Sundays the receipts span")
+    parser.add_argument("--start", default="2025-01-05", help="First Sunday (YYYY-MM-DD)")
+    parser.add_argument("--donors", type=int, default=400, help="Donors at the start")
+    parser.add_argument("--formats", default="csv,cu,gpt4o", help="Any of csv, cu, gpt4o, forms")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    generator = ParishGenerator(seed=args.seed, donors=args.donors)
+    receipts = generator.receipts(args.receipts, datetime.date.fromisoformat(args.start), args.years)
+    written = write_dataset(args.output_dir, receipts, args.formats.split(','))
+    print(f"{len(receipts)} receipts from {receipts[0]['InvoiceDate']} to {receipts[-1]['InvoiceDate']}")
+    for report_format, count in written.items():
+        print(f"  {report_format}: {count}")
@@ -0,0 +1,47 @@
+"""
+Shared fixtures for the Invoice tests.
+
+The application modules live directly in Invoice/, so that directory is put
+on sys.path. Run from the repository root with: python -m pytest Invoice/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def sample_receipts():
+    """Receipts covering every amount field, text amounts, negatives and HomeMissionPledges"""
+    return [
+        {'InvoiceDate': '2024-01-07', 'Name': 'John Mathew', 'TitheMonth': 'JANUARY',
+         'TitheAmount': '1,250.50', 'MembershipAmount': '100', 'HomeMissionPledges': '50'},
+        {'InvoiceDate': '2024-01-07T00:00:00', 'Name': 'Mary  George', 'PaymentMethod': 'upi',
+         'DonationAmount': 500, 'DonationFor': 'Building Fund', 'SpecialThanksAmount': '0.25'},
+        {'InvoiceDate': '2024-01-14', 'Name': 'Thomas Varghese', 'BirthdayThankOffering': '200',
+         'WeddingAnniversaryThankOffering': 'abc', 'CharityFundAmount': '-30'},
+        {'InvoiceDate': '2024-02-29', 'Name': 'Susan Philip', 'MissionAndEvangelismFund': '75',
+         'StStephensSocialAidFund': 25.5, 'HarvestAuctionAmount': '120', 'HomeMissionPledges': '1000'},
+        {'InvoiceDate': '2024-03-03', 'Name': 'John Mathew', 'TitheAmount': '1250.50', 'PaymentMethod': 'CHEQUE'},
+    ]
+
+
+@pytest.fixture
+def expected_total():
+    """Rupee total of a list of receipts, worked out one ReceiptRecord at a time"""
+    from receipt_record import ReceiptRecord
+    return lambda receipts: sum(ReceiptRecord(receipt).total for receipt in receipts) / 100
+
+
+@pytest.fixture
+def expected_by_category():
+    """Rupee totals per amount field of a list of receipts, with negative amounts counted as zero"""
+    from receipt_record import AMOUNT_FIELDS, ReceiptRecord
+
+    def by_category(receipts):
+        records = [ReceiptRecord(receipt) for receipt in receipts]
+        return {field: sum(max(record.amount(field), 0) for record in records) / 100 for field in AMOUNT_FIELDS}
+    return by_category
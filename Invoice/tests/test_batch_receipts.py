@@ -0,0 +1,109 @@
+import csv
+import io
+import os
+import zipfile
+
+import pytest
+
+import batch_receipts
+import receipt_numbers
+from batch_receipts import generate_batch, normalize_record, parse_json_records
+from receipt_numbers import ReceiptNumberAllocator
+
+
+def fake_render(row, receipt_data, receipt_no):
+    """Stands in for _render_receipt in the spawned workers; 'Broken' rows fail to render"""
+    if receipt_data['Name'] == 'Broken':
+        return {'row': row, 'status': 'error', 'receipt_no': receipt_no,
+                'name': receipt_data['Name'], 'error': 'render failed'}
+    path = os.path.join(os.environ['BATCH_TEST_RECEIPTS'], f"Receipt_No-{receipt_no}.pdf")
+    with open(path, 'w') as f:
+        f.write(receipt_data['Name'])
+    return {'row': row, 'status': 'ok', 'receipt_no': receipt_no, 'name': receipt_data['Name'], 'files': [path]}
+
+
+def test_normalize_record():
+    record = normalize_record({'Name': ' John Mathew ', 'InvoiceDate': '07/01/2024',
+                               'TitheAmount': '1,250.50', 'PaymentMethod': 'cheque'})
+    assert record['Name'] == 'John Mathew'
+    assert record['InvoiceDate'] == '2024-01-07'
+    assert record['TitheAmount'] == 1250.5
+    assert record['DonationAmount'] == 0.0
+    assert record['PaymentMethod'] == 'CHEQUE'
+    assert normalize_record({'Name': 'A', 'InvoiceDate': '2024-01-07', 'PaymentMethod': 'gold'})['PaymentMethod'] == 'CASH'
+
+
+@pytest.mark.parametrize('raw, message', [
+    ({'InvoiceDate': '2024-01-07'}, 'Name'),
+    ({'Name': 'A', 'InvoiceDate': 'last Sunday'}, 'InvoiceDate'),
+    ({'Name': 'A', 'InvoiceDate': '2024-01-07', 'TitheAmount': 'ten'}, 'TitheAmount'),
+])
+def test_normalize_record_rejects_bad_rows(raw, message):
+    with pytest.raises(ValueError, match=message):
+        normalize_record(raw)
+
+
+def test_parse_json_records():
+    assert parse_json_records([{'Name': 'A'}]) == [{'Name': 'A'}]
+    assert parse_json_records({'records': [{'Name': 'B'}]}) == [{'Name': 'B'}]
+    with pytest.raises(ValueError):
+        parse_json_records("not records")
+
+
+@pytest.fixture
+def batch_env(tmp_path, monkeypatch):
+    receipts_dir = tmp_path / "receipts"
+    receipts_dir.mkdir()
+    monkeypatch.setenv('BATCH_TEST_RECEIPTS', str(receipts_dir))
+    monkeypatch.setattr(batch_receipts, '_render_receipt', fake_render)
+    monkeypatch.setattr(batch_receipts, 'BATCH_DIR', str(tmp_path / "Batches"))
+    allocator = ReceiptNumberAllocator(str(tmp_path / "receipt_counter.txt"), receipts_dir=str(receipts_dir))
+    allocator.reset(100)
+    monkeypatch.setattr(receipt_numbers, '_default_allocator', allocator)
+    return tmp_path
+
+
+RECORDS = [
+    {'Name': 'John Mathew', 'InvoiceDate': '2024-01-07', 'TitheAmount': '100'},
+    {'Name': '', 'InvoiceDate': '2024-01-07', 'TitheAmount': '50'},
+    {'Name': 'Broken', 'InvoiceDate': '2024-01-07', 'DonationAmount': '20'},
+    {'Name': 'Mary George', 'InvoiceDate': '2024-01-07', 'DonationAmount': '500'},
+]
+
+
+def test_batch_reports_every_row_and_bundles_the_receipts(batch_env):
+    stages = []
+    summary = generate_batch(RECORDS, workers=2, zip_filename='batch.zip',
+                             progress=lambda stage, percent: stages.append(percent))
+
+    assert summary['zip_path'] == str(batch_env / "Batches" / "batch.zip")
+    assert summary['receipt_numbers'] == [101, 103]
+    assert (summary['generated'], summary['failed']) == (2, 2)
+    assert [(result['row'], result['status']) for result in summary['results']] == [
+        (1, 'ok'), (2, 'error'), (3, 'error'), (4, 'ok')]
+    assert stages == sorted(stages) and stages[-1] == 90
+
+    with zipfile.ZipFile(summary['zip_path']) as archive:
+        assert sorted(archive.namelist()) == ['Receipt_No-101.pdf', 'Receipt_No-103.pdf', 'batch_report.csv']
+        report = list(csv.DictReader(io.StringIO(archive.read('batch_report.csv').decode('utf-8'))))
+    assert [row['Status'] for row in report] == ['ok', 'error', 'error', 'ok']
+    assert report[1]['Error'] == 'Name is missing'
+
+
+def test_batch_records_only_rendered_receipts(batch_env, monkeypatch):
+    import invoiceanalyzer
+    import receipt_ledger
+
+    exported, recorded = [], []
+
+    class Ledger:
+        def record_many(self, receipts, receipt_numbers, source):
+            recorded.extend(zip([receipt['Name'] for receipt in receipts], receipt_numbers))
+
+    monkeypatch.setattr(invoiceanalyzer, 'export_many_to_csv',
+                        lambda receipts: exported.extend(receipt['Name'] for receipt in receipts))
+    monkeypatch.setattr(receipt_ledger, 'get_receipt_ledger', lambda: Ledger())
+
+    generate_batch(RECORDS, workers=2, record_ledger=True, zip_filename='batch.zip')
+    assert exported == ['John Mathew', 'Mary George']
+    assert recorded == [('John Mathew', 101), ('Mary George', 103)]
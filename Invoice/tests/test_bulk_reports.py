@@ -0,0 +1,116 @@
+"""Tests for bulk offertory reports over a date range"""
+
+import datetime
+import os
+import threading
+import zipfile
+
+import pytest
+
+import bulk_reports
+from bulk_reports import (_write_bulk_zip, bulk_zip_filename, check_formats, generate_bulk_reports,
+                          parse_date_range, partition_by_date)
+
+
+def fake_render(service_date, service_type, receipts_data, formats):
+    """Stands in for _render_reports in the spawned workers; 2024-01-14 fails to render"""
+    if service_date == '2024-01-14':
+        return {'date': service_date, 'status': 'error', 'files': [], 'errors': ['pdf: render failed']}
+    files = []
+    for report_format in formats:
+        path = os.path.join(os.environ['BULK_TEST_REPORTS'], f"Offertory_Report_{service_date}.{report_format}")
+        with open(path, 'w') as f:
+            f.write(f"{service_type}: {len(receipts_data)} receipts")
+        files.append(path)
+    return {'date': service_date, 'status': 'ok', 'files': files, 'errors': []}
+
+
+def test_parse_date_range():
+    assert parse_date_range('2024-01-01', '2024-01-31') == ('2024-01-01', '2024-01-31')
+    assert parse_date_range(datetime.date(2024, 2, 29), '2024-02-29') == ('2024-02-29', '2024-02-29')
+
+
+@pytest.mark.parametrize('start, end, message', [
+    ('2024-02-30', '2024-03-01', 'start_date'),
+    ('2024-01-01', '31/01/2024', 'end_date'),
+    ('', '2024-01-01', 'start_date'),
+    ('2024-02-01', '2024-01-01', 'after'),
+])
+def test_parse_date_range_rejects_bad_ranges(start, end, message):
+    with pytest.raises(ValueError, match=message):
+        parse_date_range(start, end)
+
+
+def test_check_formats():
+    assert check_formats([' PDF', 'csv ']) == ['pdf', 'csv']
+    with pytest.raises(ValueError, match='docx'):
+        check_formats(['pdf', 'docx'])
+    with pytest.raises(ValueError):
+        check_formats([])
+
+
+def test_bulk_zip_filename_is_safe():
+    name = bulk_zip_filename('2024-01-01', '2024-01-31', '../../Evening Service')
+    assert os.path.basename(name) == name
+    assert name == 'Offertory_Reports_2024-01-01_to_2024-01-31_Evening_Service.zip'
+    assert bulk_zip_filename('2024-01-01', '2024-01-31', '/..').endswith('_Service.zip')
+
+
+def test_partition_by_date(sample_receipts):
+    by_date = partition_by_date(sample_receipts + [{'Name': 'No date'}])
+    assert list(by_date) == ['2024-01-07', '2024-01-14', '2024-02-29', '2024-03-03']
+    assert [receipt['Name'] for receipt in by_date['2024-01-07']] == ['John Mathew', 'Mary  George']
+
+
+@pytest.fixture
+def bulk_env(tmp_path, monkeypatch, sample_receipts):
+    reports_dir = tmp_path / "reports"
+    reports_dir.mkdir()
+    monkeypatch.setenv('BULK_TEST_REPORTS', str(reports_dir))
+    monkeypatch.setattr(bulk_reports, 'BULK_DIR', str(tmp_path / "Bulk"))
+    monkeypatch.setattr(bulk_reports, '_render_reports', fake_render)
+    monkeypatch.setattr(bulk_reports, 'load_range_receipts', lambda start, end: sample_receipts[:3])
+    return tmp_path
+
+
+def test_generate_bulk_reports(bulk_env, expected_total, sample_receipts):
+    stages = []
+    summary = generate_bulk_reports('2024-01-01', '2024-01-31', formats=['pdf', 'csv'], workers=2,
+                                    progress=lambda stage, percent: stages.append((stage, percent)))
+
+    assert (summary['dates'], summary['generated'], summary['failed']) == (2, 2, 1)
+    first, second = summary['results']
+    assert (first['date'], first['receipts'], first['status']) == ('2024-01-07', 2, 'ok')
+    assert first['total'] == pytest.approx(expected_total(sample_receipts[:2]))
+    assert (second['date'], second['status'], second['errors']) == ('2024-01-14', 'error', ['pdf: render failed'])
+    assert stages[0] == ('loading receipts', 10) and stages[-1] == ('zipping', 90)
+
+    with zipfile.ZipFile(summary['zip_path']) as archive:
+        assert sorted(archive.namelist()) == ['Offertory_Report_2024-01-07.csv', 'Offertory_Report_2024-01-07.pdf',
+                                              'index.html']
+        index = archive.read('index.html').decode('utf-8')
+    assert 'pdf: render failed' in index
+
+
+def test_concurrent_jobs_never_publish_a_mixed_zip(bulk_env):
+    reports_dir = bulk_env / "reports"
+    jobs = []
+    for job in range(8):
+        path = reports_dir / f"report_{job}.pdf"
+        path.write_bytes(os.urandom(200_000))
+        jobs.append([{'date': '2024-01-07', 'receipts': 1, 'total': 1.0, 'errors': [], 'files': [str(path)]}])
+
+    zip_paths = []
+    threads = [threading.Thread(target=lambda results: zip_paths.append(
+        _write_bulk_zip('2024-01-01', '2024-01-31', 'Worship Service', results)), args=(results,)) for results in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(zip_paths) == len(jobs)
+    assert len(set(zip_paths)) == 1
+    with zipfile.ZipFile(zip_paths[0]) as archive:
+        assert archive.testzip() is None
+        assert len(archive.namelist()) == 2
+    assert os.listdir(bulk_env / "Bulk") == [os.path.basename(zip_paths[0])]
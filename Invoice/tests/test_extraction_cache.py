@@ -0,0 +1,89 @@
+"""Tests for the extraction result cache: what gets stored and LRU eviction"""
+
+import os
+
+import pytest
+
+import extraction_cache
+from extraction_cache import ExtractionCache, is_successful_result
+
+FIELDS = {'Name': 'John Mathew', 'TitheAmount': '500'}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExtractionCache(cache_dir=str(tmp_path / "cache"), max_entries=10, max_bytes=10 ** 9,
+                           perceptual=False, enabled=True)
+
+
+def entry_files(cache):
+    return sorted(os.listdir(cache.cache_dir))
+
+
+@pytest.mark.parametrize("result, expected", [
+    (FIELDS, True),
+    ({'status': 'Succeeded', 'result': {}}, True),
+    ({'status': 'Failed', 'result': {}}, False),
+    ({'error': 'timeout'}, False),
+    ({'Name': '', 'TitheAmount': None}, False),
+    ({}, False),
+    (None, False),
+])
+def test_is_successful_result(result, expected):
+    assert is_successful_result(result) is expected
+
+
+@pytest.mark.parametrize("result", [{'error': 'rate limited'}, {'status': 'failed'}, {'Name': ''}, {}])
+def test_put_rejects_failed_results(cache, result):
+    assert cache.put(("a" * 64, None), result) is False
+    assert entry_files(cache) == []
+    assert cache.get(("a" * 64, None)) is None
+    assert cache.stats()['rejected'] == 1
+
+
+def test_lookup_or_compute_does_not_replay_failures(cache, tmp_path):
+    form = tmp_path / "form.jpg"
+    form.write_bytes(b"form bytes")
+    results = iter([{'error': 'timeout'}, FIELDS, {'Name': 'never computed'}])
+
+    def compute():
+        return next(results)
+
+    assert cache.lookup_or_compute(str(form), "gpt4o", 1, compute) == ({'error': 'timeout'}, False)
+    assert cache.lookup_or_compute(str(form), "gpt4o", 1, compute) == (FIELDS, False)
+    assert cache.lookup_or_compute(str(form), "gpt4o", 1, compute) == (FIELDS, True)
+    # A new schema version never sees the old entry
+    assert cache.lookup_or_compute(str(form), "gpt4o", 2, compute) == ({'Name': 'never computed'}, False)
+
+
+def test_evicts_least_recently_used_down_to_low_water_mark(cache):
+    keys = [(f"{i:064x}", None) for i in range(11)]
+    for i, key in enumerate(keys[:10]):
+        cache.put(key, FIELDS)
+        os.utime(cache._entry_path(key[0]), (1000 + i, 1000 + i))
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0]) == FIELDS
+
+    cache.put(keys[10], FIELDS)
+
+    remaining = entry_files(cache)
+    assert len(remaining) == int(10 * extraction_cache.EVICT_TO)
+    assert f"{keys[0][0]}.json" in remaining
+    assert f"{keys[1][0]}.json" not in remaining
+    assert f"{keys[2][0]}.json" not in remaining
+    assert cache.stats()['evictions'] == 2
+
+
+def test_directory_is_only_rescanned_every_scan_every_writes(cache, monkeypatch):
+    monkeypatch.setattr(extraction_cache, 'SCAN_EVERY', 5)
+    cache.max_entries = 100
+    scans = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, '_evict', lambda: scans.append(1) or evict())
+
+    for i in range(11):
+        cache.put((f"{i:064x}", None), FIELDS)
+
+    # The first write loads the index, then every fifth write rescans
+    assert len(scans) == 3
+    assert cache._index[0] == 11
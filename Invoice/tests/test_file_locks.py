@@ -0,0 +1,30 @@
+"""Tests for the crash-safe file write helper"""
+
+import os
+import threading
+
+from file_locks import atomic_write_text
+
+
+def test_concurrent_writers_never_mix_content(tmp_path):
+    path = str(tmp_path / "entry.json")
+    texts = [str(writer) * 200_000 for writer in range(8)]
+    errors = []
+
+    def write(text):
+        try:
+            for _ in range(5):
+                atomic_write_text(path, text)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with open(path, 'r', encoding='utf-8') as f:
+        assert f.read() in texts
+    assert os.listdir(tmp_path) == ["entry.json"]
@@ -0,0 +1,40 @@
+"""Tests for the monthly ledger archive totals"""
+
+import datetime
+
+import pytest
+
+from ledger_archive import NUMPY_AVAILABLE, LedgerArchive, build_archive
+from receipt_ledger import ReceiptLedger
+
+pytestmark = pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy is not installed")
+
+START, END = '2024-01-01', '2024-12-31'
+
+
+def test_archive_totals_match_records(tmp_path, sample_receipts, expected_total, expected_by_category):
+    ledger = ReceiptLedger(str(tmp_path / "receipt_ledger.db"))
+    ledger.record_many(sample_receipts, list(range(1, len(sample_receipts) + 1)))
+    archive_dir = str(tmp_path / "archive")
+
+    build_archive(ledger.receipts_with_numbers(), archive_dir)
+
+    totals = LedgerArchive(archive_dir).totals(START, END)
+    assert totals['total_receipts'] == len(sample_receipts)
+    assert totals['total_amount'] == pytest.approx(expected_total(sample_receipts))
+    assert totals['by_category'] == pytest.approx(expected_by_category(sample_receipts))
+
+
+def test_archive_year_to_date_on_leap_day(tmp_path, sample_receipts, expected_total):
+    archive_dir = str(tmp_path / "archive")
+    shifted = [dict(receipt, InvoiceDate=receipt['InvoiceDate'].replace('2024', '2023')) for receipt in sample_receipts
+               if not receipt['InvoiceDate'].startswith('2024-02-29')]
+    build_archive(sample_receipts + shifted, archive_dir)
+    archive = LedgerArchive(archive_dir)
+
+    leap_day = datetime.date(2024, 2, 29)
+    assert archive.year_to_date(as_of=leap_day)['total_amount'] == pytest.approx(
+        expected_total(sample_receipts[:4]))
+    # 2023 has no 29 February, so the range ends on the 28th
+    assert archive.year_to_date(2023, as_of=leap_day)['total_amount'] == pytest.approx(
+        expected_total(sample_receipts[:3]))
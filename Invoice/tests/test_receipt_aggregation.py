@@ -0,0 +1,44 @@
+"""Tests for the summary totals: the column path must agree with the loop and the ledger"""
+
+import pytest
+
+from receipt_aggregation import NUMPY_AVAILABLE, ReceiptColumns, _summarize_loop, summarize
+from receipt_ledger import ReceiptLedger
+
+requires_numpy = pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy is not installed")
+
+START, END = '2024-01-01', '2024-12-31'
+
+
+def test_loop_summary_matches_records(sample_receipts, expected_total):
+    summary = _summarize_loop(sample_receipts, START, END)
+    assert summary['total_receipts'] == len(sample_receipts)
+    assert summary['total_amount'] == pytest.approx(expected_total(sample_receipts))
+
+
+@requires_numpy
+def test_column_summary_matches_loop_and_ledger(tmp_path, sample_receipts):
+    ledger = ReceiptLedger(str(tmp_path / "receipt_ledger.db"))
+    ledger.record_many(sample_receipts)
+
+    columns = summarize(sample_receipts, START, END)
+    loop = _summarize_loop(sample_receipts, START, END)
+    assert columns['total_receipts'] == loop['total_receipts']
+    assert columns['total_amount'] == pytest.approx(loop['total_amount'])
+    assert columns['by_date'] == {day: {'count': value['count'], 'amount': pytest.approx(value['amount'])}
+                                  for day, value in loop['by_date'].items()}
+    assert columns['total_amount'] == pytest.approx(ledger.summary(START, END)['total_amount'])
+
+
+@requires_numpy
+def test_column_summary_respects_date_range(sample_receipts, expected_total):
+    summary = summarize(sample_receipts, '2024-01-07', '2024-01-31')
+    assert summary['total_receipts'] == 3
+    assert summary['total_amount'] == pytest.approx(expected_total(sample_receipts[:3]))
+
+
+@requires_numpy
+def test_column_category_totals_clamp_negatives(sample_receipts, expected_by_category):
+    totals = ReceiptColumns(sample_receipts).totals_by_category()
+    assert totals['CharityFundAmount'] == 0
+    assert totals == pytest.approx(expected_by_category(sample_receipts))
@@ -0,0 +1,147 @@
+"""Tests for the receipt ledger: rollup totals, the result file import and upload-keyed receipts"""
+
+import json
+import os
+
+import pytest
+
+import receipt_ledger
+from receipt_ledger import ReceiptLedger
+
+START, END = '2024-01-01', '2024-12-31'
+
+
+def analysis_result(name, date, tithe):
+    """An analysis result in the format save_analysis_result writes"""
+    return {'gpt4o_result': {'InvoiceDate': date, 'Name': name, 'TitheAmount': tithe}}
+
+
+def write_result(folder, upload, result):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, f"{upload}_result.json"), 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ReceiptLedger(str(tmp_path / "receipt_ledger.db"))
+
+
+@pytest.fixture
+def filled_ledger(ledger, sample_receipts):
+    ledger.record_many(sample_receipts, list(range(1, len(sample_receipts) + 1)))
+    return ledger
+
+
+def test_summary_matches_records(filled_ledger, sample_receipts, expected_total):
+    summary = filled_ledger.summary(START, END)
+    assert summary['total_receipts'] == len(sample_receipts)
+    assert summary['total_amount'] == pytest.approx(expected_total(sample_receipts))
+    assert summary['by_date']['2024-01-07'] == {'count': 2, 'amount': pytest.approx(1350.50 + 500.25)}
+
+
+def test_category_totals_match_records(filled_ledger, sample_receipts, expected_by_category):
+    expected = {field: amount for field, amount in expected_by_category(sample_receipts).items() if amount}
+    totals = filled_ledger.category_totals(START, END)
+    assert {field: value['amount'] for field, value in totals.items()} == pytest.approx(expected)
+
+
+def test_payment_and_donor_totals(filled_ledger):
+    assert filled_ledger.payment_totals('2024-01-07') == {'CASH': pytest.approx(1350.50), 'UPI': pytest.approx(500.25)}
+    assert filled_ledger.donor_totals('2024-01') == {
+        'John Mathew': {'count': 1, 'amount': pytest.approx(1350.50)},
+        'Mary George': {'count': 1, 'amount': pytest.approx(500.25)},
+        'Thomas Varghese': {'count': 1, 'amount': pytest.approx(200)},
+    }
+    assert filled_ledger.dates() == ['2024-01-07', '2024-01-14', '2024-02-29', '2024-03-03']
+
+
+def test_rollups_survive_rebuild(filled_ledger, sample_receipts):
+    before = filled_ledger.summary(START, END)
+    assert filled_ledger.rebuild_rollups() == len(sample_receipts)
+    assert filled_ledger.summary(START, END) == before
+
+
+def test_import_reads_result_files_once(ledger, tmp_path):
+    uploads = str(tmp_path / "uploads")
+    write_result(uploads, "a_form.jpg", analysis_result('John Mathew', '2024-01-07', '500'))
+    write_result(uploads, "b_form.jpg", analysis_result('Mary George', '2024-01-07', '250'))
+    write_result(uploads, "c_blank.jpg", {'gpt4o_result': {'TitheAmount': '100'}})
+
+    assert ledger.import_legacy(result_dirs=[uploads]) == {'imported': 2, 'skipped': 0}
+    assert ledger.is_imported()
+    assert ledger.import_legacy(result_dirs=[uploads]) == {'imported': 0, 'skipped': 2}
+    assert ledger.summary('2024-01-01', '2024-01-31')['total_amount'] == pytest.approx(750)
+
+
+def test_receipt_generated_from_upload_replaces_the_form(ledger, tmp_path):
+    uploads = str(tmp_path / "uploads")
+    write_result(uploads, "a_form.jpg", analysis_result('Jon Mathew', '2024-01-07', '500'))
+    ledger.import_legacy(result_dirs=[uploads])
+
+    # The form was corrected before the receipt was generated
+    ledger.record({'InvoiceDate': '2024-01-07', 'Name': 'John Mathew', 'TitheAmount': 550},
+                  receipt_no=7, upload="a_form.jpg")
+
+    assert ledger.count() == 1
+    assert ledger.receipts_with_numbers()[0]['Name'] == 'John Mathew'
+    assert ledger.receipts_with_numbers()[0]['ReceiptNo'] == '7'
+    assert ledger.summary('2024-01-01', '2024-01-31')['total_amount'] == pytest.approx(550)
+    assert ledger.category_totals('2024-01-01', '2024-01-31') == {'TitheAmount': {'count': 1, 'amount': 550}}
+    assert set(ledger.donor_totals('2024-01')) == {'John Mathew'}
+
+
+def test_edited_form_is_kept_when_imported_later(ledger, tmp_path):
+    uploads = str(tmp_path / "uploads")
+    write_result(uploads, "a_form.jpg", analysis_result('John Mathew', '2024-01-07', '500'))
+    ledger.record({'InvoiceDate': '2024-01-07', 'Name': 'John Mathew', 'TitheAmount': 550},
+                  receipt_no=7, upload="a_form.jpg")
+
+    assert ledger.import_legacy(result_dirs=[uploads]) == {'imported': 0, 'skipped': 1}
+    assert ledger.count() == 1
+    assert ledger.payment_totals('2024-01-07') == {'CASH': pytest.approx(550)}
+
+
+def test_replacing_a_form_keeps_rollups_consistent(ledger):
+    ledger.record_upload("a_form.jpg", analysis_result('Jon Mathew', '2024-01-07', '500'))
+    ledger.record({'InvoiceDate': '2024-01-14', 'Name': 'John Mathew', 'TitheAmount': 550,
+                   'PaymentMethod': 'ONLINE'}, receipt_no=7, upload="a_form.jpg")
+    before = (ledger.dates(), ledger.category_totals('2024-01-01', '2024-01-31'), ledger.donor_totals('2024-01'))
+
+    ledger.rebuild_rollups()
+
+    assert before == (ledger.dates(), ledger.category_totals('2024-01-01', '2024-01-31'),
+                      ledger.donor_totals('2024-01'))
+    assert ledger.dates() == ['2024-01-14']
+
+
+def test_receipts_without_an_upload_are_always_added(ledger):
+    receipt = {'InvoiceDate': '2024-01-07', 'Name': 'John Mathew', 'TitheAmount': 500}
+    ledger.record(receipt, receipt_no=1)
+    ledger.record(receipt, receipt_no=2)
+    assert ledger.count() == 2
+
+
+def test_upload_saved_after_the_import_reaches_the_ledger(ledger, tmp_path, monkeypatch):
+    uploads = str(tmp_path / "uploads")
+    write_result(uploads, "old_form.jpg", analysis_result('Mary George', '2024-01-07', '250'))
+    monkeypatch.setattr(receipt_ledger, 'RESULT_DIRS', [uploads])
+    monkeypatch.setattr(receipt_ledger, 'AUTO_IMPORT', True)
+    monkeypatch.setattr(receipt_ledger, '_default_ledger', ledger)
+    monkeypatch.setattr(receipt_ledger, '_ready', False)
+    monkeypatch.chdir(tmp_path)
+    import web_invoice_app
+    monkeypatch.setitem(web_invoice_app.app.config, 'UPLOAD_FOLDER', uploads)
+
+    # The first save runs the import, which already finds this upload's result file
+    web_invoice_app.save_analysis_result("first_form.jpg", analysis_result('John Mathew', '2024-01-07', '500'))
+    assert ledger.is_imported()
+    web_invoice_app.save_analysis_result("next_form.jpg", analysis_result('Susan Philip', '2024-01-07', '100'))
+
+    assert ledger.count() == 3
+    assert ledger.summary('2024-01-07', '2024-01-07')['total_amount'] == pytest.approx(850)
+
+    with web_invoice_app.app.test_request_context(method='POST', data={'filename': 'next_form.jpg'}):
+        assert web_invoice_app.uploaded_form_name() == "next_form.jpg"
+    with web_invoice_app.app.test_request_context(method='POST', data={'filename': 'manual_entry'}):
+        assert web_invoice_app.uploaded_form_name() is None
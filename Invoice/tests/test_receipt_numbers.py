@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from receipt_numbers import ReceiptNumberAllocator
+
+NUMBERS_PER_WORKER = 40
+
+
+def take_numbers(counter_path, receipts_dir, block_size, count):
+    """Draw count receipt numbers in a separate process"""
+    allocator = ReceiptNumberAllocator(counter_path, block_size=block_size, receipts_dir=receipts_dir)
+    return [allocator.next_number() for _ in range(count)]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    receipts_dir = tmp_path / "Receipts store"
+    receipts_dir.mkdir()
+    return str(tmp_path / "receipt_counter.txt"), str(receipts_dir)
+
+
+@pytest.mark.parametrize('block_size', [1, 7])
+def test_numbers_are_unique_across_processes(paths, block_size):
+    counter_path, receipts_dir = paths
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(take_numbers, counter_path, receipts_dir, block_size, NUMBERS_PER_WORKER)
+                   for _ in range(4)]
+        numbers = [number for future in futures for number in future.result()]
+
+    assert len(numbers) == len(set(numbers)) == 4 * NUMBERS_PER_WORKER
+    audit = ReceiptNumberAllocator(counter_path, receipts_dir=receipts_dir).audit()
+    assert audit['duplicate_reservations'] == []
+    assert audit['high_water'] >= max(numbers)
+
+
+def test_numbers_are_unique_across_threads(paths):
+    counter_path, receipts_dir = paths
+    allocator = ReceiptNumberAllocator(counter_path, block_size=3, receipts_dir=receipts_dir)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        numbers = list(pool.map(lambda _: allocator.next_number(), range(200)))
+    assert sorted(numbers) == list(range(1, 201))
+
+
+def test_reserve_block_is_consecutive(paths):
+    counter_path, receipts_dir = paths
+    allocator = ReceiptNumberAllocator(counter_path, receipts_dir=receipts_dir)
+    assert allocator.next_number() == 1
+    assert allocator.reserve_block(5) == range(2, 7)
+    assert allocator.reserve_block(0) == range(0)
+    assert allocator.next_number() == 7
+
+
+def test_reset_drops_blocks_reserved_by_other_allocators(paths):
+    counter_path, receipts_dir = paths
+    first = ReceiptNumberAllocator(counter_path, block_size=10, receipts_dir=receipts_dir)
+    second = ReceiptNumberAllocator(counter_path, block_size=10, receipts_dir=receipts_dir)
+    assert first.next_number() == 1
+
+    second.reset(100)
+    assert first.next_number() == 101
+    assert second.next_number() == 111
+
+
+def test_legacy_counter_file_is_read(paths):
+    counter_path, receipts_dir = paths
+    with open(counter_path, 'w') as f:
+        f.write("41")
+    assert ReceiptNumberAllocator(counter_path, receipts_dir=receipts_dir).next_number() == 42
+
+
+def test_unreadable_counter_recovers_from_saved_receipts(paths):
+    counter_path, receipts_dir = paths
+    with open(counter_path, 'w') as f:
+        f.write("garbage")
+    open(os.path.join(receipts_dir, "Receipt_No-57-2024-01-07-John.pdf"), 'w').close()
+    assert ReceiptNumberAllocator(counter_path, receipts_dir=receipts_dir).next_number() == 58
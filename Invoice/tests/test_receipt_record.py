@@ -0,0 +1,98 @@
+"""Tests for ReceiptRecord and the amount and date parsing it is built on"""
+
+import math
+
+import pytest
+
+from receipt_record import (AMOUNT_FIELDS, TOTAL_FIELDS, ReceiptRecord, as_records, format_rupees,
+                            normalize_date, parse_paise)
+
+
+@pytest.mark.parametrize('value, paise', [
+    ('1,250.50', 125050),
+    (' 75 ', 7500),
+    (10, 1000),
+    (25.5, 2550),
+    ('0.1', 10),
+    ('-30', -3000),
+    ('', 0),
+    ('None', 0),
+    ('abc', 0),
+    (None, 0),
+    (True, 0),
+    (math.nan, 0),
+    (math.inf, 0),
+])
+def test_parse_paise(value, paise):
+    assert parse_paise(value) == paise
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-02-29', '2024-02-29'),
+    ('29-02-2024', '2024-02-29'),
+    ('29/02/2024', '2024-02-29'),
+    ('29/02/24', '2024-02-29'),
+    ('2024-02-29T00:00:00', '2024-02-29'),
+])
+def test_normalize_date(value, expected):
+    assert normalize_date(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', None, '2023-02-29', 'JANUARY'])
+def test_normalize_date_rejects_non_dates(value):
+    with pytest.raises(ValueError):
+        normalize_date(value)
+
+
+def test_format_rupees():
+    assert format_rupees(125050) == '1250.50'
+    assert format_rupees(5) == '0.05'
+    assert format_rupees(-3000) == '-30.00'
+
+
+def test_total_fields_are_amount_fields_without_home_mission_pledges():
+    assert len(set(TOTAL_FIELDS)) == len(TOTAL_FIELDS)
+    assert set(TOTAL_FIELDS) == set(AMOUNT_FIELDS) - {'HomeMissionPledges'}
+
+
+def test_record_parses_fields(sample_receipts):
+    record = ReceiptRecord(sample_receipts[1])
+    assert record.invoice_date == '2024-01-07'
+    assert record.payment_method == 'UPI'
+    assert record.amount('DonationAmount') == 50000
+    assert ReceiptRecord(sample_receipts[0]).payment_method == 'CASH'
+    assert ReceiptRecord({}).total == 0
+
+
+def test_total_leaves_out_home_mission_pledges(sample_receipts):
+    record = ReceiptRecord(sample_receipts[0])
+    assert record.amount('HomeMissionPledges') == 5000
+    assert record.total == 125050 + 10000
+    assert record.total_rupees == 1350.50
+
+
+def test_total_ignores_negative_and_unparseable_amounts(sample_receipts):
+    record = ReceiptRecord(sample_receipts[2])
+    assert record.total == 20000
+    assert [field for field, _ in record.contributions] == ['BirthdayThankOffering']
+
+
+def test_contributions_follow_receipt_order(sample_receipts):
+    record = ReceiptRecord(sample_receipts[3])
+    assert [field for field, _ in record.contributions] == [
+        'MissionAndEvangelismFund', 'StStephensSocialAidFund', 'HarvestAuctionAmount']
+    assert record.total == 7500 + 2550 + 12000
+
+
+def test_details_and_summary(sample_receipts):
+    record = ReceiptRecord(sample_receipts[0])
+    assert record.details.startswith('Tithe (JANUARY)')
+    assert record.summary.endswith('Membership')
+    assert ReceiptRecord({}).summary == 'Contribution'
+
+
+def test_as_records_keeps_existing_records(sample_receipts):
+    record = ReceiptRecord(sample_receipts[0])
+    records = as_records([record, sample_receipts[1]])
+    assert records[0] is record
+    assert isinstance(records[1], ReceiptRecord)
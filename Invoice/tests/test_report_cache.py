@@ -0,0 +1,107 @@
+"""Tests for reusing generated reports while their inputs are unchanged"""
+
+import os
+
+import pytest
+
+import report_cache
+from report_cache import get_or_build, report_fingerprint
+
+RECEIPTS = [
+    {'InvoiceDate': '2024-01-07', 'Name': 'John Mathew', 'TitheAmount': '100'},
+    {'InvoiceDate': '2024-01-07', 'Name': 'Mary George', 'DonationAmount': '500'},
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_enabled(monkeypatch):
+    monkeypatch.setattr(report_cache, 'REPORT_CACHE_ENABLED', True)
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / "template.xlsx"
+    path.write_bytes(b"template v1")
+    return str(path)
+
+
+class Builder:
+    """Counts builds and writes the build number into the report"""
+
+    def __init__(self):
+        self.builds = 0
+
+    def __call__(self, path):
+        self.builds += 1
+        with open(path, 'w') as f:
+            f.write(f"build {self.builds}")
+
+
+def test_fingerprint_ignores_receipt_order(template):
+    assert (report_fingerprint(RECEIPTS, 'Worship Service', template)
+            == report_fingerprint(list(reversed(RECEIPTS)), 'Worship Service', template))
+
+
+def test_fingerprint_changes_with_inputs(template, monkeypatch):
+    base = report_fingerprint(RECEIPTS, 'Worship Service', template)
+    edited = [RECEIPTS[0], dict(RECEIPTS[1], DonationAmount='600')]
+    assert report_fingerprint(edited, 'Worship Service', template) != base
+    assert report_fingerprint(RECEIPTS[:1], 'Worship Service', template) != base
+    assert report_fingerprint(RECEIPTS, 'Holy Communion', template) != base
+    monkeypatch.setattr(report_cache, 'REPORT_TEMPLATE_VERSION', report_cache.REPORT_TEMPLATE_VERSION + 1)
+    assert report_fingerprint(RECEIPTS, 'Worship Service', template) != base
+
+
+def test_report_is_served_from_cache_until_receipts_change(tmp_path, template):
+    report_path = str(tmp_path / "report.xlsx")
+    build = Builder()
+
+    fingerprint = report_fingerprint(RECEIPTS, 'Worship Service', template)
+    assert get_or_build(report_path, fingerprint, build) == (report_path, False)
+    assert get_or_build(report_path, fingerprint, build) == (report_path, True)
+    assert build.builds == 1
+
+    changed = report_fingerprint(RECEIPTS + [{'InvoiceDate': '2024-01-07', 'Name': 'New', 'TitheAmount': '5'}],
+                                 'Worship Service', template)
+    assert get_or_build(report_path, changed, build) == (report_path, False)
+    assert build.builds == 2
+    with open(report_path) as f:
+        assert f.read() == "build 2"
+
+
+def test_report_is_rebuilt_when_template_changes(tmp_path, template):
+    report_path = str(tmp_path / "report.xlsx")
+    build = Builder()
+    get_or_build(report_path, report_fingerprint(RECEIPTS, 'Worship Service', template), build)
+
+    with open(template, 'wb') as f:
+        f.write(b"template v2 with a new layout")
+    stat = os.stat(template)
+    os.utime(template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    _, cached = get_or_build(report_path, report_fingerprint(RECEIPTS, 'Worship Service', template), build)
+    assert not cached
+    assert build.builds == 2
+
+
+def test_deleted_report_is_rebuilt(tmp_path, template):
+    report_path = str(tmp_path / "report.xlsx")
+    build = Builder()
+    fingerprint = report_fingerprint(RECEIPTS, 'Worship Service', template)
+    get_or_build(report_path, fingerprint, build)
+    os.remove(report_path)
+    assert get_or_build(report_path, fingerprint, build) == (report_path, False)
+    assert build.builds == 2
+
+
+def test_failed_build_leaves_no_stale_fingerprint(tmp_path, template):
+    report_path = str(tmp_path / "report.xlsx")
+    get_or_build(report_path, 'old', Builder())
+
+    def broken(path):
+        raise RuntimeError("template missing")
+
+    with pytest.raises(RuntimeError):
+        get_or_build(report_path, 'new', broken)
+    assert not report_cache.is_current(report_path, 'old')
+    assert not os.path.exists(f"{report_path}.{os.getpid()}.tmp")
@@ -0,0 +1,51 @@
+"""Tests for the result file cache and the values derived from it"""
+
+import json
+import os
+
+from result_cache import ResultFileCache
+
+
+def write_result(folder, name, receipt):
+    path = folder / f"{name}_result.json"
+    path.write_text(json.dumps(receipt), encoding='utf-8')
+    # Move the directory mtime on explicitly; a fast test can land in the same tick
+    stat = os.stat(folder)
+    os.utime(folder, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_derived_value_is_rebuilt_only_after_a_change(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    write_result(uploads, "a", {'Name': 'John Mathew', 'TitheAmount': 500})
+    cache = ResultFileCache(str(tmp_path / "result_cache.json"))
+    builds = []
+
+    def build(receipts):
+        builds.append(len(receipts))
+        return sum(receipt['TitheAmount'] for receipt in receipts)
+
+    def total():
+        return cache.derived('total', [str(uploads)], dict, build)
+
+    assert total() == 500
+    assert total() == 500
+    assert builds == [1]
+
+    write_result(uploads, "b", {'Name': 'Mary George', 'TitheAmount': 250})
+    assert total() == 750
+    os.remove(uploads / "a_result.json")
+    assert total() == 250
+    assert builds == [1, 2, 1]
+
+
+def test_restarted_cache_reuses_parsed_files(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    write_result(uploads, "a", {'Name': 'John Mathew'})
+    ResultFileCache(str(tmp_path / "result_cache.json")).scan([str(uploads)], dict)
+
+    def fail(result):
+        raise AssertionError("unchanged result file parsed again")
+
+    assert ResultFileCache(str(tmp_path / "result_cache.json")).scan([str(uploads)], fail) == [{'Name': 'John Mathew'}]
@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import upload_jobs
+from upload_jobs import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, TERMINAL_STATES, UploadJobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadJobStore(str(tmp_path / "upload_jobs.db"), max_workers=1)
+
+
+def wait_until_finished(store, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    job = store.get(job_id)
+    while job['status'] not in TERMINAL_STATES and time.monotonic() < deadline:
+        job = store.wait_for_change(job_id, job['version'], timeout=1)
+    return job
+
+
+def set_job(store, job_id, **fields):
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with sqlite3.connect(store.db_path) as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def test_job_reports_progress_and_result(store):
+    stages = []
+
+    def work(report, value):
+        report('working', 50)
+        stages.append(store.get(job_id)['stage'])
+        return {'value': value * 2}
+
+    job_id = store.submit(work, 21, filename='form.jpg')
+    job = wait_until_finished(store, job_id)
+    assert job['status'] == JOB_SUCCEEDED
+    assert job['progress'] == 100
+    assert job['result'] == {'value': 42}
+    assert job['filename'] == 'form.jpg'
+    assert stages == ['working']
+
+
+def test_failed_job_keeps_the_error(store):
+    def work(report):
+        raise RuntimeError("extraction timed out")
+
+    job = wait_until_finished(store, store.submit(work))
+    assert job['status'] == JOB_FAILED
+    assert job['error'] == "extraction timed out"
+
+
+def test_unknown_job(store):
+    assert store.get('missing') is None
+    assert store.wait_for_change('missing', 0, timeout=0.1) is None
+
+
+def test_finished_jobs_are_purged_after_ttl(store, monkeypatch):
+    old_job = wait_until_finished(store, store.submit(lambda report: 'old'))['id']
+    fresh_job = wait_until_finished(store, store.submit(lambda report: 'fresh'))['id']
+    set_job(store, old_job, updated_at=time.time() - upload_jobs.JOB_TTL_SECONDS - 60)
+
+    new_job = store.submit(lambda report: 'new')
+    assert store.get(old_job) is None
+    assert store.get(fresh_job)['result'] == 'fresh'
+    wait_until_finished(store, new_job)
+
+
+def test_stale_running_job_is_reported_failed(store):
+    release = threading.Event()
+    job_id = store.submit(lambda report: release.wait(10))
+    try:
+        while store.get(job_id)['status'] != JOB_RUNNING:
+            time.sleep(0.01)
+        set_job(store, job_id, updated_at=time.time() - upload_jobs.JOB_STALE_SECONDS - 1)
+        job = store.get(job_id)
+        assert job['status'] == JOB_FAILED
+        assert 'abandoned' in job['error']
+    finally:
+        release.set()
+
+
+def test_stale_queued_job_is_left_queued(store):
+    release = threading.Event()
+    blocker = store.submit(lambda report: release.wait(10))
+    queued = store.submit(lambda report: 'later')
+    try:
+        set_job(store, queued, updated_at=time.time() - upload_jobs.JOB_STALE_SECONDS - 1)
+        assert store.get(queued)['status'] == JOB_QUEUED
+    finally:
+        release.set()
+    assert wait_until_finished(store, queued)['status'] == JOB_SUCCEEDED
+    wait_until_finished(store, blocker)
@@ -0,0 +1,80 @@
+"""Tests for streaming uploads to disk and normalizing forms before extraction"""
+
+import hashlib
+import io
+import os
+
+import pytest
+
+import upload_pipeline
+from upload_pipeline import UploadStats, UploadTooLarge, discard_normalized, normalize_for_extraction, stream_to_disk
+
+
+def test_stream_to_disk_returns_the_content_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_pipeline, 'CHUNK_SIZE', 1000)
+    data = os.urandom(4500)
+    dest = str(tmp_path / "form.jpg")
+    stats = UploadStats()
+
+    assert stream_to_disk(io.BytesIO(data), dest, max_bytes=len(data), stats=stats) == hashlib.sha256(data).hexdigest()
+    with open(dest, 'rb') as f:
+        assert f.read() == data
+    assert stats.bytes['upload'] == len(data)
+    assert 'save' in stats.timings
+    assert not os.path.exists(dest + ".part")
+
+
+def test_upload_too_large_removes_the_part_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_pipeline, 'CHUNK_SIZE', 1000)
+    dest = str(tmp_path / "form.jpg")
+
+    with pytest.raises(UploadTooLarge):
+        stream_to_disk(io.BytesIO(b"x" * 5000), dest, max_bytes=2500)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_stream_keeps_an_existing_file(tmp_path):
+    dest = tmp_path / "form.jpg"
+    dest.write_bytes(b"earlier upload")
+
+    class BrokenStream:
+        def read(self, size):
+            raise ConnectionResetError("client went away")
+
+    with pytest.raises(ConnectionResetError):
+        stream_to_disk(BrokenStream(), str(dest))
+
+    assert dest.read_bytes() == b"earlier upload"
+    assert sorted(os.listdir(tmp_path)) == ["form.jpg"]
+
+
+@pytest.mark.skipif(not upload_pipeline.PIL_AVAILABLE, reason="Pillow is not installed")
+def test_normalized_copy_is_smaller_and_discarded(tmp_path, monkeypatch):
+    from PIL import Image
+    monkeypatch.setattr(upload_pipeline, 'NORMALIZE_UPLOADS', True)
+    monkeypatch.setattr(upload_pipeline, 'MAX_EDGE', 400)
+    form = str(tmp_path / "form.png")
+    Image.new('RGB', (1600, 1200), (200, 30, 30)).save(form)
+    stats = UploadStats()
+
+    normalized = normalize_for_extraction(form, stats)
+
+    assert normalized != form
+    with Image.open(normalized) as image:
+        assert image.size == (400, 300)
+        assert image.mode == 'L'
+    assert stats.details['original_size'] == [1600, 1200]
+    discard_normalized(form, normalized)
+    assert not os.path.exists(normalized)
+    assert os.path.exists(form)
+
+
+def test_unreadable_form_is_sent_as_is(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_pipeline, 'NORMALIZE_UPLOADS', True)
+    form = tmp_path / "form.jpg"
+    form.write_bytes(b"not an image")
+
+    assert normalize_for_extraction(str(form)) == str(form)
+    discard_normalized(str(form), str(form))
+    assert form.exists()
@@ -0,0 +1,167 @@
+"""
+Upload Job Store
+Background processing of uploads with status tracking for the web app.
+
+Jobs are recorded in a small SQLite database so that every gunicorn worker
+on the node can answer status requests, while the work itself runs on a
+thread pool inside the worker that accepted the upload.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# Finished jobs are kept this long before being purged
+JOB_TTL_SECONDS = int(os.getenv("UPLOAD_JOB_TTL_SECONDS", str(60 * 60)))
+# Running jobs not updated for this long are reported as failed
+JOB_STALE_SECONDS = int(os.getenv("UPLOAD_JOB_STALE_SECONDS", "300"))
+JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", "4"))
+
+
+class UploadJobStore:
+    def __init__(self, db_path, max_workers=JOB_WORKERS):
+        """Initialize the job store backed by the SQLite file at db_path"""
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the store thread-safe
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get_executor(self):
+        """Return the job pool for this process, re-created after a fork"""
+        pid = os.getpid()
+        if self._executor is None or self._executor_pid != pid:
+            with self._lock:
+                if self._executor is None or self._executor_pid != pid:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="upload-job",
+                    )
+                    self._executor_pid = pid
+        return self._executor
+
+    def submit(self, func, *args, filename=None):
+        """
+        Create a job and run func in the background
+        Args:
+            func: Callable invoked as func(report, *args); report(stage, progress)
+                  records progress and the return value becomes the job result
+            filename: Uploaded file name shown in job status
+        Returns:
+            The new job id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (JOB_SUCCEEDED, JOB_FAILED, now - JOB_TTL_SECONDS),
+            )
+            conn.execute(
+                "INSERT INTO jobs (id, filename, status, stage, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (job_id, filename, JOB_QUEUED, 'queued', now, now),
+            )
+        self._get_executor().submit(self._run, job_id, func, args)
+        return job_id
+
+    def _run(self, job_id, func, args):
+        def report(stage, progress):
+            self._update(job_id, status=JOB_RUNNING, stage=stage, progress=progress)
+
+        report('started', 5)
+        try:
+            result = func(report, *args)
+        except Exception as e:
+            logging.error(f"Upload job {job_id} failed: {e}")
+            self._update(job_id, status=JOB_FAILED, stage='failed', error=str(e))
+        else:
+            self._update(job_id, status=JOB_SUCCEEDED, stage='done', progress=100,
+                         result=json.dumps(result))
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {assignments}, version = version + 1 WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+        with self._changed:
+            self._changed.notify_all()
+
+    def get(self, job_id):
+        """Return a status snapshot dict for job_id, or None if unknown"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        if job['status'] == JOB_RUNNING and time.time() - job['updated_at'] > JOB_STALE_SECONDS:
+            # The worker that owned this job has gone away. Queued jobs are left
+            # alone: they wait behind the pool and get a fresh updated_at when picked up
+            job['status'] = JOB_FAILED
+            job['error'] = 'Job was abandoned before it finished'
+        return job
+
+    def wait_for_change(self, job_id, version, timeout=15, poll_interval=0.5):
+        """
+        Block until the job's version differs from version or timeout expires
+        Returns:
+            The latest snapshot (unchanged on timeout), or None if unknown
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['version'] != version or job['status'] in TERMINAL_STATES:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            # Local updates wake us at once; other workers are seen on the next poll
+            with self._changed:
+                self._changed.wait(min(poll_interval, remaining))
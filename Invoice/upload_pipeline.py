@@ -0,0 +1,165 @@
+"""
+Upload Pipeline
+Streams uploads to disk and shrinks payment form images before extraction.
+
+Uploads are copied to disk in fixed-size chunks while being hashed, so the
+content hash is ready for the extraction cache without reading the file
+again. Before a form is sent to the model it is EXIF-rotated, downscaled to
+UPLOAD_MAX_EDGE pixels, converted to grayscale and re-encoded as JPEG, and
+only the first page of a PDF is rasterized. The normalized copy is a
+temporary file that the caller deletes once extraction is done. Every stage
+records its time and byte counts in an UploadStats object.
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import logging
+from contextlib import contextmanager
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import fitz  # PyMuPDF
+    PDF_RASTER_AVAILABLE = True
+except ImportError:
+    PDF_RASTER_AVAILABLE = False
+
+CHUNK_SIZE = 256 * 1024
+NORMALIZE_UPLOADS = os.getenv("UPLOAD_NORMALIZE", "1") != "0"
+MAX_EDGE = int(os.getenv("UPLOAD_MAX_EDGE", "1600"))
+JPEG_QUALITY = int(os.getenv("UPLOAD_JPEG_QUALITY", "80"))
+GRAYSCALE = os.getenv("UPLOAD_GRAYSCALE", "1") != "0"
+PDF_DPI = int(os.getenv("UPLOAD_PDF_DPI", "150"))
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload stream exceeds the allowed size"""
+
+
+class UploadStats:
+    def __init__(self):
+        """Collect per-stage timings and byte counts for one upload"""
+        self.timings = {}
+        self.bytes = {}
+        self.details = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(self.timings.get(name, 0.0) + time.perf_counter() - start, 4)
+
+    def as_dict(self):
+        return {'timings': dict(self.timings), 'bytes': dict(self.bytes), **self.details}
+
+
+def stream_to_disk(stream, dest_path, max_bytes=None, stats=None):
+    """
+    Copy an upload stream to dest_path in chunks, hashing it on the way
+    Args:
+        stream: Readable binary stream (e.g. FileStorage.stream)
+        dest_path: Final file path; data is written to a .part file first
+        max_bytes: Raise UploadTooLarge once more than this many bytes arrive
+        stats: Optional UploadStats to record the 'save' stage in
+    Returns:
+        Hex SHA-256 of the uploaded bytes
+    """
+    stats = stats or UploadStats()
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = dest_path + ".part"
+    with stats.stage('save'):
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    stats.bytes['upload'] = size
+    stats.details['sha256'] = digest.hexdigest()
+    return stats.details['sha256']
+
+
+def _rasterize_pdf(path):
+    """Render the first page of a PDF as a PIL image, or None"""
+    if not PDF_RASTER_AVAILABLE:
+        return None
+    with fitz.open(path) as document:
+        if document.page_count == 0:
+            return None
+        pixmap = document.load_page(0).get_pixmap(dpi=PDF_DPI)
+        mode = "RGBA" if pixmap.alpha else "RGB"
+        return Image.frombytes(mode, (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def normalize_for_extraction(path, stats=None):
+    """
+    Write a smaller copy of an uploaded form for the extraction model
+    Args:
+        path: Uploaded image or PDF
+        stats: Optional UploadStats to record the 'normalize' stage in
+    Returns:
+        Path of the normalized JPEG in the temp directory, or path itself
+        when the file cannot (or should not) be normalized. Pass the result
+        to discard_normalized() once extraction has finished.
+    """
+    stats = stats or UploadStats()
+    if not NORMALIZE_UPLOADS or not PIL_AVAILABLE:
+        return path
+
+    fd, output_path = tempfile.mkstemp(suffix="_normalized.jpg")
+    os.close(fd)
+    with stats.stage('normalize'):
+        try:
+            if path.lower().endswith('.pdf'):
+                image = _rasterize_pdf(path)
+                if image is None:
+                    logging.info("PyMuPDF not installed; sending PDF without rasterizing")
+                    discard_normalized(path, output_path)
+                    return path
+            else:
+                with Image.open(path) as source:
+                    stats.details['original_size'] = list(source.size)
+                    # Let the JPEG decoder skip detail that thumbnail() would throw away
+                    source.draft('L' if GRAYSCALE else 'RGB', (MAX_EDGE, MAX_EDGE))
+                    image = ImageOps.exif_transpose(source)
+                    image.load()
+
+            stats.details.setdefault('original_size', list(image.size))
+            image.thumbnail((MAX_EDGE, MAX_EDGE), Image.Resampling.LANCZOS)
+            image = image.convert('L' if GRAYSCALE else 'RGB')
+            image.save(output_path, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+            stats.details['normalized_size'] = list(image.size)
+        except Exception as e:
+            logging.warning(f"Could not normalize {os.path.basename(path)}, sending original: {e}")
+            discard_normalized(path, output_path)
+            return path
+
+    stats.bytes['original'] = os.path.getsize(path)
+    stats.bytes['normalized'] = os.path.getsize(output_path)
+    return output_path
+
+
+def discard_normalized(path, normalized_path):
+    """Delete the copy made by normalize_for_extraction, leaving the upload itself alone"""
+    if normalized_path and normalized_path != path:
+        try:
+            os.remove(normalized_path)
+        except FileNotFoundError:
+            pass
@@ -9,13 +9,21 @@ local_packages = os.path.join(current_dir, 'Lib', 'site-packages')
 if os.path.exists(local_packages) and local_packages not in sys.path:
     sys.path.insert(0, local_packages)
 
-from flask import Flask, request, render_template, redirect, url_for, flash, jsonify, send_file
+from flask import Flask, request, render_template, redirect, url_for, flash, jsonify, send_file, Response
 from werkzeug.utils import secure_filename
 from pathlib import Path
 import tempfile
 from invoiceanalyzer import AzureContentUnderstandingClient, Settings
 from offertory_report import OffertoryReportGenerator, OPENPYXL_AVAILABLE, PDF_AVAILABLE
 from csv_report import CSVReportGenerator
+from OpenAImodel.extractor import extract_fields, SCHEMA_VERSION
+from upload_jobs import UploadJobStore, TERMINAL_STATES
+from receipt_assets import warm_up as warm_up_receipt_assets
+from batch_receipts import generate_batch, batch_zip_filename, parse_csv_records, parse_json_records
+from bulk_reports import generate_bulk_reports, parse_date_range, check_formats, bulk_zip_filename
+from receipt_ledger import get_receipt_ledger, ledger_ready, RESULT_SUFFIX
+from extraction_cache import get_extraction_cache
+from upload_pipeline import UploadStats, UploadTooLarge, stream_to_disk, normalize_for_extraction, discard_normalized
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Change this to a secure secret key
@@ -33,6 +41,13 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Background upload jobs shared by all workers on this node
+upload_jobs = UploadJobStore(os.path.join(UPLOAD_FOLDER, 'upload_jobs.db'))
+
+# Load receipt fonts, logo and signature before the first receipt request
+if os.getenv('RECEIPT_ASSET_WARMUP', '1') != '0':
+    warm_up_receipt_assets()
+
 # CORS support for mobile apps
 @app.after_request
 def after_request(response):
@@ -52,7 +67,8 @@ def health_check():
         'version': '1.0.0',
         'mobile_compatible': True,
         'ios_compatible': True,
-        'android_compatible': True
+        'android_compatible': True,
+        'extraction_cache': get_extraction_cache().stats()
     })
 
 @app.route('/manifest.json')
@@ -164,33 +180,89 @@ def analyze_uploaded_file(file_path):
         return {}, {"error": str(e)}
 '''
 
-def analyze_uploaded_file(file_path):
+def analyze_uploaded_file(file_path, use_cache=True, content_hash=None, stats=None):
     """
-    Analyze the uploaded file using GPT-4o via main.py.
+    Analyze the uploaded file using GPT-4o on the in-process extraction pool.
+    A form that was already analyzed is answered from the extraction cache;
+    otherwise a normalized (smaller) copy of the form is sent to the model.
     """
-    import subprocess
-    import sys
-
-    main_py_path = os.path.join(os.path.dirname(__file__), "OpenAImodel", "main.py")
-    python_exe = sys.executable
-
+    stats = stats if stats is not None else UploadStats()
+    
+    def extract():
+        analysis_path = normalize_for_extraction(file_path, stats)
+        try:
+            with stats.stage('extract'):
+                return extract_fields(analysis_path)
+        finally:
+            discard_normalized(file_path, analysis_path)
+    
     try:
-        result = subprocess.run(
-            [python_exe, main_py_path, file_path],
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        if result.returncode != 0:
-            raise RuntimeError(f"main.py error: {result.stderr}")
-
-        # Output is JSON string of mapped fields
-        extracted_data = json.loads(result.stdout)
+        model = f"gpt4o:{os.getenv('AZURE_OPENAI_DEPLOYMENT', '')}"
+        with stats.stage('analyze'):
+            extracted_data, cached = get_extraction_cache().lookup_or_compute(
+                file_path, model, SCHEMA_VERSION, extract,
+                bypass=not use_cache, content_hash=content_hash
+            )
+        stats.details['cache_hit'] = cached
+        logging.info(f"Analyzed {os.path.basename(file_path)}: {stats.as_dict()}")
         return extracted_data, {"gpt4o_result": extracted_data}
     except Exception as e:
         logging.error(f"Error analyzing file with GPT-4o: {e}")
         return {}, {"error": str(e)}
 
+def cache_bypassed():
+    """Check whether the client asked to skip the extraction cache"""
+    flag = request.args.get('nocache') or request.form.get('nocache') or ''
+    return flag.lower() in ('1', 'true', 'yes') or \
+           'no-cache' in request.headers.get('Cache-Control', '')
+
+def save_analysis_result(unique_filename, full_result):
+    """Save analysis results next to the upload for potential receipt generation"""
+    result_file = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_filename}{RESULT_SUFFIX}")
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(full_result, f, indent=2)
+    
+    # Record the form in the ledger so reports include it before a receipt is generated
+    try:
+        ledger_ready()
+        get_receipt_ledger().record_upload(unique_filename, full_result)
+    except Exception as ledger_error:
+        logging.error(f"Error recording upload in ledger: {ledger_error}")
+    return result_file
+
+def uploaded_form_name():
+    """Return the upload a submitted receipt form was filled from, or None for manual entry"""
+    filename = secure_filename(request.form.get('filename', ''))
+    if filename and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], f"{filename}{RESULT_SUFFIX}")):
+        return filename
+    return None
+
+def wants_async():
+    """Check whether the client asked for an asynchronous upload job"""
+    flag = request.args.get('async') or request.form.get('async') or ''
+    return flag.lower() in ('1', 'true', 'yes') or \
+           'respond-async' in request.headers.get('Prefer', '')
+
+def process_upload_job(report, file_path, unique_filename, use_cache=True, stats=None):
+    """Background job body: analyze an uploaded file and save its results"""
+    report('extracting', 20)
+    stats = stats or UploadStats()
+    extracted_data, full_result = analyze_uploaded_file(file_path, use_cache=use_cache,
+                                                        content_hash=stats.details.get('sha256'),
+                                                        stats=stats)
+    if 'error' in full_result:
+        raise RuntimeError(full_result['error'])
+
+    report('saving', 90)
+    result_file = save_analysis_result(unique_filename, full_result)
+    return {
+        'filename': unique_filename,
+        'extracted_data': extracted_data,
+        'result_file': result_file,
+        'file_size': os.path.getsize(file_path),
+        'upload_stats': stats.as_dict()
+    }
+
 @app.route('/')
 def index():
     return render_template('upload.html')
@@ -287,15 +359,22 @@ def upload_file():
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
             
             try:
-                file.save(file_path)
+                stats = UploadStats()
+                content_hash = stream_to_disk(file.stream, file_path, MAX_FILE_SIZE, stats)
+                
+                if wants_async():
+                    job_id = upload_jobs.submit(process_upload_job, file_path, unique_filename, not cache_bypassed(),
+                                                stats, filename=unique_filename)
+                    return render_template('upload_pending.html',
+                                         job_id=job_id,
+                                         filename=filename)
                 
                 # Analyze the file
-                extracted_data, full_result = analyze_uploaded_file(file_path)
+                extracted_data, full_result = analyze_uploaded_file(file_path, use_cache=not cache_bypassed(),
+                                                                    content_hash=content_hash, stats=stats)
                 
                 # Save results for potential receipt generation
-                result_file = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_filename}_result.json")
-                with open(result_file, 'w', encoding='utf-8') as f:
-                    json.dump(full_result, f, indent=2)
+                result_file = save_analysis_result(unique_filename, full_result)
                 
                 return render_template('results.html', 
                                      extracted_data=extracted_data, 
@@ -381,6 +460,14 @@ def generate_receipt():
         # Save receipt files (PDF only)
         saved_files = save_receipt_multiple_formats(receipt_result['image'], receipt_filename, ["pdf"])
         
+        # Record the receipt in the ledger used by the reports, replacing the form it was filled from
+        try:
+            ledger_ready()
+            get_receipt_ledger().record(receipt_data, receipt_no=receipt_result['receipt_no'],
+                                        upload=uploaded_form_name())
+        except Exception as ledger_error:
+            logging.error(f"Error recording receipt in ledger: {ledger_error}")
+        
         flash('Receipt generated successfully!')
         return render_template('receipt_generated.html', 
                              saved_files=saved_files,
@@ -431,10 +518,38 @@ def api_upload():
         unique_filename = f"{uuid.uuid4()}_{filename}"
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
         
-        file.save(file_path)
+        stats = UploadStats()
+        try:
+            content_hash = stream_to_disk(file.stream, file_path, MAX_FILE_SIZE, stats)
+        except UploadTooLarge:
+            return jsonify({
+                'error': 'File too large. Maximum size is 16MB.',
+                'code': 'FILE_TOO_LARGE',
+                'max_size': MAX_FILE_SIZE
+            }), 413
+        
+        if wants_async():
+            job_id = upload_jobs.submit(process_upload_job, file_path, unique_filename, not cache_bypassed(),
+                                        stats, filename=unique_filename)
+            response = jsonify({
+                'success': True,
+                'job_id': job_id,
+                'filename': unique_filename,
+                'status': 'queued',
+                'status_url': url_for('api_job_status', job_id=job_id),
+                'events_url': url_for('api_job_events', job_id=job_id),
+                'message': 'File accepted for analysis'
+            })
+            response.status_code = 202
+            response.headers['Location'] = url_for('api_job_status', job_id=job_id)
+            if origin:
+                response.headers['Access-Control-Allow-Origin'] = origin
+                response.headers['Access-Control-Allow-Credentials'] = 'true'
+            return response
         
         # Analyze the file
-        extracted_data, full_result = analyze_uploaded_file(file_path)
+        extracted_data, full_result = analyze_uploaded_file(file_path, use_cache=not cache_bypassed(),
+                                                            content_hash=content_hash, stats=stats)
         
         # Enhanced response for mobile
         response_data = {
@@ -443,7 +558,8 @@ def api_upload():
             'extracted_data': extracted_data,
             'message': 'File analyzed successfully',
             'timestamp': os.path.getctime(file_path),
-            'file_size': os.path.getsize(file_path)
+            'file_size': os.path.getsize(file_path),
+            'upload_stats': stats.as_dict()
         }
         
         response = jsonify(response_data)
@@ -462,6 +578,123 @@ def api_upload():
             'code': 'PROCESSING_ERROR'
         }), 500
 
+def process_batch_receipts_job(report, raw_records, record_ledger, zip_filename, download_url):
+    """Background job body: render a batch of receipts and bundle them in one ZIP"""
+    summary = generate_batch(raw_records, record_ledger=record_ledger, zip_filename=zip_filename, progress=report)
+    return {
+        'success': summary['failed'] == 0,
+        'generated': summary['generated'],
+        'failed': summary['failed'],
+        'receipt_numbers': summary['receipt_numbers'],
+        'zip_filename': os.path.basename(summary['zip_path']),
+        'download_url': download_url,
+        'results': [
+            {key: value for key, value in result.items() if key != 'files'}
+            for result in summary['results']
+        ]
+    }
+
+@app.route('/api/batch_receipts', methods=['POST'])
+def api_batch_receipts():
+    """
+    Start generating receipts for a CSV upload (Extract.csv layout) or a JSON
+    list of records. Rendering runs as a background job; poll status_url (or
+    stream events_url) and fetch the ZIP from download_url once it succeeds.
+    """
+    try:
+        if 'file' in request.files and request.files['file'].filename:
+            file = request.files['file']
+            content = file.read().decode('utf-8-sig')
+            if file.filename.lower().endswith('.json'):
+                raw_records = parse_json_records(json.loads(content))
+            else:
+                import io
+                raw_records = parse_csv_records(io.StringIO(content, newline=''))
+        else:
+            raw_records = parse_json_records(request.get_json(silent=True) or [])
+    except ValueError as e:
+        return jsonify({
+            'error': f'Could not read receipt records: {str(e)}',
+            'code': 'INVALID_RECORDS'
+        }), 400
+
+    if not raw_records:
+        return jsonify({
+            'error': 'No receipt records supplied',
+            'code': 'NO_RECORDS'
+        }), 400
+
+    record_ledger = request.args.get('record', '0').lower() in ('1', 'true', 'yes')
+    zip_filename = batch_zip_filename()
+    download_url = url_for('download_file', filename=zip_filename)
+    job_id = upload_jobs.submit(process_batch_receipts_job, raw_records, record_ledger, zip_filename,
+                                download_url, filename=zip_filename)
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('api_job_status', job_id=job_id),
+        'events_url': url_for('api_job_events', job_id=job_id),
+        'zip_filename': zip_filename,
+        'download_url': download_url
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """Report progress of an asynchronous upload job"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'error': 'Job not found',
+            'code': 'JOB_NOT_FOUND'
+        }), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def api_job_events(job_id):
+    """Stream upload job progress as server-sent events until it finishes"""
+    if upload_jobs.get(job_id) is None:
+        return jsonify({
+            'error': 'Job not found',
+            'code': 'JOB_NOT_FOUND'
+        }), 404
+
+    def event_stream():
+        version = None
+        while True:
+            job = upload_jobs.wait_for_change(job_id, version)
+            if job is None:
+                yield "event: failed\ndata: {\"error\": \"Job not found\"}\n\n"
+                return
+            if job['version'] == version and job['status'] not in TERMINAL_STATES:
+                # Keep idle connections open through proxies
+                yield ": keep-alive\n\n"
+                continue
+            version = job['version']
+            yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+            if job['status'] in TERMINAL_STATES:
+                return
+
+    response = Response(event_stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/upload/result/<job_id>')
+def upload_job_result(job_id):
+    """Show the review form for a finished asynchronous upload"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        flash('Upload job not found')
+        return redirect(url_for('index'))
+    if job['status'] != 'succeeded':
+        flash(f"Error processing file: {job.get('error') or 'analysis is not finished yet'}")
+        return redirect(url_for('index'))
+
+    result = job['result']
+    return render_template('results.html',
+                         extracted_data=result['extracted_data'],
+                         filename=result['filename'],
+                         result_file=result['result_file'])
+
 @app.route('/download/<filename>')
 def download_file(filename):
     """Download generated receipt files"""
@@ -475,6 +708,11 @@ def download_file(filename):
         if os.path.exists(receipts_path):
             return send_file(receipts_path, as_attachment=True, download_name=safe_filename)
         
+        # Check batch ZIPs produced by /api/batch_receipts
+        batch_path = os.path.join(receipts_dir, "Batches", safe_filename)
+        if os.path.exists(batch_path):
+            return send_file(batch_path, as_attachment=True, download_name=safe_filename)
+        
         # Check if file exists in current directory (for backward compatibility)
         current_dir_path = os.path.join(os.getcwd(), safe_filename)
         if os.path.exists(current_dir_path):
@@ -551,6 +789,64 @@ def generate_offertory_report():
         flash(f'Error generating offertory report: {str(e)}')
         return redirect(url_for('reports_dashboard'))
 
+def process_bulk_report_job(report, start_date, end_date, service_type, formats, download_url):
+    """Background job body: render the reports for a date range and bundle them in one ZIP"""
+    summary = generate_bulk_reports(start_date, end_date, service_type, formats, progress=report)
+    return {
+        'success': summary['failed'] == 0,
+        'dates': summary['dates'],
+        'generated': summary['generated'],
+        'failed': summary['failed'],
+        'zip_filename': os.path.basename(summary['zip_path']),
+        'download_url': download_url,
+        'results': [
+            dict(result, files=[os.path.basename(path) for path in result['files']])
+            for result in summary['results']
+        ]
+    }
+
+@app.route('/api/bulk_offertory_reports', methods=['POST'])
+def api_bulk_offertory_reports():
+    """
+    Start generating offertory reports for every service date in a range.
+    Rendering runs as a background job; poll status_url (or stream
+    events_url) and fetch the ZIP from download_url once it succeeds.
+    """
+    params = request.get_json(silent=True) or request.form
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    service_type = params.get('service_type') or 'Worship Service'
+    formats = params.get('formats') or 'pdf'
+    if isinstance(formats, str):
+        formats = formats.split(',')
+
+    if not start_date or not end_date:
+        return jsonify({
+            'error': 'start_date and end_date are required',
+            'code': 'NO_DATE_RANGE'
+        }), 400
+
+    try:
+        start_date, end_date = parse_date_range(start_date, end_date)
+        formats = check_formats(formats)
+    except ValueError as e:
+        return jsonify({
+            'error': str(e),
+            'code': 'INVALID_REQUEST'
+        }), 400
+
+    zip_filename = bulk_zip_filename(start_date, end_date, service_type)
+    download_url = url_for('download_report', filename=zip_filename)
+    job_id = upload_jobs.submit(process_bulk_report_job, start_date, end_date, service_type, formats,
+                                download_url, filename=zip_filename)
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('api_job_status', job_id=job_id),
+        'events_url': url_for('api_job_events', job_id=job_id),
+        'zip_filename': zip_filename,
+        'download_url': download_url
+    }), 202
+
 @app.route('/summary_report')
 def summary_report():
     """Generate summary report for date range"""